@@ -14,7 +14,9 @@ import json
 import os
 import socket
 import sys
-import requests
+import threading
+import time
+from contextlib import contextmanager
 from typing import List, Tuple
 
 # ============================= INTERNAL CONSTANTS =============================
@@ -23,10 +25,50 @@ DB_PWD = "(*$^)"
 DEFAULT_PORT = 8000
 DJANGO_SETTINGS = "django_sync.settings"
 
+# config.json "profile" → settings module ("api" = trimmed apps/middleware)
+SETTINGS_PROFILES = {
+    "default": DJANGO_SETTINGS,
+    "api": "django_sync.settings_api",
+}
+
+# "waitress" = production WSGI server, "asgi" = uvicorn + async views,
+# "runserver" = Django dev server
+DEFAULT_SERVER = "waitress"
+SERVER_DEFAULTS = {
+    "threads": 8,                              # fixed worker pool
+    "backlog": 128,                            # pending TCP connections
+    "connection_limit": 200,                   # open sockets before refusing
+    "channel_timeout": 30,                     # idle keep-alive seconds
+    "max_request_body_size": 16 * 1024 * 1024,
+    "max_request_header_size": 64 * 1024,
+    "shutdown_grace": 10,                      # seconds to drain on stop
+}
+
+MIGRATE_FINGERPRINT_FILE = ".migrate_fingerprint"
+
+LICENSE_CACHE_FILE = ".license_cache"
+LICENSE_KEY_FILE = ".license_key"       # random per-install HMAC key (DPAPI-protected on Windows)
+LICENSE_CACHE_TTL_HOURS = 12            # skip the network entirely
+LICENSE_OFFLINE_GRACE_HOURS = 72        # honour cache while the API is down
+LICENSE_CACHE_TTL_MAX_HOURS = 24        # config.json cannot stretch these further
+LICENSE_OFFLINE_GRACE_MAX_HOURS = 7 * 24
+
 ACTIVATE_API     = "https://activate.imcbs.com/corporate-clientid/list/"
 CLIENT_LIST_API  = "https://activate.imcbs.com/client-id-list/get-client-ids/"
 
 # ----------------------------- helpers ---------------------------------------
+STARTUP_TIMINGS = {}        # phase -> ms, filled by main()
+
+@contextmanager
+def _phase(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        STARTUP_TIMINGS[name] = round(ms, 1)
+        print(f"⏱️  {name}: {ms:.0f} ms")
+
 def _exe_dir() -> str:
     if getattr(sys, "frozen", False):
         return os.path.dirname(sys.executable)
@@ -46,6 +88,9 @@ def load_config(exe_dir: str) -> dict:
         "dsn": None,
         "client_id": None,
         "settings": DJANGO_SETTINGS,
+        "profile": None,
+        "server": DEFAULT_SERVER,
+        "server_options": {},
     }
 
     if os.path.isfile(cfg_path):
@@ -61,50 +106,60 @@ def load_config(exe_dir: str) -> dict:
 
     cfg["dsn"] = _strip_comment(cfg["dsn"])
     cfg["client_id"] = _strip_comment(cfg["client_id"])
+
+    profile = cfg.get("profile")
+    if profile:
+        if profile not in SETTINGS_PROFILES:
+            raise RuntimeError(f"Unknown profile '{profile}' in config.json (use: {', '.join(SETTINGS_PROFILES)})")
+        cfg["settings"] = SETTINGS_PROFILES[profile]
     return cfg
 
 # ----------------------------- LICENSE CHECK ---------------------------------
-def is_task_mst_enabled(client_id: str) -> bool:
-    try:
-        res = requests.get(ACTIVATE_API, timeout=10)
-        res.raise_for_status()
-        payload = res.json()
-
-        if not payload.get("success"):
-            return False
+def _fetch_license(client_id: str) -> bool:
+    """Ask the activation API; raises if it cannot be reached/parsed."""
+    import requests     # lazy: ~90 ms import, only needed when the cache is stale
 
-        for corp in payload.get("data", []):
-            for shop in corp.get("shops", []):
-                if shop.get("client_id") == client_id:
-                    return "TASK MST" in shop.get("projects", [])
+    res = requests.get(ACTIVATE_API, timeout=10)
+    res.raise_for_status()
+    payload = res.json()
 
+    if not payload.get("success"):
         return False
 
+    for corp in payload.get("data", []):
+        for shop in corp.get("shops", []):
+            if shop.get("client_id") == client_id:
+                return "TASK MST" in shop.get("projects", [])
+
+    return False
+
+def is_task_mst_enabled(client_id: str) -> bool:
+    try:
+        return _fetch_license(client_id)
     except Exception as e:
         print(f"License validation failed: {e}")
         return False
 
 # ----------------------------- MISEL MATCH CHECK -----------------------------
-def check_misel_company_match(client_id: str, dsn: str) -> bool:
+def _fetch_company(client_id: str):
     """
-    Validates that DBA.misel.firm_name and address1 match the API's
-    company_name and place for this client_id.
-    Prints mismatch details to stdout (→ red in UI terminal).
-    Returns True if everything matches, False on any mismatch/error.
+    HTTP half of the company check: (company_name, place) the client-id-list
+    API has for client_id, or None when it cannot say (non-fatal, printed).
     """
     # 1. Fetch the client list
     try:
+        import requests
         res = requests.get(CLIENT_LIST_API, timeout=10)
         res.raise_for_status()
         payload = res.json()
     except Exception as e:
         print(f"⚠️  Could not reach client-id-list API: {e}")
         # Non-fatal — allow startup if API is unreachable
-        return True
+        return None
 
     if not payload.get("status"):
         print("⚠️  Client-id-list API returned status=false — skipping misel check")
-        return True
+        return None
 
     # 2. Find this client_id in the list
     api_entry = None
@@ -115,10 +170,24 @@ def check_misel_company_match(client_id: str, dsn: str) -> bool:
 
     if api_entry is None:
         print(f"⚠️  client_id '{client_id}' not found in client-id-list API — skipping misel check")
-        return True
+        return None
+
+    return (api_entry.get("company_name") or "").strip(), (api_entry.get("place") or "").strip()
 
-    api_company = (api_entry.get("company_name") or "").strip()
-    api_place   = (api_entry.get("place") or "").strip()
+def check_misel_company_match(client_id: str, dsn: str, company=None) -> bool:
+    """
+    Validates that DBA.misel.firm_name and address1 match the API's
+    company_name and place for this client_id.
+    company: (company_name, place) already fetched (e.g. cached) - only the
+    local DB is read then.
+    Prints mismatch details to stdout (→ red in UI terminal).
+    Returns True if everything matches, False on any mismatch/error.
+    """
+    if company is None:
+        company = _fetch_company(client_id)
+        if company is None:
+            return True
+    api_company, api_place = company
 
     # 3. Query DBA.misel for firm_name and address1
     try:
@@ -163,6 +232,156 @@ def check_misel_company_match(client_id: str, dsn: str) -> bool:
     return False
 
 
+# ----------------------------- STARTUP VALIDATION ----------------------------
+# The signed cache is tamper-evidence, not a licence guarantee: whoever can run
+# code as this Windows user can read the key and re-sign the file. It stops
+# hand-edited or copied cache files, nothing more; the TTL / grace caps bound
+# how long a valid online check is reused.
+def _dpapi(data: bytes, protect: bool) -> bytes:
+    """CryptProtectData / CryptUnprotectData for the current Windows user."""
+    import ctypes
+    from ctypes import wintypes
+
+    class _Blob(ctypes.Structure):
+        _fields_ = [("cbData", wintypes.DWORD), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+    buf = ctypes.create_string_buffer(data, len(data))
+    blob_in = _Blob(len(data), ctypes.cast(buf, ctypes.POINTER(ctypes.c_char)))
+    blob_out = _Blob()
+    crypt32 = ctypes.windll.crypt32
+    call = crypt32.CryptProtectData if protect else crypt32.CryptUnprotectData
+    if not call(ctypes.byref(blob_in), None, None, None, None, 0x1, ctypes.byref(blob_out)):  # UI_FORBIDDEN
+        raise OSError("DPAPI call failed")
+    try:
+        return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+def _cache_secret(state_dir: str) -> bytes:
+    """Per-install random key, created on first use; a new key simply invalidates old caches."""
+    import secrets
+
+    path = os.path.join(state_dir, LICENSE_KEY_FILE)
+    try:
+        with open(path, "rb") as f:
+            stored = f.read()
+        secret = _dpapi(stored, protect=False) if os.name == "nt" else stored
+        if len(secret) == 32:
+            return secret
+    except OSError:
+        pass
+    secret = secrets.token_bytes(32)
+    try:
+        with open(path, "wb") as f:
+            f.write(_dpapi(secret, protect=True) if os.name == "nt" else secret)
+        if os.name != "nt":
+            os.chmod(path, 0o600)
+    except OSError as e:
+        print(f"⚠️  Could not store license cache key: {e}")
+    return secret
+
+def _cache_key(client_id: str, state_dir: str) -> bytes:
+    # bound to this install and machine: a copied cache file does not verify elsewhere
+    import hashlib
+    import uuid
+    return hashlib.sha256(_cache_secret(state_dir) + f"|{client_id}|{uuid.getnode()}".encode()).digest()
+
+def _sign(payload: dict, client_id: str, state_dir: str) -> str:
+    import hashlib
+    import hmac
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hmac.new(_cache_key(client_id, state_dir), body, hashlib.sha256).hexdigest()
+
+def _write_validation_cache(path: str, client_id: str, dsn: str, checked_at: float = None, company=None):
+    # only the HTTP answers: the local DBA.misel comparison runs on every start
+    payload = {
+        "client_id": client_id,
+        "dsn": dsn,
+        "licensed": True,
+        "company": list(company) if company else None,
+        "checked_at": time.time() if checked_at is None else checked_at,
+    }
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"payload": payload, "sig": _sign(payload, client_id, os.path.dirname(path))}, f)
+    except OSError as e:
+        print(f"⚠️  Could not write validation cache: {e}")
+
+def _read_validation_cache(path: str, client_id: str, dsn: str):
+    """Cached payload if present, untampered and for this client/DSN, else None."""
+    import hmac
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        payload, sig = data["payload"], data["sig"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not hmac.compare_digest(str(sig), _sign(payload, client_id, os.path.dirname(path))):
+        print("⚠️  Validation cache signature mismatch — ignoring it")
+        return None
+    if payload.get("client_id") != client_id or payload.get("dsn") != dsn or "company" not in payload:
+        return None                                     # other install, or written before company caching
+    return payload
+
+def _hours(cfg: dict, key: str, default: float, cap: float) -> float:
+    try:
+        hours = float(cfg.get(key, default))
+    except (TypeError, ValueError):
+        print(f"WARNING: invalid {key} in config.json, using {default}")
+        hours = default
+    return min(hours, cap)
+
+def validate_startup(cfg: dict, state_dir: str = None) -> Tuple[bool, bool]:
+    """
+    License + company checks → (licensed, misel_ok).
+      • fresh signed cache (< license_cache_ttl_hours) → no network; the
+        cached company name / place is still compared with DBA.misel
+      • otherwise both checks run concurrently
+      • activation API unreachable → cached success is honoured for
+        license_offline_grace_hours after it was recorded
+    Both windows are capped (LICENSE_*_MAX_HOURS) whatever config.json says.
+    Only a fully successful result is cached; failures are re-checked
+    on every start. The cache signature is tamper-evidence only.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    client_id, dsn = cfg["client_id"], cfg["dsn"]
+    path = os.path.join(state_dir or _exe_dir(), LICENSE_CACHE_FILE)
+    ttl = _hours(cfg, "license_cache_ttl_hours", LICENSE_CACHE_TTL_HOURS, LICENSE_CACHE_TTL_MAX_HOURS) * 3600
+    grace = _hours(cfg, "license_offline_grace_hours", LICENSE_OFFLINE_GRACE_HOURS,
+                   LICENSE_OFFLINE_GRACE_MAX_HOURS) * 3600
+
+    cached = _read_validation_cache(path, client_id, dsn)
+    age = time.time() - cached["checked_at"] if cached else None
+    if cached and 0 <= age < ttl:
+        print(f"✅ License verified (cached {age / 60:.0f} min ago)")
+        company = cached["company"]
+        return True, company is None or check_misel_company_match(client_id, dsn, company)
+
+    def company_check():
+        company = _fetch_company(client_id)
+        return company, company is None or check_misel_company_match(client_id, dsn, company)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="validate") as pool:
+        license_future = pool.submit(_fetch_license, client_id)
+        company, misel_ok = pool.submit(company_check).result()
+        try:
+            licensed = license_future.result()
+        except Exception as e:
+            if cached and 0 <= age < grace:
+                print(f"⚠️  Activation API unreachable ({e}) — using cached license "
+                      f"(offline grace ends in {(grace - age) / 3600:.1f} h)")
+                if company is None and cached["company"]:
+                    misel_ok = check_misel_company_match(client_id, dsn, cached["company"])
+                return True, misel_ok
+            print(f"License validation failed: {e}")
+            licensed = False
+
+    if licensed and misel_ok:
+        _write_validation_cache(path, client_id, dsn, company=company)
+    return licensed, misel_ok
+
+
 # ----------------------------- IP auto-pick ----------------------------------
 def ipv4_candidates() -> list[str]:
     cands = []
@@ -215,24 +434,282 @@ def bootstrap_django(settings: str, proj_root: str):
     import django
     django.setup()
 
-def apply_migrations():
+def _migration_fingerprint() -> str:
+    """
+    Cheap digest of "what migrate would look at": Django version, settings
+    module, every app's migration modules (name, plus size / mtime when they
+    are plain files) and the applied-migration rows in the SQLite DB.
+    Avoids importing the migration graph.
+    """
+    import hashlib
+    import importlib.util
+    import pkgutil
+    import sqlite3
+    import django
+    from django.apps import apps
+    from django.conf import settings
+
+    h = hashlib.sha256()
+    h.update(f"{django.get_version()}|{settings.SETTINGS_MODULE}".encode())
+
+    for app in apps.get_app_configs():
+        try:
+            spec = importlib.util.find_spec(f"{app.name}.migrations")
+        except ImportError:
+            spec = None
+        names = []
+        if spec and spec.submodule_search_locations:
+            for m in sorted(pkgutil.iter_modules(spec.submodule_search_locations), key=lambda m: m.name):
+                try:            # edited in place → new size / mtime; frozen builds have no files
+                    st = os.stat(os.path.join(m.module_finder.path, f"{m.name}.py"))
+                    names.append(f"{m.name}:{st.st_size}:{st.st_mtime_ns}")
+                except (AttributeError, OSError):
+                    names.append(m.name)
+        h.update(f"|{app.label}:{','.join(names)}".encode())
+
+    db = settings.DATABASES["default"]
+    h.update(f"|{db['ENGINE']}|{db['NAME']}".encode())
+    if db["ENGINE"].endswith("sqlite3"):
+        try:
+            con = sqlite3.connect(f"file:{db['NAME']}?mode=ro", uri=True)
+            try:
+                state = con.execute("SELECT COUNT(*), MAX(id) FROM django_migrations").fetchone()
+            finally:
+                con.close()
+        except sqlite3.Error:
+            state = "no-migrations-table"
+        h.update(f"|{state}".encode())
+    return h.hexdigest()
+
+def apply_migrations(state_dir: str = None) -> bool:
+    """
+    Run migrate only when the fingerprint differs from the stored one.
+    Returns True when migrate actually ran.
+    """
     from django.core.management import call_command
+
+    path = os.path.join(state_dir or _exe_dir(), MIGRATE_FINGERPRINT_FILE)
+    try:
+        before = _migration_fingerprint()
+    except Exception as e:
+        print(f"⚠️  Migration fingerprint failed ({e}) — running migrate")
+        before = None
+
+    if before:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read().strip() == before:
+                    return False
+        except OSError:
+            pass
+
     call_command("migrate", interactive=False, verbosity=0)
 
-def run_server(bind_ip: str, port: int):
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_migration_fingerprint())
+    except Exception:
+        pass            # read-only folder: just migrate again next time
+    return True
+
+# ----------------------------- HTTP server -----------------------------------
+_server = None
+
+def _server_options(cfg: dict) -> dict:
+    opts = dict(SERVER_DEFAULTS)
+    opts.update((cfg or {}).get("server_options") or {})
+    return opts
+
+def _module_available(name: str) -> bool:
+    import importlib.util
+    return importlib.util.find_spec(name) is not None
+
+async def _too_large(send):
+    body = b'{"detail": "Request body too large"}'
+    await send({"type": "http.response.start", "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+def _limit_body(app, max_bytes: int):
+    """
+    ASGI wrapper enforcing max_request_body_size (waitress does it itself):
+    413 for a larger Content-Length; a chunked body is read up to the cap
+    first and replayed to the app.
+    """
+    async def limited(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None:
+            if length.isdigit() and int(length) > max_bytes:
+                return await _too_large(send)
+            return await app(scope, receive, send)      # the server holds the body to Content-Length
+
+        messages, size = [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break                                   # client went away
+            size += len(message.get("body", b""))
+            if size > max_bytes:
+                return await _too_large(send)
+            if not message.get("more_body"):
+                break
+        buffered = iter(messages)
+
+        async def replay():
+            return next(buffered, None) or await receive()
+
+        return await app(scope, replay, send)
+    return limited
+
+def _run_asgi(bind_ip: str, port: int, opts: dict):
+    """uvicorn + sync.async_views (DB work on a bounded executor)."""
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+
+    uvicorn.run(
+        _limit_body(get_asgi_application(), int(opts["max_request_body_size"])),
+        host=bind_ip,
+        port=port,
+        backlog=int(opts["backlog"]),
+        limit_concurrency=int(opts["connection_limit"]),
+        timeout_keep_alive=int(opts["channel_timeout"]),
+        timeout_graceful_shutdown=int(opts["shutdown_grace"]),
+        h11_max_incomplete_event_size=int(opts["max_request_header_size"]),
+        log_level="warning",
+        server_header=False,
+    )
+
+def _run_waitress(bind_ip: str, port: int, opts: dict):
+    global _server
+    from waitress import create_server
+    from django.core.wsgi import get_wsgi_application
+
+    _server = create_server(
+        get_wsgi_application(),
+        host=bind_ip,
+        port=port,
+        threads=int(opts["threads"]),
+        backlog=int(opts["backlog"]),
+        connection_limit=int(opts["connection_limit"]),
+        channel_timeout=int(opts["channel_timeout"]),
+        max_request_body_size=int(opts["max_request_body_size"]),
+        max_request_header_size=int(opts["max_request_header_size"]),
+        ident="TASK_MST_SYNC",
+    )
+    _install_signal_handlers(float(opts["shutdown_grace"]))
+    try:
+        _server.run()
+    finally:
+        _server = None
+
+def stop_server(grace: float = SERVER_DEFAULTS["shutdown_grace"]) -> bool:
+    """
+    Graceful stop of the waitress server (safe from any thread):
+    stop accepting, let queued/running requests finish for up to `grace`
+    seconds, then close the remaining keep-alive sockets.
+    """
+    import time
+
+    srv = _server
+    if srv is None:
+        return False
+
+    dispatcher = srv.task_dispatcher
+
+    def stop_accepting():
+        srv.asyncore.dispatcher.close(srv)     # listener only, keep the trigger
+
+    def close_channels():
+        for channel in list(srv._map.values()):
+            channel.close()            # includes the trigger -> loop exits
+
+    # socket-map changes must happen on the server loop thread
+    srv.trigger.pull_trigger(stop_accepting)
+
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        with dispatcher.lock:
+            if not dispatcher.queue and dispatcher.active_count == 0:
+                break
+        time.sleep(0.05)
+
+    srv.trigger.pull_trigger(close_channels)
+    dispatcher.shutdown(cancel_pending=True, timeout=grace)
+    return True
+
+def _install_signal_handlers(grace: float):
+    """Ctrl+C / SIGTERM drain the server - only possible from the main thread."""
+    import signal
+
+    if threading.current_thread() is not threading.main_thread():
+        return      # GUI runs main() in a worker thread; it stops via os._exit
+
+    def handler(signum, frame):
+        print("🛑 Shutting down (draining requests)...")
+        threading.Thread(target=stop_server, args=(grace,), daemon=True).start()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, handler)
+        except (ValueError, OSError):
+            pass
+
+def _resolve_server(cfg: dict) -> str:
+    """Configured server, falling back when its package is not installed."""
+    server = ((cfg or {}).get("server") or DEFAULT_SERVER).lower()
+    if server == "asgi" and not _module_available("uvicorn"):
+        print("⚠️  uvicorn not installed — falling back to waitress")
+        server = "waitress"
+    if server == "waitress" and not _module_available("waitress"):
+        print("⚠️  waitress not installed — falling back to Django runserver")
+        server = "runserver"
+    return server
+
+def run_server(bind_ip: str, port: int, cfg: dict = None):
+    server = _resolve_server(cfg)
+    if server == "asgi":
+        _run_asgi(bind_ip, port, _server_options(cfg))
+        return
+    if server == "waitress":
+        _run_waitress(bind_ip, port, _server_options(cfg))
+        return
+
     from django.core.management import call_command
     call_command("runserver", f"{bind_ip}:{port}", use_reloader=False)
 
+# ----------------------------- Warm-up ---------------------------------------
+def warm_up_and_announce(bind_ip: str, port: int, cfg: dict):
+    """
+    Pool, URLconf, catalog statements (+ first snapshot if warmup_catalog),
+    then the "Backend running" line the GUI waits for. Runs next to the
+    server so /ready can be polled while it is in progress.
+    """
+    from sync import warmup
+
+    with _phase("warm-up"):
+        result = warmup.run(cfg)
+    for name, step in result["steps"].items():
+        if not step["ok"]:
+            print(f"⚠️  Warm-up {name} failed: {step['error']}")
+
+    # ✅ ONE clean log line only
+    print(f"🟢 Backend running on http://{bind_ip}:{port}")
+
 # ----------------------------- Main ------------------------------------------
 def main():
     exe_dir = _exe_dir()
-    cfg = load_config(exe_dir)
+    STARTUP_TIMINGS.clear()
 
-    # 🏢 MISEL COMPANY / ADDRESS VALIDATION  (runs first so mismatch always visible)
-    misel_ok = check_misel_company_match(cfg["client_id"], cfg["dsn"])
+    with _phase("config"):
+        cfg = load_config(exe_dir)
 
-    # 🔐 LICENSE VALIDATION
-    if not is_task_mst_enabled(cfg["client_id"]):
+    # 🏢🔐 COMPANY MATCH + LICENSE (concurrent, signed local cache)
+    with _phase("validation"):
+        licensed, misel_ok = validate_startup(cfg, exe_dir)
+    if not licensed:
         print("❌ Unauthorized client or TASK MST not enabled")
         sys.exit(1)
 
@@ -244,18 +721,44 @@ def main():
     os.environ["DB_UID"] = DB_UID
     os.environ["DB_PWD"] = DB_PWD
 
-    bootstrap_django(cfg.get("settings", DJANGO_SETTINGS), exe_dir)
+    # production servers → no Django debug pages / query log unless asked for
+    server = cfg["server"] = _resolve_server(cfg)
+    if server in ("waitress", "asgi"):
+        os.environ.setdefault("DEBUG", "False")
+    if server == "asgi":
+        os.environ["SYNC_ASYNC_VIEWS"] = "1"
 
-    port = int(cfg.get("port", DEFAULT_PORT))
-    bind_ip, _ = select_bind_ip(port)
+    with _phase("django setup"):
+        bootstrap_django(cfg.get("settings", DJANGO_SETTINGS), exe_dir)
 
-    # 🔕 SILENT MIGRATION
-    apply_migrations()
+    with _phase("bind ip"):
+        port = int(cfg.get("port", DEFAULT_PORT))
+        bind_ip, _ = select_bind_ip(port)
 
-    # ✅ ONE clean log line only
-    print(f"🟢 Backend running on http://{bind_ip}:{port}")
+    # 🔕 SILENT MIGRATION (skipped when nothing changed)
+    with _phase("migrations"):
+        if not apply_migrations(exe_dir):
+            print("✅ Migrations up to date — skipped")
+
+    with _phase("background tasks"):
+        # 📚 OFFLINE CATALOG FILE (built + refreshed in the background)
+        from sync import catalog
+        catalog.start_builder()
+
+        # 📱 pair_check answers from this state instead of scanning processes
+        from sync import supervisor
+        supervisor.claim_if_self()
+
+        # 🔎 INDEX ADVISOR (report only unless index_advisor_create is set)
+        from sync import index_advisor
+        threading.Thread(target=index_advisor.startup_check, name="index-advisor", daemon=True).start()
+
+    # 🔥 WARM-UP → "Backend running" once done (/ready flips at the same time)
+    threading.Thread(
+        target=warm_up_and_announce, args=(bind_ip, port, cfg), name="warmup", daemon=True
+    ).start()
 
-    run_server(bind_ip, port)
+    run_server(bind_ip, port, cfg)
 
 # ----------------------------- Entry -----------------------------------------
 if __name__ == "__main__":
@@ -1,14 +1,38 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_submodules
-from PyInstaller.utils.hooks import collect_all
+from PyInstaller.utils.hooks import collect_data_files
+
+# Django parts the service never loads - kept out of the onefile archive,
+# which is extracted on every launch (collect_all('django') pulled them all).
+DJANGO_UNUSED = (
+    'django.contrib.gis',
+    'django.contrib.postgres',
+    'django.contrib.flatpages',
+    'django.contrib.redirects',
+    'django.contrib.sitemaps',
+    'django.contrib.syndication',
+    'django.contrib.humanize',
+    'django.contrib.admindocs',
+    'django.db.backends.mysql',
+    'django.db.backends.oracle',
+    'django.db.backends.postgresql',
+    'django.test',
+)
+
+def _django_used(name):
+    return not name.startswith(DJANGO_UNUSED) and '.tests' not in name
 
 datas = [('config.json', '.'), ('django_sync', 'django_sync'), ('db.sqlite3', '.'), ('TASK_MST.png', '.'), ('TASK_MST.ico', '.'), ('imcbs_logo.png', '.')]
 binaries = []
 hiddenimports = []
-hiddenimports += collect_submodules('django')
+hiddenimports += collect_submodules('django', filter=_django_used)
 hiddenimports += collect_submodules('django_sync')
-tmp_ret = collect_all('django')
-datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
+hiddenimports += collect_submodules('sync', filter=lambda name: name != 'sync.tests')  # tests need django.test
+# server: "asgi" imports uvicorn lazily, and uvicorn loads its protocol / loop modules by name
+hiddenimports += collect_submodules('uvicorn')
+# templates/static for admin etc., English locale only (UI is English)
+datas += collect_data_files('django', excludes=['**/locale/**', 'contrib/gis/**', 'contrib/postgres/**'])
+datas += collect_data_files('django', includes=['conf/locale/en/**'])
 
 
 a = Analysis(
@@ -20,7 +44,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=list(DJANGO_UNUSED) + ['IPython', 'jupyter_client', 'matplotlib', 'tkinter.test'],
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,101 @@
+"""
+Benchmark: per-request cost of jwt_required, with and without the token cache
+
+Runs in-process (django.setup() on the lean "api" profile):
+  • decorator - jwt_required around a no-op view, called through a
+                RequestFactory request: isolates token extraction + decode
+  • request   - /verify-token through the test client (full middleware)
+Each is measured with the cache off (every call runs jwt.decode's HMAC
+check) and on (one miss, then hits), so the difference is the saving.
+
+Usage (from the project root):
+    python -m benchmarks.auth_overhead [--requests 20000] [--json]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _setup():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_sync.settings_api")
+    os.environ.setdefault("DEBUG", "False")
+    import django
+    django.setup()
+    logging.disable(logging.INFO)                      # per-request log lines would dominate
+    warnings.simplefilter("ignore")                    # short dev secret → InsecureKeyLengthWarning
+
+
+def _per_call_us(fn, n):
+    fn()                                              # warm
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def bench(requests):
+    import jwt
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory
+    from sync import views
+    from sync.token_cache import TokenCache
+
+    token = jwt.encode({"sub": "bench", "exp": datetime.datetime.utcnow() + datetime.timedelta(days=7)},
+                       views.JWT_SECRET, algorithm=views.JWT_ALGO)
+    header = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+    request = RequestFactory().get("/verify-token", **header)
+    protected = views.jwt_required(lambda req: HttpResponse())
+    client = Client(**header)
+
+    results = {}
+    original = views._token_cache
+    try:
+        for mode, cache in (("uncached", TokenCache(0)), ("cached", TokenCache())):
+            views._token_cache = cache
+            results[mode] = {
+                "decorator_us": _per_call_us(lambda: protected(request), requests),
+                "request_us": _per_call_us(lambda: client.get("/verify-token"), max(1, requests // 10)),
+                "cache": cache.stats(),
+            }
+    finally:
+        views._token_cache = original
+
+    results["saving_us"] = {
+        key: results["uncached"][key] - results["cached"][key]
+        for key in ("decorator_us", "request_us")
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="decorator calls per mode (/10 for full requests)")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    _setup()
+    results = bench(args.requests)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<10}{'jwt_required (µs)':>20}{'/verify-token (µs)':>22}{'hit ratio':>12}")
+    for mode in ("uncached", "cached"):
+        r = results[mode]
+        ratio = r["cache"]["hit_ratio"]
+        print(f"{mode:<10}{r['decorator_us']:>20.2f}{r['request_us']:>22.1f}"
+              f"{'-' if ratio is None else f'{ratio:.3f}':>12}")
+    s = results["saving_us"]
+    print(f"{'saving':<10}{s['decorator_us']:>20.2f}{s['request_us']:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
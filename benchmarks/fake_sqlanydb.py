@@ -0,0 +1,228 @@
+"""
+Fake `sqlanydb` driver for benchmarks - SQLite underneath
+Implements the part of the sqlanydb DB-API the service uses (connect,
+cursor, execute / fetch*, commit / rollback, qmark parameters) over a
+seeded SQLite file with the acc_* tables the endpoints query:
+    acc_users, acc_master, acc_product, acc_productbatch,
+    acc_purchaseorderdetails
+`SET TEMPORARY OPTION` is accepted and ignored; SYS.* catalog queries
+(index advisor) fail like they would on a missing permission.
+
+Latency (environment, read on every call so a server picks it up):
+    FAKE_SQLANY_CONNECT_MS   per connect             (default 20)
+    FAKE_SQLANY_QUERY_MS     per execute             (default 2)
+    FAKE_SQLANY_ROW_US       per fetched row         (default 5)
+    FAKE_SQLANY_DB           SQLite file (set by seed() / serve)
+
+Serve the real Django app on top of it (no license check, no migrations):
+    python -m benchmarks.fake_sqlanydb serve [--products 20000] [--port 8000]
+                                             [--server waitress] [--seed 42]
+                                             [--login-throttle]
+Load tests log every device in from one IP, so the login throttle is off
+unless --login-throttle is given.
+Users are user1..userN, password "pass".
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+apilevel = "2.0"
+threadsafety = 1
+paramstyle = "qmark"
+
+Error = sqlite3.Error
+DatabaseError = sqlite3.DatabaseError
+OperationalError = sqlite3.OperationalError
+InterfaceError = sqlite3.InterfaceError
+
+_SCHEMA = """
+    CREATE TABLE acc_users (id TEXT PRIMARY KEY, pass TEXT);
+    CREATE TABLE acc_master (code TEXT PRIMARY KEY, name TEXT, place TEXT, super_code TEXT);
+    CREATE INDEX ix_master_super ON acc_master (super_code);
+    CREATE TABLE acc_product (code TEXT PRIMARY KEY, name TEXT, catagory TEXT, product TEXT,
+                              brand TEXT, unit TEXT, taxcode TEXT);
+    CREATE TABLE acc_productbatch (productcode TEXT, barcode TEXT, quantity REAL, cost REAL,
+                                   bmrp REAL, salesprice REAL, secondprice REAL, thirdprice REAL,
+                                   supplier TEXT, expirydate TEXT, text1 TEXT);
+    CREATE INDEX ix_batch_product ON acc_productbatch (productcode);
+    CREATE TABLE acc_purchaseorderdetails (slno INTEGER PRIMARY KEY, masterslno INTEGER, item TEXT,
+                                           qty REAL, remark TEXT, barcode TEXT, date1 TEXT,
+                                           text1 TEXT, mrp REAL);
+"""
+
+
+def _ms(name, default):
+    try:
+        return float(os.environ.get(name, default)) / 1000.0
+    except ValueError:
+        return default / 1000.0
+
+
+# ------------------ seed ------------------
+def seed(path=None, products=20000, batches=2, masters=300, users=50, seed_value=42):
+    """Create and fill the SQLite file; returns its path (also exported as FAKE_SQLANY_DB)."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="fake_sqlany_"), "sqlany.db")
+    rng = random.Random(seed_value)
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+        db.executemany("INSERT INTO acc_users VALUES (?, ?)",
+                       ((f"user{i}", "pass") for i in range(1, users + 1)))
+        db.executemany("INSERT INTO acc_master VALUES (?, ?, ?, ?)", (
+            (f"M{i:05d}", f"Customer {i}", rng.choice(("North", "South", "East", "West")),
+             "SUNCR" if i % 3 else "OTHER")
+            for i in range(1, masters + 1)))
+        db.executemany("INSERT INTO acc_product VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            (f"P{i:06d}", f"Product {i}", rng.choice(("FOOD", "HOME", "CARE")), f"Item {i}",
+             rng.choice(("Acme", "Globex", "Initech")), rng.choice(("NOS", "KG", "LTR")), "GST18")
+            for i in range(1, products + 1)))
+
+        def batch_rows():
+            today = date.today()
+            for i in range(1, products + 1):
+                for b in range(rng.randint(0, batches)):
+                    cost = round(rng.uniform(5, 500), 2)
+                    yield (f"P{i:06d}", f"89{i:08d}{b}" if rng.random() > 0.05 else None,
+                           rng.randint(0, 500), cost, round(cost * 1.4, 2), round(cost * 1.25, 2),
+                           round(cost * 1.2, 2), round(cost * 1.15, 2), f"S{rng.randint(1, 40)}",
+                           (today + timedelta(days=rng.randint(30, 720))).isoformat(), "")
+        db.executemany("INSERT INTO acc_productbatch VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch_rows())
+        db.commit()
+    finally:
+        db.close()
+    os.environ["FAKE_SQLANY_DB"] = path
+    return path
+
+
+# ------------------ DB-API ------------------
+class Cursor:
+    def __init__(self, conn):
+        self._cur = conn._db.cursor()
+        self.arraysize = 1
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def execute(self, sql, params=()):
+        time.sleep(_ms("FAKE_SQLANY_QUERY_MS", 2))
+        if sql.lstrip().upper().startswith("SET TEMPORARY OPTION"):
+            return
+        self._cur.execute(sql, tuple(params))
+
+    def executemany(self, sql, seq):
+        time.sleep(_ms("FAKE_SQLANY_QUERY_MS", 2))
+        self._cur.executemany(sql, seq)
+
+    def _rows(self, rows):
+        per_row = _ms("FAKE_SQLANY_ROW_US", 5) / 1000.0
+        if rows and per_row:
+            time.sleep(per_row * len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        self._rows([row] if row else [])
+        return row
+
+    def fetchmany(self, size=None):
+        return self._rows(self._cur.fetchmany(size or self.arraysize))
+
+    def fetchall(self):
+        return self._rows(self._cur.fetchall())
+
+    def close(self):
+        self._cur.close()
+
+
+class Connection:
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+def connect(**params):
+    """sqlanydb.connect(DSN=..., UID=..., PWD=..., ...) - credentials are ignored."""
+    path = os.environ.get("FAKE_SQLANY_DB")
+    if not path or not os.path.exists(path):
+        raise OperationalError("FAKE_SQLANY_DB not seeded - call benchmarks.fake_sqlanydb.seed()")
+    time.sleep(_ms("FAKE_SQLANY_CONNECT_MS", 20))
+    return Connection(path)
+
+
+def install():
+    """Make `import sqlanydb` resolve to this module (before sync.sql_helper is imported)."""
+    sys.modules["sqlanydb"] = sys.modules[__name__]
+
+
+# ------------------ server ------------------
+def serve(args):
+    install()
+    path = seed(args.db, products=args.products, users=args.users, seed_value=args.seed)
+    print(f"🧪 Fake SQL Anywhere: {path} ({args.products} products)")
+
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault("DEBUG", "False")
+    if args.server == "asgi":
+        os.environ["SYNC_ASYNC_VIEWS"] = "1"
+    import SyncService
+
+    SyncService.bootstrap_django(args.settings, ROOT)
+    if not args.login_throttle:
+        from sync import views
+        from sync.throttle import LoginThrottle
+
+        views._login_throttle = LoginThrottle({"enabled": False})
+    cfg = {"server": args.server}
+    threading.Thread(target=SyncService.warm_up_and_announce, args=(args.host, args.port, cfg),
+                     name="warmup", daemon=True).start()
+    SyncService.run_server(args.host, args.port, cfg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="run the service against a seeded fake database")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--server", default="waitress", choices=("waitress", "asgi", "runserver"))
+    p.add_argument("--settings", default="django_sync.settings")
+    p.add_argument("--products", type=int, default=20000)
+    p.add_argument("--users", type=int, default=50)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--db", help="SQLite file to create (default: temp dir)")
+    p.add_argument("--login-throttle", action="store_true", help="keep the per-IP / per-user login throttle")
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Multi-device load generator
+Simulates N handhelds against a running server. Each device logs in once,
+then loops over a weighted mix of operations until the duration is over:
+  • download - GET /data-download (full catalog payload)
+  • details  - GET /product-details
+  • upload   - POST /upload-orders with --upload-rows rows
+  • verify   - GET /verify-token (cheap authenticated call)
+Every device keeps one HTTP/1.1 keep-alive connection, like the app does.
+Logins are staggered (--login-stagger) and a 429 from the login throttle is
+retried after its Retry-After, so all devices get in even when they share
+one client IP. Reports how many devices logged in, and per operation and
+overall: count, errors, throughput and p50 / p95 / p99 latency.
+
+Usage (from the project root):
+    python -m benchmarks.loadgen --devices 20 --duration 30 [--url http://127.0.0.1:8000]
+        [--mix download=1,details=1,upload=2,verify=6] [--upload-rows 20] [--json]
+    python -m benchmarks.loadgen --spawn ...      # start benchmarks.fake_sqlanydb serve first
+Spawned servers use the fake SQL Anywhere driver (users user1..userN / "pass")
+and run with the login throttle off.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "download=1,details=1,upload=2,verify=6"
+DEFAULT_LOGIN_STAGGER = 0.05           # seconds between device logins
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"unknown operation(s) in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+# ------------------ device ------------------
+class Device:
+    def __init__(self, index, base_url, userid, password, upload_rows):
+        url = urlsplit(base_url)
+        self.index = index
+        self.host, self.port = url.hostname, url.port or 80
+        self.userid, self.password = userid, password
+        self.upload_rows = upload_rows
+        self.token = None
+        self.conn = None
+        self.retry_after = None
+
+    def request(self, method, path, body=None):
+        headers = {"Connection": "keep-alive", "X-Device-ID": f"loadgen-{self.index}"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if body is not None:
+            body = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                self.retry_after = resp.getheader("Retry-After")
+                return resp.status, data
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None             # server closed the keep-alive - reconnect once
+                if attempt == 2:
+                    raise
+
+    def login(self):
+        status, data = self.request("POST", "/login", {"userid": self.userid, "password": self.password})
+        if status == 200:
+            self.token = json.loads(data)["token"]
+        return status
+
+    def download(self):
+        return self.request("GET", "/data-download")[0]
+
+    def details(self):
+        return self.request("GET", "/product-details")[0]
+
+    def verify(self):
+        return self.request("GET", "/verify-token")[0]
+
+    def upload(self):
+        orders = [{
+            "item": f"P{random.randint(1, 1000):06d}",
+            "qty": random.randint(1, 20),
+            "barcode": f"89{random.randint(1, 1000):08d}0",
+            "mrp": round(random.uniform(10, 900), 2),
+            "remark": f"loadgen device {self.index}",
+        } for _ in range(self.upload_rows)]
+        return self.request("POST", "/upload-orders", {"orders": orders})[0]
+
+
+OPERATIONS = {
+    "download": Device.download,
+    "details": Device.details,
+    "upload": Device.upload,
+    "verify": Device.verify,
+}
+
+
+# ------------------ run ------------------
+def _login(device, deadline, samples):
+    """Log in, waiting out 429s (Retry-After) until the run ends; returns (status, retries)."""
+    retries = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            status = device.login()
+        except (http.client.HTTPException, OSError):
+            status = None
+        samples.append(time.perf_counter() - started)
+        if status != 429:
+            return status, retries
+        try:
+            wait = float(device.retry_after or 1)
+        except ValueError:
+            wait = 1.0
+        if time.monotonic() + wait >= deadline:
+            return status, retries
+        retries += 1
+        time.sleep(wait)
+
+
+def _device_loop(device, mix, deadline, results, lock, start_delay=0.0):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {name: [] for name in ["login"] + names}
+    errors = {name: 0 for name in samples}
+
+    time.sleep(start_delay)
+    login_status, retries = _login(device, deadline, samples["login"])
+    if login_status != 200:
+        errors["login"] += 1
+    else:
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = OPERATIONS[name](device)
+            except (http.client.HTTPException, OSError):
+                status = None
+            samples[name].append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                errors[name] += 1
+
+    with lock:
+        results["logged_in"] += login_status == 200
+        results["login_retries"] += retries
+        for name in samples:
+            results["samples"].setdefault(name, []).extend(samples[name])
+            results["errors"][name] = results["errors"].get(name, 0) + errors[name]
+
+
+def run(url, devices, duration, mix, upload_rows, users, password, login_stagger=DEFAULT_LOGIN_STAGGER):
+    results = {"samples": {}, "errors": {}, "logged_in": 0, "login_retries": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=_device_loop,
+            args=(Device(i, url, f"user{i % users + 1}", password, upload_rows), mix, deadline, results, lock,
+                  i * login_stagger),
+            name=f"device-{i}", daemon=True,
+        )
+        for i in range(devices)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return summarize(results, wall, devices)
+
+
+def summarize(results, wall, devices):
+    def stats(values, errors):
+        values = sorted(values)
+        ms = lambda v: None if v is None else round(v * 1000, 1)
+        return {
+            "count": len(values),
+            "errors": errors,
+            "throughput_rps": round(len(values) / wall, 1) if wall else None,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1] if values else None),
+        }
+
+    ops = {name: stats(v, results["errors"].get(name, 0)) for name, v in results["samples"].items()}
+    everything = [v for name, vals in results["samples"].items() if name != "login" for v in vals]
+    overall = stats(everything, sum(e for n, e in results["errors"].items() if n != "login"))
+    return {"devices": devices, "logged_in": results["logged_in"], "login_retries": results["login_retries"],
+            "wall_seconds": round(wall, 2), "operations": ops, "overall": overall}
+
+
+# ------------------ spawned server ------------------
+def spawn_server(port, products, server):
+    cmd = [sys.executable, "-m", "benchmarks.fake_sqlanydb", "serve",
+           "--port", str(port), "--products", str(products), "--server", server]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"fake server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit("fake server did not become ready within 120 s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument("--upload-rows", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50, help="devices log in as user1..userN")
+    parser.add_argument("--password", default="pass")
+    parser.add_argument("--login-stagger", type=float, default=DEFAULT_LOGIN_STAGGER, help="seconds between logins")
+    parser.add_argument("--spawn", action="store_true", help="start a fake-DB server on --url's port")
+    parser.add_argument("--products", type=int, default=20000, help="catalog size for --spawn")
+    parser.add_argument("--server", default="waitress", choices=("waitress", "asgi", "runserver"))
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    proc = spawn_server(urlsplit(args.url).port or 80, args.products, args.server) if args.spawn else None
+    try:
+        report = run(args.url, args.devices, args.duration, mix, args.upload_rows, args.users, args.password,
+                     args.login_stagger)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['logged_in']}/{args.devices} devices logged in "
+          f"({report['login_retries']} throttled retries), {report['wall_seconds']} s")
+    print(f"{'operation':<10}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report["operations"].items()) + [("overall", report["overall"])]
+    for name, r in rows:
+        cells = [r["p50_ms"], r["p95_ms"], r["p99_ms"]]
+        print(f"{name:<10}{r['count']:>8}{r['errors']:>8}{r['throughput_rps']:>9}"
+              + "".join(f"{'-' if c is None else c:>10}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Micro-benchmarks for the per-row coercion / serialization hot paths
+Each case runs in-process on synthetic rows shaped like the real queries,
+at 1k / 10k / 100k rows:
+  • to_float / to_decimal / coerce_date - the value coercion helpers
+  • group_orders          - flat upload rows → grouped entries
+  • product_dicts         - /data-download catalog rows → dicts
+  • product_detail_dicts  - /product-details rows → dicts
+  • product_details_json  - JsonResponse encoding of those dicts
+  • data_version          - catalog digest (json.dumps of every row)
+Reported per case and size: rows/s (best of several runs) and peak
+tracemalloc bytes for one run.
+
+Regression gate: results are compared with benchmarks/microbench_baseline.json
+and the exit code is 1 when throughput drops by more than --tolerance
+(default 30 %) or peak allocations grow by more than --alloc-tolerance
+(default 10 %). A regressed case is re-measured --retries times (default 2)
+before it counts, to ride out noisy neighbours. Throughput is
+machine-dependent - refresh the baseline on the reference machine with
+--save-baseline after an intended change.
+
+Usage (from the project root):
+    python -m benchmarks.microbench [--sizes 1000,10000,100000] [--cases to_float,...]
+        [--tolerance 0.30] [--alloc-tolerance 0.10] [--retries 2] [--save-baseline] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "microbench_baseline.json")
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_TOLERANCE = 0.30
+DEFAULT_ALLOC_TOLERANCE = 0.10
+MIN_RUN_SECONDS = 0.5                                 # keep repeating small sizes at least this long
+DEFAULT_RETRIES = 2                                   # re-measure suspected regressions before failing
+
+
+def _setup():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_sync.settings_api")
+    os.environ.setdefault("DEBUG", "False")
+    import django
+    django.setup()
+    logging.disable(logging.INFO)
+
+
+# ------------------ inputs ------------------
+def _money(rng):
+    return Decimal(f"{rng.uniform(1, 999):.2f}")
+
+def _float_values(n, rng):
+    kinds = (lambda: _money(rng), lambda: rng.randint(0, 500), lambda: None,
+             lambda: f"{rng.uniform(1, 99):.2f}", lambda: rng.uniform(1, 99))
+    return [kinds[i % len(kinds)]() for i in range(n)]
+
+def _decimal_values(n, rng):
+    kinds = (lambda: f"{rng.uniform(1, 99):.2f}", lambda: rng.randint(1, 20), lambda: rng.uniform(1, 99),
+             lambda: None, lambda: _money(rng), lambda: "n/a")
+    return [kinds[i % len(kinds)]() for i in range(n)]
+
+def _date_values(n, rng):
+    today = date.today()
+    kinds = (lambda d: d.isoformat(), lambda d: d.strftime("%Y/%m/%d"), lambda d: d.strftime("%d-%m-%Y"),
+             lambda d: d, lambda d: "")
+    return [kinds[i % len(kinds)](today - timedelta(days=rng.randint(0, 90))) for i in range(n)]
+
+def _flat_orders(n, rng):
+    return [{
+        "entry_no": i // 10,
+        "supplier_code": f"S{(i // 10) % 40}",
+        "order_date": (date.today() - timedelta(days=(i // 10) % 30)).isoformat(),
+        "userid": f"user{(i // 10) % 50}",
+        "barcode": f"89{i:08d}",
+        "quantity": rng.randint(1, 20),
+        "rate": f"{rng.uniform(1, 500):.2f}",
+        "mrp": f"{rng.uniform(1, 900):.2f}",
+    } for i in range(n)]
+
+def _catalog_rows(n, rng):
+    return [(f"P{i:06d}", f"Product {i}", f"89{i:08d}" if rng.random() > 0.05 else None,
+             Decimal(rng.randint(0, 500)), _money(rng), _money(rng), _money(rng), "")
+            for i in range(n)]
+
+def _detail_rows(n, rng):
+    today = date.today()
+    rows = []
+    for i in range(n):
+        has_batch = rng.random() > 0.1
+        batch = ((f"P{i:06d}", f"89{i:08d}", Decimal(rng.randint(0, 500)), _money(rng), _money(rng),
+                  _money(rng), _money(rng), _money(rng), f"S{rng.randint(1, 40)}",
+                  today + timedelta(days=rng.randint(30, 720)))
+                 if has_batch else (None,) * 10)
+        rows.append((f"P{i:06d}", f"Product {i}", "FOOD", f"Item {i}", "Acme", "NOS", "GST18") + batch)
+    return rows
+
+
+# ------------------ cases ------------------
+def _cases():
+    """name → (make_input(n, rng), run(input)) - imports after django.setup()."""
+    from django.core.serializers.json import DjangoJSONEncoder
+    from sync import catalog, rows, views
+
+    def coerce_each(fn):
+        return lambda values: [fn(v) for v in values]
+
+    def details_json(rows):
+        return json.dumps({"status": "success", "count": len(rows), "data": rows},
+                          cls=DjangoJSONEncoder).encode("utf-8")
+
+    masters = [{"code": f"M{i:05d}", "name": f"Customer {i}", "place": "North"} for i in range(300)]
+
+    return {
+        "to_float": (_float_values, coerce_each(views._to_float)),
+        "to_decimal": (_decimal_values, coerce_each(views._to_decimal)),
+        "coerce_date": (_date_values, coerce_each(views._coerce_date)),
+        "group_orders": (_flat_orders, views._group_orders),
+        "product_dicts": (_catalog_rows, rows._product_dicts),
+        "product_detail_dicts": (_detail_rows, views._product_detail_dicts),
+        "product_details_json": (lambda n, rng: views._product_detail_dicts(_detail_rows(n, rng)), details_json),
+        "data_version": (lambda n, rng: rows._product_dicts(_catalog_rows(n, rng)),
+                         lambda products: catalog._data_version(masters, products)),
+    }
+
+
+# ------------------ measure ------------------
+def _time(fn, data):
+    fn(data)                                          # warm
+    best, spent, runs = float("inf"), 0.0, 0
+    while runs < 3 or (spent < MIN_RUN_SECONDS and runs < 50):
+        t0 = time.perf_counter()
+        fn(data)
+        elapsed = time.perf_counter() - t0
+        best, spent, runs = min(best, elapsed), spent + elapsed, runs + 1
+    return best
+
+def _peak_bytes(fn, data):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = fn(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def bench(sizes, names=None, seed=42, only=None):
+    results = {}
+    for name, (make_input, fn) in _cases().items():
+        if names and name not in names:
+            continue
+        for n in sizes:
+            if only is not None and f"{name}@{n}" not in only:
+                continue
+            data = make_input(n, random.Random(seed))
+            best = _time(fn, data)
+            peak = _peak_bytes(fn, data)
+            results[f"{name}@{n}"] = {
+                "case": name,
+                "rows": n,
+                "rows_per_s": round(n / best) if best else None,
+                "best_ms": round(best * 1000, 3),
+                "peak_bytes": peak,
+                "bytes_per_row": round(peak / n, 1),
+            }
+    return results
+
+
+# ------------------ baseline ------------------
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_baseline(results, path=BASELINE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, alloc_tolerance=DEFAULT_ALLOC_TOLERANCE):
+    """List of regression messages (empty = pass); cases missing from the baseline are skipped."""
+    failures = []
+    for key, current in results.items():
+        base = (baseline or {}).get("results", {}).get(key)
+        if not base:
+            continue
+        if base.get("rows_per_s") and current["rows_per_s"] < base["rows_per_s"] * (1 - tolerance):
+            failures.append(f"{key}: throughput {current['rows_per_s']:,} rows/s "
+                            f"< baseline {base['rows_per_s']:,} - {tolerance:.0%}")
+        if base.get("peak_bytes") and current["peak_bytes"] > base["peak_bytes"] * (1 + alloc_tolerance):
+            failures.append(f"{key}: peak {current['peak_bytes']:,} B "
+                            f"> baseline {base['peak_bytes']:,} B + {alloc_tolerance:.0%}")
+    return failures
+
+def _failed_keys(failures):
+    return {line.split(":", 1)[0] for line in failures}
+
+def recheck(results, baseline, tolerance, alloc_tolerance, retries):
+    """Re-measure only the regressed cases (noisy machines) and keep each case's best run."""
+    failures = compare(results, baseline, tolerance, alloc_tolerance)
+    for _ in range(retries):
+        if not failures:
+            break
+        keys = _failed_keys(failures)
+        sizes = sorted({results[k]["rows"] for k in keys})
+        for key, again in bench(sizes, {results[k]["case"] for k in keys}, only=keys).items():
+            best = results[key]
+            if again["rows_per_s"] > best["rows_per_s"]:
+                best.update(rows_per_s=again["rows_per_s"], best_ms=again["best_ms"])
+            if again["peak_bytes"] < best["peak_bytes"]:
+                best.update(peak_bytes=again["peak_bytes"], bytes_per_row=again["bytes_per_row"])
+        failures = compare(results, baseline, tolerance, alloc_tolerance)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--cases", default="", help="comma-separated subset (default: all)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed throughput drop")
+    parser.add_argument("--alloc-tolerance", type=float, default=DEFAULT_ALLOC_TOLERANCE, help="allowed peak growth")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="re-measurements of a regressed case")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    _setup()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = {c.strip() for c in args.cases.split(",") if c.strip()}
+    results = bench(sizes, names)
+
+    baseline = load_baseline(args.baseline)
+    failures = [] if args.save_baseline else recheck(
+        results, baseline, args.tolerance, args.alloc_tolerance, args.retries)
+
+    if args.json:
+        print(json.dumps({"results": results, "failures": failures}, indent=2))
+    else:
+        base_results = (baseline or {}).get("results", {})
+        print(f"{'case':<22}{'rows':>8}{'rows/s':>13}{'vs base':>9}{'peak KiB':>11}{'B/row':>8}")
+        for key, r in results.items():
+            base = base_results.get(key, {}).get("rows_per_s")
+            ratio = f"{r['rows_per_s'] / base:.2f}x" if base else "-"
+            print(f"{r['case']:<22}{r['rows']:>8}{r['rows_per_s']:>13,}{ratio:>9}"
+                  f"{r['peak_bytes'] / 1024:>11,.0f}{r['bytes_per_row']:>8}")
+        for line in failures:
+            print(f"❌ {line}")
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"💾 Baseline written to {args.baseline}", file=sys.stderr)
+    elif baseline is None:
+        print(f"⚠️ No baseline at {args.baseline} - run with --save-baseline", file=sys.stderr)
+    elif baseline.get("python") != platform.python_version():
+        print(f"⚠️ Baseline is from Python {baseline.get('python')}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: default vs "api" settings profile
+
+Measures, per profile, in fresh interpreters:
+  • cold start  - import django + django.setup() + first URL resolve
+  • per request - full middleware + view round trip through the test
+                  client for endpoints that do not touch SQL Anywhere
+                  (/status, /verify-token)
+
+Usage (from the project root):
+    python -m benchmarks.settings_profiles [--runs 5] [--requests 2000] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROFILES = {
+    "default": "django_sync.settings",
+    "api": "django_sync.settings_api",
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_COLD = r"""
+import time
+t0 = time.perf_counter()
+import django
+django.setup()
+from django.urls import resolve
+resolve("/status")
+print(time.perf_counter() - t0)
+"""
+
+_REQUESTS = r"""
+import sys, time, datetime
+import django
+django.setup()
+import jwt
+from django.test import Client
+from sync import views
+
+n = int(sys.argv[1])
+token = jwt.encode({"sub": "bench", "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)},
+                   views.JWT_SECRET, algorithm=views.JWT_ALGO)
+client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+for path in ("/status", "/verify-token"):
+    client.get(path)                                   # warm
+    t0 = time.perf_counter()
+    for _ in range(n):
+        client.get(path)
+    print(path, (time.perf_counter() - t0) / n)
+"""
+
+
+def _run(code, settings, *args):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings, DEBUG="False")
+    out = subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return [line for line in out.splitlines() if line and not line.startswith(("WARNING", "Install"))]
+
+
+def bench(runs, requests):
+    results = {}
+    for name, settings in PROFILES.items():
+        cold = [float(_run(_COLD, settings)[-1]) for _ in range(runs)]
+        per_request = {}
+        for line in _run(_REQUESTS, settings, str(requests)):
+            path, seconds = line.split()
+            per_request[path] = float(seconds) * 1e6
+        results[name] = {
+            "settings": settings,
+            "cold_start_ms_median": statistics.median(cold) * 1000,
+            "cold_start_ms_min": min(cold) * 1000,
+            "request_us": per_request,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="cold-start samples per profile")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    results = bench(args.runs, args.requests)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'profile':<10}{'cold start (ms)':>18}" + "".join(f"{p + ' (µs/req)':>24}" for p in ("/status", "/verify-token")))
+    for name, r in results.items():
+        print(f"{name:<10}{r['cold_start_ms_median']:>18.1f}"
+              + "".join(f"{r['request_us'][p]:>24.1f}" for p in ("/status", "/verify-token")))
+
+
+if __name__ == "__main__":
+    main()
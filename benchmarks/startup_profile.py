@@ -0,0 +1,143 @@
+"""
+Cold-start profiler for the service entry points
+
+Runs each measurement in a fresh interpreter and prints one JSON report:
+  • phases  - startup phases that need neither network nor SQL Anywhere:
+              import SyncService, django.setup(), first URLconf resolve,
+              migration fingerprint (the check that gates `migrate`)
+  • imports - `python -X importtime` for SyncService and sync.views
+              (after django.setup), top N modules by cumulative time
+  • lazy    - modules that must NOT be loaded by a normal startup
+  • budget  - every phase against STARTUP_BUDGET_MS
+
+STARTUP-TIME BUDGET
+  The numbers below are the ceiling for a cold start on the back-office
+  PCs (≈2x what a dev box measures, to absorb slow disks / AV scanning).
+  Network checks (license, company match) and the first DB connect are
+  excluded: they are cached / warmed separately. The lazy list is checked
+  by sync.tests.LazyImportTests; the budget by
+  benchmarks/test_startup_budget.py, which only runs with STARTUP_BUDGET=1
+  (wall-clock limits are for the reference PC, not for shared CI runners).
+
+Usage (from the project root):
+    python -m benchmarks.startup_profile [--json FILE] [--top 15]
+Exit code 1 when a phase is over budget or a lazy module got imported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS = "django_sync.settings"
+
+STARTUP_BUDGET_MS = {
+    "import SyncService": 60,           # stdlib only - requests is lazy
+    "django setup": 600,
+    "urlconf": 150,                     # imports sync.views + helpers
+    "migration fingerprint": 100,       # replaces a full `migrate` run
+}
+
+# only pulled in by rare paths: pair_check lock-file adoption, license refresh, GUI logos
+LAZY_MODULES = ("psutil", "requests", "PIL")
+
+_PHASES = r"""
+import json, sys, time
+out = {}
+t0 = time.perf_counter(); import SyncService
+out["import SyncService"] = (time.perf_counter() - t0) * 1000
+t0 = time.perf_counter(); SyncService.bootstrap_django(sys.argv[1], sys.argv[2])
+out["django setup"] = (time.perf_counter() - t0) * 1000
+t0 = time.perf_counter(); from django.urls import resolve; resolve("/status")
+out["urlconf"] = (time.perf_counter() - t0) * 1000
+t0 = time.perf_counter(); SyncService._migration_fingerprint()
+out["migration fingerprint"] = (time.perf_counter() - t0) * 1000
+lazy = json.loads(sys.argv[3])
+print(json.dumps({"phases": out, "loaded": [m for m in lazy if m in sys.modules]}))
+"""
+
+_IMPORTS = {
+    "SyncService": "import SyncService",
+    "sync.views": "import django; django.setup(); import sync.views",
+}
+
+
+def _python(code, *args, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code, *args]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=SETTINGS)
+    return subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def measure_phases():
+    proc = _python(_PHASES, SETTINGS, ROOT, json.dumps(LAZY_MODULES))
+    last = [line for line in proc.stdout.splitlines() if line.startswith("{")][-1]
+    data = json.loads(last)
+    data["phases"] = {k: round(v, 1) for k, v in data["phases"].items()}
+    return data
+
+
+def parse_importtime(stderr):
+    """`import time: self [us] | cumulative | imported package` → list of dicts."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def measure_imports(top):
+    report = {}
+    for target, code in _IMPORTS.items():
+        rows = parse_importtime(_python(code, importtime=True).stderr)
+        report[target] = {
+            "modules": len(rows),
+            "total_self_ms": round(sum(r["self_us"] for r in rows) / 1000, 1),
+            "top": sorted(rows, key=lambda r: r["cumulative_us"], reverse=True)[:top],
+        }
+    return report
+
+
+def profile(top=15):
+    phases = measure_phases()
+    budget = {
+        name: {
+            "ms": phases["phases"].get(name),
+            "budget_ms": limit,
+            "ok": phases["phases"].get(name, 0) <= limit,
+        }
+        for name, limit in STARTUP_BUDGET_MS.items()
+    }
+    return {
+        "phases": phases["phases"],
+        "imports": measure_imports(top),
+        "lazy": {"expected": list(LAZY_MODULES), "loaded": phases["loaded"]},
+        "budget": budget,
+        "ok": all(b["ok"] for b in budget.values()) and not phases["loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", metavar="FILE", help="also write the report to FILE")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list per entry point")
+    args = parser.parse_args()
+
+    report = profile(args.top)
+    text = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ import textwrap
 PROJECT_NAME = "TASK_MST_SYNC"          # Final EXE name
 ENTRY_SCRIPT = "gui_launcher.py"        # GUI entry point
 ICON_FILE = "TASK_MST.ico"              # ✅ EXE ICON
+SPEC_FILE = f"{PROJECT_NAME}.spec"      # trimmed Django collection - see spec
 
 # (source, destination-inside-dist)
 EXTRA_DATA = [
@@ -34,6 +35,8 @@ REQUIREMENTS = [
     "djangorestframework",
     "djangorestframework-simplejwt",
     "django-cors-headers",
+    "waitress",
+    "uvicorn",          # server: "asgi" (imported lazily, see TASK_MST_SYNC.spec)
 ]
 
 # =============================================================================
@@ -70,10 +73,6 @@ def pip_install(py):
     if os.path.exists("requirements.txt"):
         run([py, "-m", "pip", "install", "-r", "requirements.txt"])
 
-def add_data_arg(src, dst):
-    sep = ";" if os.name == "nt" else ":"
-    return f"{src}{sep}{dst}"
-
 def copy_extra(dist_root):
     for src, dst in EXTRA_DATA:
         if not os.path.exists(src):
@@ -95,37 +94,20 @@ def build():
     pip_install(py)
 
     # Clean previous builds (VERY IMPORTANT for icon refresh)
-    for p in (BUILD_DIR, DIST_DIR, DIST_ROOT, f"{PROJECT_NAME}.spec"):
+    for p in (BUILD_DIR, DIST_DIR, DIST_ROOT):
         if os.path.exists(p):
             if os.path.isdir(p):
                 shutil.rmtree(p, ignore_errors=True)
             else:
                 os.remove(p)
 
-    # --add-data args
-    add_data = []
-    for src, dst in EXTRA_DATA:
-        if os.path.exists(src):
-            add_data += ["--add-data", add_data_arg(src, dst)]
-
     # Django safety
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_sync.settings")
 
     # ================= PYINSTALLER COMMAND =================
-    cmd = [
-        py, "-m", "PyInstaller",
-        "--onefile",
-        "--windowed",                      # ✅ no console
-        f"--name={PROJECT_NAME}",
-        f"--icon={ICON_FILE}",             # ✅ EXE ICON
-
-        "--collect-all", "django",
-        "--collect-submodules", "django",
-        "--collect-submodules", "django_sync",
-
-        *add_data,
-        ENTRY_SCRIPT,
-    ]
+    # The spec holds data files, icon and the trimmed Django collection
+    # (collect_all('django') made the onefile extraction slow on every start)
+    cmd = [py, "-m", "PyInstaller", "--noconfirm", SPEC_FILE]
 
     print("\n🚀 Building GUI EXE with icon...")
     run(cmd)
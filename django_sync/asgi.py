@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_sync.settings')
+os.environ.setdefault('SYNC_ASYNC_VIEWS', '1')   # route to sync.async_views
 
 application = get_asgi_application()
@@ -38,13 +38,18 @@ INSTALLED_APPS = [
 # ---------- MIDDLEWARE ----------
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",        # MUST be top
-    "django.middleware.security.SecurityMiddleware",
+    "sync.request_log.RequestLogMiddleware",        # request id + JSON access line
+    "sync.devices.DeviceTelemetryMiddleware",       # per-device sync telemetry
+    "sync.metrics.MetricsMiddleware",               # per-view latency / status counts
+    "sync.tracing.TracingMiddleware",               # sampled request timelines
+    "sync.middleware.SecurityMiddleware",           # Django's, hooks inline under ASGI
     "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
+    "sync.middleware.CommonMiddleware",             # Django's, hooks inline under ASGI
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "sync.middleware.XFrameOptionsMiddleware",      # Django's, hook inline under ASGI
+    "sync.profiling.ProfilingMiddleware",           # MUST be last (runs the view itself)
 ]
 
 ROOT_URLCONF = "django_sync.urls"
@@ -68,6 +73,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "django_sync.wsgi.application"
 
+# ---------- SERVING MODE ----------
+# "1" → sync.urls routes to sync.async_views (set by django_sync.asgi)
+SYNC_ASYNC_VIEWS = os.getenv("SYNC_ASYNC_VIEWS", "0") == "1"
+
 # ---------- DATABASE (SQL Anywhere via DSN – no ORM) ----------
 # DATABASES = {
 #     'default': {
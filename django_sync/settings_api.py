@@ -0,0 +1,32 @@
+"""
+Lean "api" settings profile for the sync endpoints.
+
+Every sync view is csrf_exempt and authenticates with JWT, so admin,
+auth, sessions, messages, staticfiles, DRF and templates are dead weight
+on each request and at import time. Select with "profile": "api" in
+config.json (or DJANGO_SETTINGS_MODULE=django_sync.settings_api).
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "corsheaders",              # django-cors-headers
+    "sync",                     # our app
+]
+
+MIDDLEWARE = [
+    "corsheaders.middleware.CorsMiddleware",        # MUST be top
+    "sync.request_log.RequestLogMiddleware",        # request id + JSON access line
+    "sync.devices.DeviceTelemetryMiddleware",       # per-device sync telemetry
+    "sync.metrics.MetricsMiddleware",               # per-view latency / status counts
+    "sync.tracing.TracingMiddleware",               # sampled request timelines
+    "sync.middleware.SecurityMiddleware",           # Django's, hooks inline under ASGI
+    "sync.middleware.CommonMiddleware",             # Django's, hooks inline under ASGI
+    "sync.profiling.ProfilingMiddleware",           # MUST be last (runs the view itself)
+]
+
+ROOT_URLCONF = "django_sync.urls_api"
+
+TEMPLATES = []
+AUTH_PASSWORD_VALIDATORS = []
+USE_I18N = False
@@ -0,0 +1,8 @@
+"""
+URL configuration for the lean "api" settings profile (no admin).
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path("", include("sync.urls")),
+]
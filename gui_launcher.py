@@ -1,16 +1,20 @@
 import os
 import sys
+import atexit
 import json
+import queue
+import logging
 import threading
 import socket
+import time
 import tkinter as tk
+from collections import deque
 from tkinter import messagebox
 from datetime import datetime
+from logging.handlers import QueueListener, RotatingFileHandler
 import re
 import webbrowser
 
-from PIL import Image, ImageTk
-
 # ===============================
 # HIDE CONSOLE (WINDOWS)
 # ===============================
@@ -34,12 +38,17 @@ def base_dir():
 BASE_DIR = base_dir()
 
 # ===============================
-# IMPORT BACKEND
+# BACKEND (imported on Start - keeps the window fast to appear)
 # ===============================
-import SyncService
-
 PORT = 8000
 
+def load_image(name, size, resample=None):
+    # PIL is only needed for the logos - import it on first use
+    from PIL import Image, ImageTk
+    img = Image.open(os.path.join(BASE_DIR, name))
+    img = img.resize(size, resample) if resample is not None else img.resize(size)
+    return ImageTk.PhotoImage(img)
+
 # ===============================
 # GET LOCAL IP
 # ===============================
@@ -73,36 +82,208 @@ CONFIG_CID  = CONFIG.get("client_id", "(not set)")
 # ===============================
 # STDOUT REDIRECT → UI LOG
 # ===============================
-class Redirect:
+# write() only classifies + queues (any thread); the Tk thread drains the
+# queue in batches on a timer. The widget keeps the last LOG_MAX_LINES
+# lines; bursts are summarized there, the full log goes to
+# logs/gui_activity.log.
+def _cfg_int(key, default):
+    try:
+        return max(1, int(CONFIG.get(key, default)))
+    except (TypeError, ValueError):
+        return default
+
+LOG_MAX_LINES  = _cfg_int("gui_log_lines", 2000)     # ring kept in the widget
+LOG_DRAIN_MS   = _cfg_int("gui_log_drain_ms", 100)   # batch interval
+LOG_BATCH_MAX  = _cfg_int("gui_log_batch", 300)      # lines shown per drain before summarizing
+LOG_BURST_TAIL = 50                                  # newest lines always shown in a burst
+LOG_QUEUE_MAX  = 20000                               # beyond this, lines only reach the disk copy
+LOG_FILE_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+ERROR_WORDS = ("error", "exception", "mismatch", "aborted", "unauthorized")
+
+def classify(line):
+    """Tag for one line (warn > error > success > info), computed once per line."""
+    low = line.lower()
+    if "warning" in low or "⚠" in line:
+        return "warn"
+    if any(kw in low for kw in ERROR_WORDS):
+        return "error"
+    if "running" in low:
+        return "success"
+    return "info"
+
+def _data_dir():
+    # next to the EXE when frozen (BASE_DIR is the unpack folder then)
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return BASE_DIR
+
+def _open_disk_log():
+    try:
+        directory = os.path.join(_data_dir(), "logs")
+        os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(directory, "gui_activity.log"), maxBytes=LOG_FILE_BYTES,
+                                      backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+    except OSError:
+        return None
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.handleError = lambda record: None    # its stderr report would loop back into the log
+    return handler
+
+
+class LogPipeline:
     def __init__(self, widget):
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
         self.widget = widget
+        self.lock = threading.Lock()
+        self.overflow = 0                    # lines that never reached the queue (under self.lock)
+        self.disk_queue = None
+        disk = _open_disk_log()
+        if disk is not None:
+            # a listener thread writes the file; unbounded so the disk copy stays complete
+            self.disk_queue = queue.SimpleQueue()
+            listener = QueueListener(self.disk_queue, disk)
+            listener.start()
+            atexit.register(listener.stop)   # writes what is still queued
+
+    def put(self, msg):
+        """Any thread: split into lines, queue for the disk writer and the widget."""
+        ts = datetime.now().strftime("%H:%M:%S")
+        for line in msg.splitlines():
+            if not line.strip():
+                continue
+            text = f"[{ts}] {line}"
+            if self.disk_queue is not None:
+                self.disk_queue.put_nowait(logging.makeLogRecord({"msg": text}))
+            try:
+                self.queue.put_nowait((text, classify(line)))
+            except queue.Full:
+                with self.lock:
+                    self.overflow += 1
+
+    def _take_all(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            return batch
 
-    def write(self, msg):
-        if not msg.strip():
-            return
+    def drain(self):
+        """Tk thread: one insert per batch, then trim the ring."""
+        try:
+            batch = self._take_all()
+            with self.lock:
+                skipped, self.overflow = self.overflow, 0
+            if len(batch) > LOG_BATCH_MAX:
+                # burst: keep warnings / errors and the newest lines, summarize the rest
+                tail = len(batch) - LOG_BURST_TAIL
+                kept = [e for i, e in enumerate(batch) if i >= tail or e[1] != "info"][-LOG_BATCH_MAX:]
+                skipped += len(batch) - len(kept)
+                batch = kept
+            if skipped:
+                ts = datetime.now().strftime("%H:%M:%S")
+                batch.insert(0, (f"[{ts}] ⏩ {skipped} lines skipped (burst) - full log in logs/gui_activity.log",
+                                 "warn"))
+            if batch:
+                self._show(batch)
+        finally:
+            self.widget.after(LOG_DRAIN_MS, self.drain)
+
+    def _show(self, batch):
+        w = self.widget
+        at_bottom = w.yview()[1] >= 0.999
+        args = []
+        for text, tag in batch:
+            args += (text + "\n", tag)
+        w.insert(tk.END, *args)
+        lines = int(w.index("end-1c").split(".")[0]) - 1
+        if lines > LOG_MAX_LINES:
+            w.delete("1.0", f"{lines - LOG_MAX_LINES + 1}.0")
+        if at_bottom:
+            w.see(tk.END)
 
-        ts = datetime.now().strftime("%H:%M:%S")
-        tag = "info"
-
-        if "running" in msg.lower():
-            tag = "success"
-        if any(kw in msg.lower() for kw in ("error", "exception", "mismatch", "aborted", "unauthorized")):
-            tag = "error"
-        if "warning" in msg.lower() or "⚠" in msg:
-            tag = "warn"
-
-        self.widget.after(
-            0,
-            self.widget.insert,
-            tk.END,
-            f"[{ts}] {msg}\n",
-            tag
-        )
-        self.widget.after(0, self.widget.see, tk.END)
+
+class Redirect:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def write(self, msg):
+        if msg.strip():
+            self.pipeline.put(msg)
 
     def flush(self):
         pass
 
+# ===============================
+# DASHBOARD SAMPLER (in-process sync.metrics)
+# ===============================
+# A background thread diffs sync.metrics.snapshot() once a second - counters
+# and gauges only, never SQL Anywhere. The Tk timer just reads the histories.
+DASH_POINTS = 60                     # one minute of 1 s samples
+DASH_SAMPLE_SECONDS = 1.0
+DASH_TOP_VIEWS = 3
+DASH_GAUGES = ("sync_db_read_in_use", "sync_db_write_in_use", "sync_catalog_build_seconds")
+
+class DashboardSampler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {name: deque(maxlen=DASH_POINTS) for name in ("rps", "p95_ms", "db", "uploads", "catalog_s")}
+        self.rps_by_view = {}            # view → deque of req/s
+        self._prev = None
+
+    def start(self):
+        threading.Thread(target=self._run, name="dashboard-sampler", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(DASH_SAMPLE_SECONDS)
+            metrics = sys.modules.get("sync.metrics")    # loaded by the backend, never imported here
+            if metrics is None:
+                continue
+            try:
+                self._sample(metrics)
+            except Exception:
+                pass
+
+    def _sample(self, metrics):
+        snap = metrics.snapshot(DASH_GAUGES)
+        prev, self._prev = self._prev, snap
+        if prev is None:
+            return
+        elapsed = max(snap["ts"] - prev["ts"], 1e-6)
+
+        rps = {view: (n - prev["requests"].get(view, 0)) / elapsed for view, n in snap["requests"].items()}
+        # p95 of this interval only: bucket counts minus the previous sample's
+        window = None
+        for view, counts in snap["latency"].items():
+            before = prev["latency"].get(view) or [0] * len(counts)
+            delta = [a - b for a, b in zip(counts, before)]
+            window = delta if window is None else [a + b for a, b in zip(window, delta)]
+        p95 = metrics.quantile(window, 0.95) if window else None
+
+        gauges = snap["gauges"]
+        with self.lock:
+            self.series["rps"].append(sum(rps.values()))
+            self.series["p95_ms"].append(None if p95 is None else p95 * 1000)
+            self.series["db"].append((gauges.get("sync_db_read_in_use") or 0) + (gauges.get("sync_db_write_in_use") or 0))
+            self.series["uploads"].append(max(0, snap["in_flight"].get("upload_orders", 0)))
+            self.series["catalog_s"].append(gauges.get("sync_catalog_build_seconds"))
+            for view in set(rps) | set(self.rps_by_view):
+                history = self.rps_by_view.get(view)
+                if history is None:         # first seen: pad so it lines up with the other series
+                    history = self.rps_by_view[view] = deque([0.0] * (len(self.series["rps"]) - 1), maxlen=DASH_POINTS)
+                history.append(rps.get(view, 0.0))
+
+    def read(self):
+        """Copies for the Tk thread: ({name: [...]}, [(view, [...]), ...] busiest first)."""
+        with self.lock:
+            series = {name: list(values) for name, values in self.series.items()}
+            views = sorted(((v, list(h)) for v, h in self.rps_by_view.items()),
+                           key=lambda item: item[1][-1] if item[1] else 0, reverse=True)
+        return series, [item for item in views if item[1] and item[1][-1] > 0][:DASH_TOP_VIEWS]
+
 # ===============================
 # BACKEND CONTROL
 # ===============================
@@ -131,11 +312,12 @@ def start_backend():
     def run():
         global backend_running
         try:
+            import SyncService
             SyncService.main()
         except SystemExit:
             pass  # error already printed to terminal log above
         except Exception as e:
-            log.insert(tk.END, f"❌ Backend crashed: {e}\n", "error")
+            log_pipeline.put(f"❌ Backend crashed: {e}")
 
         backend_running = False
         update_status(False)
@@ -179,14 +361,11 @@ header_inner.pack(fill="both", expand=True, padx=30, pady=20)
 left = tk.Frame(header_inner, bg="#ffffff")
 left.pack(side="left")
 
-try:
-    img = Image.open(os.path.join(BASE_DIR, "TASK_MST.png")).resize((48, 48))
-    logo_img = ImageTk.PhotoImage(img)
-    logo_lbl = tk.Label(left, image=logo_img, bg="#ffffff")
-    logo_lbl.image = logo_img
-    logo_lbl.pack(side="left", padx=(0, 15))
-except Exception:
-    pass
+# blank placeholder of the logo's size - the PNG is swapped in after the first paint
+logo_blank = tk.PhotoImage(width=48, height=48)
+logo_lbl = tk.Label(left, image=logo_blank, bg="#ffffff")
+logo_lbl.image = logo_blank
+logo_lbl.pack(side="left", padx=(0, 15))
 
 title_box = tk.Frame(left, bg="#ffffff")
 title_box.pack(side="left")
@@ -312,6 +491,78 @@ tk.Label(
     bg="#f8fafc"
 ).pack(side="left", padx=(6, 0))
 
+# ===============================
+# PERFORMANCE DASHBOARD
+# ===============================
+DASH_BG = "#ffffff"
+DASH_COLORS = ("#3b82f6", "#22c55e", "#f59e0b")
+SPARK_W, SPARK_H = 170, 38
+
+dashboard = tk.Frame(root, bg=DASH_BG, highlightbackground="#e2e8f0", highlightthickness=1)
+dashboard.pack(fill="x", padx=30, pady=(0, 20))
+
+def _dash_card(title, colors=DASH_COLORS[:1]):
+    card = tk.Frame(dashboard, bg=DASH_BG)
+    card.pack(side="left", fill="x", expand=True, padx=10, pady=8)
+    tk.Label(card, text=title, font=("Segoe UI", 9, "bold"), fg="#64748b", bg=DASH_BG).pack(anchor="w")
+    value = tk.Label(card, text="–", font=("Segoe UI", 12, "bold"), fg="#0f172a", bg=DASH_BG, anchor="w")
+    value.pack(anchor="w", fill="x")
+    canvas = tk.Canvas(card, width=SPARK_W, height=SPARK_H, bg="#f8fafc", highlightthickness=0)
+    canvas.pack(anchor="w")
+    lines = [canvas.create_line(0, 0, 0, 0, fill=c, width=2, state="hidden") for c in colors]
+    return value, canvas, lines
+
+def _spark(canvas, line, values, top):
+    points = [(i, v) for i, v in enumerate(values) if v is not None]
+    if len(points) < 2:
+        canvas.itemconfigure(line, state="hidden")
+        return
+    step = SPARK_W / (DASH_POINTS - 1)
+    offset = DASH_POINTS - len(values)           # newest sample at the right edge
+    coords = []
+    for i, v in points:
+        coords += ((offset + i) * step, SPARK_H - 3 - (SPARK_H - 6) * min(v / top, 1.0))
+    canvas.coords(line, *coords)
+    canvas.itemconfigure(line, state="normal")
+
+def _fmt(value, unit, digits=1):
+    return "–" if value is None else f"{value:.{digits}f}{unit}"
+
+dash_rps    = _dash_card("REQUESTS / S (TOP ENDPOINTS)", DASH_COLORS)
+dash_p95    = _dash_card("P95 LATENCY")
+dash_db     = _dash_card("DB CONNECTIONS IN USE")
+dash_upload = _dash_card("UPLOADS IN PROGRESS")
+dash_build  = _dash_card("LAST CATALOG BUILD")
+
+dash_sampler = DashboardSampler()
+
+def refresh_dashboard():
+    try:
+        series, views = dash_sampler.read()
+        value, canvas, lines = dash_rps
+        top = max([1.0] + [v for _, h in views for v in h])
+        for line, (view, history) in zip(lines, views):
+            _spark(canvas, line, history, top)
+        for line in lines[len(views):]:
+            canvas.itemconfigure(line, state="hidden")
+        total = series["rps"][-1] if series["rps"] else None
+        value.config(text=_fmt(total, " req/s") + "".join(f"  {v} {h[-1]:.1f}" for v, h in views[:2]))
+
+        for (value, canvas, (line,)), name, unit, floor, digits in (
+            (dash_p95, "p95_ms", " ms", 50.0, 0),
+            (dash_db, "db", "", 4.0, 0),
+            (dash_upload, "uploads", "", 2.0, 0),
+            (dash_build, "catalog_s", " s", 1.0, 2),
+        ):
+            history = series[name]
+            _spark(canvas, line, history, max([floor] + [v for v in history if v is not None]))
+            value.config(text=_fmt(history[-1] if history else None, unit, digits))
+    finally:
+        root.after(int(DASH_SAMPLE_SECONDS * 1000), refresh_dashboard)
+
+dash_sampler.start()
+root.after(int(DASH_SAMPLE_SECONDS * 1000), refresh_dashboard)
+
 # ===============================
 # LOG AREA
 # ===============================
@@ -349,8 +600,10 @@ log.tag_config("warn",    foreground="#f59e0b")
 log.tag_config("info",    foreground="#3b82f6")
 
 # Redirect stdout/stderr
-sys.stdout = Redirect(log)
-sys.stderr = Redirect(log)
+log_pipeline = LogPipeline(log)
+sys.stdout = Redirect(log_pipeline)
+sys.stderr = Redirect(log_pipeline)
+log.after(LOG_DRAIN_MS, log_pipeline.drain)
 
 update_status(False)
 log.insert(tk.END, "⚡ TASK MST Sync Tool initialized\n", "info")
@@ -368,15 +621,11 @@ footer_inner.pack(expand=True)
 def open_imcbs(e=None):
     webbrowser.open("https://www.imcbs.com")
 
-try:
-    imcbs_img = Image.open(os.path.join(BASE_DIR, "imcbs_logo.png")).resize((130, 50), Image.LANCZOS)
-    imcbs_photo = ImageTk.PhotoImage(imcbs_img)
-    imcbs_logo_lbl = tk.Label(footer_inner, image=imcbs_photo, bg="#f1f5f9", cursor="hand2")
-    imcbs_logo_lbl.image = imcbs_photo
-    imcbs_logo_lbl.pack(side="left", padx=(0, 10), pady=5)
-    imcbs_logo_lbl.bind("<Button-1>", open_imcbs)
-except Exception:
-    pass
+imcbs_blank = tk.PhotoImage(width=130, height=50)
+imcbs_logo_lbl = tk.Label(footer_inner, image=imcbs_blank, bg="#f1f5f9", cursor="hand2")
+imcbs_logo_lbl.image = imcbs_blank
+imcbs_logo_lbl.pack(side="left", padx=(0, 10), pady=5)
+imcbs_logo_lbl.bind("<Button-1>", open_imcbs)
 
 powered_lbl = tk.Label(
     footer_inner,
@@ -389,4 +638,17 @@ powered_lbl = tk.Label(
 powered_lbl.pack(side="left", pady=5)
 powered_lbl.bind("<Button-1>", open_imcbs)
 
-root.mainloop()
\ No newline at end of file
+def load_logos():
+    # PIL import + PNG decode once the window is up, so it never delays the first paint
+    for lbl, name, size, lanczos in ((logo_lbl, "TASK_MST.png", (48, 48), False),
+                                     (imcbs_logo_lbl, "imcbs_logo.png", (130, 50), True)):
+        try:
+            from PIL import Image
+            photo = load_image(name, size, Image.LANCZOS if lanczos else None)
+        except Exception:
+            continue
+        lbl.configure(image=photo)
+        lbl.image = photo
+
+root.after_idle(load_logos)
+root.mainloop()
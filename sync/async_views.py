@@ -0,0 +1,192 @@
+"""
+Async variants of the sync endpoints - used when serving over ASGI
+  • DB-bound views run on a bounded executor (async_db_workers threads);
+    once async_db_queue more requests are waiting, new ones get 503 +
+    Retry-After instead of piling up behind the database. Only DB work
+    takes a slot: the bearer token and the login throttle are checked on
+    the event loop first, and coalesced followers (get_product_details)
+    wait for their leader on the loop, not on a DB thread.
+  • /status, /ready, /metrics and /verify-token never touch the DB and are answered on the
+    event loop, so they never queue behind catalog downloads. The middleware
+    in settings_api is async-capable too; the full settings' session / CSRF /
+    auth / messages middleware still run their hooks through sync_to_async.
+  • pair_check (may launch the SyncService exe) and the diagnostics file
+    views use a small io executor.
+  • X-Profile: 1 from an admin profiles the sync view inside the executor
+    (profiling.run_view); loop-only endpoints answer X-Profile: unsupported.
+  • Streamed downloads read the file on their own executor
+    (async_stream_workers threads), one 256 KB block per hop, so slow
+    clients never wait behind pair_check or each other's 4 KB reads.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.http import FileResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import catalog, http_range, metrics, profiling, views
+from .sql_helper import _get_config
+
+DEFAULT_DB_WORKERS = 8
+DEFAULT_DB_QUEUE = 32
+DEFAULT_STREAM_WORKERS = 4
+RETRY_AFTER_SECONDS = 2
+
+
+def _limits():
+    cfg = _get_config()
+    try:
+        workers = max(1, int(cfg.get("async_db_workers", DEFAULT_DB_WORKERS)))
+        queue = max(0, int(cfg.get("async_db_queue", DEFAULT_DB_QUEUE)))
+        streams = max(1, int(cfg.get("async_stream_workers", DEFAULT_STREAM_WORKERS)))
+    except (TypeError, ValueError):
+        workers, queue, streams = DEFAULT_DB_WORKERS, DEFAULT_DB_QUEUE, DEFAULT_STREAM_WORKERS
+    return workers, queue, streams
+
+DB_WORKERS, DB_QUEUE, STREAM_WORKERS = _limits()
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+_io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="io")
+_stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="stream")
+_db_in_flight = 0          # only touched from the event loop thread
+_flights = {}              # coalesce key → leader task, event loop thread only
+
+
+metrics.Gauge("sync_async_db_in_flight", "DB-bound async requests running or queued", lambda: _db_in_flight)
+
+
+# ------------------ helpers ------------------
+def db_stats():
+    return {
+        "workers": DB_WORKERS,
+        "queue_limit": DB_QUEUE,
+        "in_flight": _db_in_flight,
+        "queued": max(0, _db_in_flight - DB_WORKERS),
+    }
+
+def _busy():
+    resp = JsonResponse({"detail": "Server busy, retry shortly"}, status=503)
+    resp["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return resp
+
+def _stream_async(resp):
+    """Feed sync file iterators to the ASGI handler, one large block per executor hop."""
+    if not getattr(resp, "streaming", False) or resp.is_async:
+        return resp
+    if isinstance(resp, FileResponse):
+        resp.block_size = http_range.CHUNK_SIZE   # default 4 KB = one hop per 4 KB
+    chunks = iter(resp.streaming_content)
+
+    async def agen():
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(_stream_executor, next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    resp.streaming_content = agen()
+    return resp
+
+async def _offload(executor, view, request, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    resp = await loop.run_in_executor(executor, lambda: ctx.run(profiling.run_view, view, request, *args, **kwargs))
+    return _stream_async(resp)
+
+async def _run_db(view, request, *args, **kwargs):
+    global _db_in_flight
+    if _db_in_flight >= DB_WORKERS + DB_QUEUE:
+        return _busy()
+    _db_in_flight += 1
+    try:
+        return await _offload(_db_executor, view, request, *args, **kwargs)
+    finally:
+        _db_in_flight -= 1
+
+async def _run_db_coalesced(coalesced_view, request):
+    """views.coalesced on the loop: one DB slot per key, followers await the leader's task."""
+    view = coalesced_view.uncoalesced
+    key = (view.__name__, request.method, request.get_full_path())
+    flight = _flights.get(key)
+    if flight is None:
+        async def lead():
+            return views._share(await _run_db(view, request))
+
+        flight = _flights[key] = asyncio.ensure_future(lead())
+        flight.add_done_callback(lambda _: _flights.pop(key, None))
+        shared = await asyncio.shield(flight)      # a dropped leader does not cancel its followers
+    else:
+        try:
+            shared = await asyncio.wait_for(asyncio.shield(flight), catalog.flight_timeout())
+        except asyncio.TimeoutError:
+            return views._busy()
+    return views._unshare(shared)
+
+def _token_checked(view):
+    """jwt_required on the event loop, so a bad token never takes a DB slot."""
+    @wraps(view)
+    async def _wrapped(request, *args, **kwargs):
+        denied = views._authenticate(request)
+        if denied is not None:
+            return denied
+        return await view(request, *args, **kwargs)
+    return _wrapped
+
+
+# ------------------ endpoints ------------------
+@csrf_exempt
+async def pair_check(request):
+    return await _offload(_io_executor, views.pair_check, request)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def login(request):
+    credentials, denied = views._login_gate(request)   # throttle before taking a DB slot
+    if denied is not None:
+        return denied
+    return await _run_db(views._check_credentials, request, *credentials)
+
+async def verify_token(request):
+    return views.verify_token(request)
+
+@_token_checked
+async def data_download(request):
+    return await _run_db(views.data_download, request)
+
+@_token_checked
+async def catalog_db(request):
+    return await _run_db(views.catalog_db, request)
+
+@csrf_exempt
+@_token_checked
+async def upload_orders(request):
+    return await _run_db(views.upload_orders, request)
+
+async def get_status(request):
+    return views.get_status(request)
+
+async def profile_list(request):
+    return await _offload(_io_executor, views.profile_list, request)
+
+async def profile_download(request, capture_id):
+    return await _offload(_io_executor, views.profile_download, request, capture_id)
+
+async def metrics_view(request):
+    return views.metrics_view(request)
+
+async def ready(request):
+    return views.ready(request)
+
+@_token_checked
+async def get_product_details(request):
+    return await _run_db_coalesced(views.get_product_details, request)
+
+@_token_checked
+async def index_report(request):
+    return await _run_db(views.index_report, request)
+
+async def device_summary(request):
+    return await _offload(_io_executor, views.device_summary, request)
@@ -0,0 +1,364 @@
+"""
+Catalog builder - versioned snapshots of the master + product data
+Each build writes two files for the same version:
+  • catalog-<version>.sqlite3 - indexed SQLite store devices swap in as-is
+  • payload-<version>.json    - the /data-download body, served with Range
+The previous version is kept so interrupted downloads can resume on it.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import metrics
+from .rows import _master_dicts, _product_dicts
+from .singleflight import SingleFlight
+from .sql_helper import get_read_connection, _get_config, _data_dir
+
+# Bump when the table layout inside the catalog file changes
+SCHEMA_VERSION = 1
+
+CATALOG_DIR = "catalog_cache"
+MANIFEST = "catalog.json"
+DEFAULT_REFRESH_SECONDS = 300
+# fresh() serves a snapshot older than this and refreshes it in the background,
+# so under steady traffic a download reflects the DB as of at most
+# catalog_max_age_seconds + one build (build_seconds) ago; responses say how
+# old theirs is (snapshot_headers: Age, X-Catalog-Built-At).
+DEFAULT_MAX_AGE_SECONDS = 60
+DEFAULT_FLIGHT_TIMEOUT = 120
+
+MASTER_SQL = """
+    SELECT code, name, place
+    FROM acc_master
+    WHERE super_code = 'SUNCR'
+"""
+
+PRODUCT_SQL = """
+    SELECT
+        p.code,
+        p.name,
+        pb.barcode,
+        pb.quantity,
+        pb.salesprice,
+        pb.bmrp,
+        pb.cost,
+        pb.text1
+    FROM acc_product p
+    LEFT JOIN acc_productbatch pb
+        ON p.code = pb.productcode
+"""
+
+_SCHEMA = """
+    CREATE TABLE meta    (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE master  (code TEXT, name TEXT, place TEXT);
+    CREATE TABLE product (code TEXT, name TEXT, barcode TEXT,
+                          quantity REAL, salesprice REAL, bmrp REAL,
+                          cost REAL, text1 TEXT);
+"""
+
+_INDEXES = """
+    CREATE INDEX ix_master_code     ON master (code);
+    CREATE INDEX ix_product_barcode ON product (barcode);
+    CREATE INDEX ix_product_code    ON product (code);
+    CREATE INDEX ix_product_name    ON product (name);
+"""
+
+_flight = SingleFlight()
+_state_lock = threading.Lock()
+_current = None          # manifest dict of the file being served
+_builder = None          # background refresh thread
+_wakeup = threading.Event()
+
+
+# ------------------ helpers ------------------
+def _catalog_dir():
+    path = _data_dir() / CATALOG_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _refresh_seconds():
+    try:
+        return max(30, int(_get_config().get("catalog_refresh_seconds", DEFAULT_REFRESH_SECONDS)))
+    except (TypeError, ValueError):
+        return DEFAULT_REFRESH_SECONDS
+
+def _max_age_seconds():
+    try:
+        return max(0, int(_get_config().get("catalog_max_age_seconds", DEFAULT_MAX_AGE_SECONDS)))
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_AGE_SECONDS
+
+def flight_timeout():
+    """Seconds a coalesced caller waits for the in-flight computation."""
+    try:
+        return max(1, int(_get_config().get("singleflight_timeout_seconds", DEFAULT_FLIGHT_TIMEOUT)))
+    except (TypeError, ValueError):
+        return DEFAULT_FLIGHT_TIMEOUT
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _data_version(master_data, product_data):
+    """Version = digest of the rows, so an unchanged DB keeps its version."""
+    h = hashlib.sha256()
+    h.update(f"schema={SCHEMA_VERSION}".encode())
+    for part in (master_data, product_data):
+        h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def fetch_catalog(cur):
+    """Run the two catalog queries and shape them like /data-download does."""
+    cur.execute(MASTER_SQL)
+    master_data = _master_dicts(cur.fetchall())
+    cur.execute(PRODUCT_SQL)
+    product_data = _product_dicts(cur.fetchall())
+    return master_data, product_data
+
+def prepare_statements():
+    """
+    Run each catalog query once and read a single row, so SQL Anywhere has
+    parsed and optimized it and the table pages are cached before the first
+    download. Returns the number of statements warmed.
+    """
+    statements = (MASTER_SQL, PRODUCT_SQL)
+    conn = get_read_connection()
+    cur = conn.cursor()
+    try:
+        for sql in statements:
+            cur.execute(sql)
+            cur.fetchone()
+    finally:
+        try:
+            cur.close()
+            conn.close()
+        except Exception:
+            pass
+    return len(statements)
+
+def _write_sqlite(path, version, master_data, product_data):
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.executescript(_SCHEMA)
+        db.executemany(
+            "INSERT INTO master VALUES (:code, :name, :place)",
+            master_data,
+        )
+        db.executemany(
+            "INSERT INTO product VALUES (:code, :name, :barcode, :quantity,"
+            " :salesprice, :bmrp, :cost, :text1)",
+            product_data,
+        )
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", version),
+            ("schema_version", str(SCHEMA_VERSION)),
+            ("built_at", datetime.now().isoformat()),
+            ("master_rows", str(len(master_data))),
+            ("product_rows", str(len(product_data))),
+        ])
+        db.commit()
+        # indexes after the bulk insert, then compact + planner stats
+        db.executescript(_INDEXES)
+        db.execute("ANALYZE")
+        db.commit()
+        db.execute("VACUUM")
+    finally:
+        db.close()
+
+def _write_payload(path, master_data, product_data):
+    """Same body JsonResponse would produce for /data-download."""
+    body = json.dumps({
+        "status": "success",
+        "master_data": master_data,
+        "product_data": product_data
+    }, cls=DjangoJSONEncoder).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(body)
+
+def _prune(keep):
+    """Remove old snapshot files; the previous version stays for in-flight downloads."""
+    directory = _catalog_dir()
+    for old in list(directory.glob("catalog-*.sqlite3")) + list(directory.glob("payload-*.json")):
+        if old.name in keep:
+            continue
+        try:
+            old.unlink()
+        except OSError:
+            pass  # still open by a download (Windows) - next build retries
+
+def _load_manifest():
+    path = _catalog_dir() / MANIFEST
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if (info.get("schema_version") == SCHEMA_VERSION
+                and (_catalog_dir() / info["file"]).exists()
+                and (_catalog_dir() / info.get("payload_file", "")).is_file()):
+            return info
+    except Exception:
+        pass
+    return None
+
+
+# ------------------ public API ------------------
+def current():
+    """Manifest of the catalog file being served, or None if not built yet."""
+    global _current
+    with _state_lock:
+        if _current is None:
+            _current = _load_manifest()
+        return _current
+
+def last_build():
+    """(build_seconds, built_at) of the snapshot in memory - no file or DB access."""
+    info = _current
+    if not info:
+        return None, None
+    return info.get("build_seconds"), info.get("built_at")
+
+metrics.Gauge("sync_catalog_build_seconds", "Duration of the last catalog build", lambda: last_build()[0])
+
+def catalog_path(info):
+    return _catalog_dir() / info["file"]
+
+def payload_path(info):
+    return _catalog_dir() / info["payload_file"]
+
+def payload_etag(info):
+    return f'"{info["payload_sha256"]}"'
+
+def find_payload(etag):
+    """Snapshot (current or previous) whose payload ETag matches, else None."""
+    info = current()
+    for candidate in (info, (info or {}).get("previous")):
+        if candidate and payload_etag(candidate) == etag and payload_path(candidate).is_file():
+            return candidate
+    return None
+
+def snapshot_headers(info):
+    """Version + staleness headers for a response served from `info`."""
+    return {
+        "X-Catalog-Version": info["version"],
+        "X-Catalog-Built-At": info["built_at"],
+        "Age": str(max(0, int(time.time() - info.get("checked_ts", 0)))),   # since last compared with the DB
+    }
+
+def fresh():
+    """
+    Current snapshot. Older than catalog_max_age_seconds → still served, and
+    the background builder is woken to refresh it, so no request waits on the
+    DB. Only the very first download (nothing built yet) runs the build.
+    """
+    info = current()
+    if info is None:
+        return build_catalog()
+    if time.time() - info.get("checked_ts", 0) > _max_age_seconds() and "catalog-build" not in _flight.in_flight():
+        request_build()
+    return info
+
+def _build():
+    global _current
+    started = time.monotonic()
+    conn = get_read_connection()
+    cur = conn.cursor()
+    try:
+        master_data, product_data = fetch_catalog(cur)
+    finally:
+        try:
+            cur.close()
+            conn.close()
+        except Exception:
+            pass
+
+    version = _data_version(master_data, product_data)
+    previous = current()
+    if previous and previous["version"] == version:
+        logging.info("📚 Catalog unchanged (version %s)", version)
+        with _state_lock:
+            previous["checked_ts"] = time.time()
+        return previous
+
+    directory = _catalog_dir()
+    name = f"catalog-{version}.sqlite3"
+    payload_name = f"payload-{version}.json"
+    _write_sqlite(str(directory / (name + ".tmp")), version, master_data, product_data)
+    _write_payload(directory / (payload_name + ".tmp"), master_data, product_data)
+    os.replace(directory / (name + ".tmp"), directory / name)
+    os.replace(directory / (payload_name + ".tmp"), directory / payload_name)
+
+    info = {
+        "version": version,
+        "schema_version": SCHEMA_VERSION,
+        "file": name,
+        "sha256": _file_sha256(directory / name),
+        "size": (directory / name).stat().st_size,
+        "payload_file": payload_name,
+        "payload_sha256": _file_sha256(directory / payload_name),
+        "payload_size": (directory / payload_name).stat().st_size,
+        "master_rows": len(master_data),
+        "product_rows": len(product_data),
+        "built_at": datetime.now().isoformat(),
+        "checked_ts": time.time(),
+        "build_seconds": round(time.monotonic() - started, 3),
+    }
+    if previous:
+        info["previous"] = {k: v for k, v in previous.items() if k != "previous"}
+    with open(directory / (MANIFEST + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    os.replace(directory / (MANIFEST + ".tmp"), directory / MANIFEST)
+
+    with _state_lock:
+        _current = info
+    keep = {name, payload_name}
+    if previous:
+        keep |= {previous["file"], previous.get("payload_file")}
+    _prune(keep)
+
+    logging.info("📚 Catalog built: version %s, %s products, %s bytes in %.2fs",
+                 version, info["product_rows"], info["size"], info["build_seconds"])
+    return info
+
+def build_catalog():
+    """
+    Query SQL Anywhere and write a fresh catalog file.
+    Concurrent callers (a burst of devices, the background builder) join the
+    running build and share its result or its error.
+    """
+    return _flight.do("catalog-build", _build, timeout=flight_timeout())
+
+def request_build():
+    """Ask the background builder to rebuild now (non-blocking)."""
+    start_builder()
+    _wakeup.set()
+
+def _builder_loop():
+    while True:
+        try:
+            build_catalog()
+        except Exception:
+            logging.exception("Catalog build failed")
+        _wakeup.wait(_refresh_seconds())
+        _wakeup.clear()
+
+def start_builder():
+    """Start the background refresh thread once per process."""
+    global _builder
+    with _state_lock:
+        if _builder is not None and _builder.is_alive():
+            return
+        _builder = threading.Thread(target=_builder_loop, name="catalog-builder", daemon=True)
+        _builder.start()
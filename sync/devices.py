@@ -0,0 +1,294 @@
+"""
+Per-device sync telemetry
+DeviceTelemetryMiddleware records every authenticated request, keyed by
+(X-Device-ID header, userid = verified JWT sub). Failed requests with no
+verified user all go to the one ("-", "anonymous") row, so forged tokens
+cannot add rows or pin failures on real users:
+  • last request / last successful sync time, endpoint and status
+  • bytes in / out, server time (total, max, last), rows fetched or inserted
+  • failures (status >= 400) and full catalog downloads
+Recording is in memory (one lock, a few adds). A background thread writes
+the devices that changed to device_telemetry.sqlite3 every
+device_telemetry.flush_seconds (default 30) and at exit; the file is read
+back on start. At most device_telemetry.max_devices (default 5000) are
+kept, least recently seen dropped first.
+GET /diagnostics/devices summarizes the slowest and heaviest devices.
+"""
+import re
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+DEFAULT_MAX_DEVICES = 5000
+DEFAULT_FLUSH_SECONDS = 30
+DB_FILE = "device_telemetry.sqlite3"
+DEVICE_HEADER = "X-Device-ID"
+UNKNOWN_DEVICE = "-"
+ANONYMOUS = "anonymous"
+
+# successful calls to these count as a sync; the first two are full catalog pulls on 200
+SYNC_VIEWS = ("data_download", "catalog_db", "get_product_details", "upload_orders")
+FULL_DOWNLOAD_VIEWS = ("data_download", "catalog_db")
+
+FIELDS = (
+    "device_id", "userid", "first_seen", "last_seen", "last_sync", "last_endpoint", "last_status",
+    "requests", "failures", "last_failure", "bytes_in", "bytes_out",
+    "server_ms_total", "server_ms_max", "last_server_ms", "rows", "full_downloads", "last_full_download",
+)
+_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS devices (
+        {", ".join(FIELDS)},
+        PRIMARY KEY (device_id, userid)
+    )
+"""
+_DEVICE_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+class DeviceRegistry:
+    def __init__(self, path=None, max_devices=DEFAULT_MAX_DEVICES):
+        self.path = path
+        self.max_devices = max(1, int(max_devices))
+        self._devices = OrderedDict()     # (device_id, userid) → row dict, least recently seen first
+        self._dirty = set()
+        self._evicted = []                # dropped while still unsaved
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.flushed = 0
+        if path is not None:
+            self._load()
+
+    # ------------------ recording ------------------
+    def record(self, device_id, userid, view, status, bytes_in=0, bytes_out=0, server_ms=0.0, rows=0, now=None):
+        now = time.time() if now is None else now
+        key = (device_id, userid)
+        failed = status >= 400
+        with self._lock:
+            row = self._devices.get(key)
+            if row is None:
+                row = dict.fromkeys(FIELDS, 0)
+                row.update(device_id=device_id, userid=userid, first_seen=now,
+                           last_sync=None, last_failure=None, last_full_download=None)
+                self._devices[key] = row
+                if len(self._devices) > self.max_devices:
+                    old_key, old_row = self._devices.popitem(last=False)
+                    if old_key in self._dirty:
+                        self._dirty.discard(old_key)
+                        self._evicted.append(old_row)
+            else:
+                self._devices.move_to_end(key)
+            row["last_seen"] = now
+            row["last_endpoint"] = view
+            row["last_status"] = status
+            row["requests"] += 1
+            row["bytes_in"] += bytes_in
+            row["bytes_out"] += bytes_out
+            row["server_ms_total"] += server_ms
+            row["server_ms_max"] = max(row["server_ms_max"], server_ms)
+            row["last_server_ms"] = server_ms
+            row["rows"] += rows
+            if failed:
+                row["failures"] += 1
+                row["last_failure"] = now
+            elif view in SYNC_VIEWS:
+                row["last_sync"] = now
+            if status == 200 and view in FULL_DOWNLOAD_VIEWS:
+                row["full_downloads"] += 1
+                row["last_full_download"] = now
+            self._dirty.add(key)
+
+    # ------------------ persistence ------------------
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=10)
+        db.execute(_SCHEMA)
+        return db
+
+    def _load(self):
+        try:
+            db = self._connect()
+            try:
+                rows = db.execute(f"SELECT {', '.join(FIELDS)} FROM devices ORDER BY last_seen").fetchall()
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            logging.warning("⚠️ Device telemetry not loaded: %s", e)
+            return
+        for values in rows[-self.max_devices:]:
+            row = dict(zip(FIELDS, values))
+            self._devices[(row["device_id"], row["userid"])] = row
+
+    def flush(self):
+        """Write changed devices in one transaction; returns how many rows were written."""
+        if self.path is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                batch = [dict(self._devices[k]) for k in self._dirty] + self._evicted
+                self._dirty, self._evicted = set(), []
+            if not batch:
+                return 0
+            try:
+                db = self._connect()
+                try:
+                    with db:
+                        db.executemany(
+                            f"INSERT OR REPLACE INTO devices ({', '.join(FIELDS)}) "
+                            f"VALUES ({', '.join('?' * len(FIELDS))})",
+                            [tuple(row[f] for f in FIELDS) for row in batch],
+                        )
+                finally:
+                    db.close()
+            except sqlite3.Error as e:
+                logging.warning("⚠️ Device telemetry flush failed: %s", e)
+                with self._lock:          # retry next round unless newer data replaced them
+                    for row in batch:
+                        key = (row["device_id"], row["userid"])
+                        if key in self._devices:
+                            self._dirty.add(key)
+                return 0
+            self.flushed += len(batch)
+            return len(batch)
+
+    # ------------------ reporting ------------------
+    def stats(self):
+        with self._lock:
+            return {"devices": len(self._devices), "unsaved": len(self._dirty) + len(self._evicted),
+                    "flushed": self.flushed}
+
+    def summary(self, limit=10):
+        with self._lock:
+            rows = [dict(row) for row in self._devices.values()]
+        for row in rows:
+            row["avg_server_ms"] = round(row["server_ms_total"] / row["requests"], 1) if row["requests"] else 0.0
+            row["server_ms_total"] = round(row["server_ms_total"], 1)
+
+        def top(key, only_nonzero=False):
+            ranked = sorted(rows, key=lambda r: r[key] or 0, reverse=True)
+            return [r for r in ranked if r[key] or not only_nonzero][:limit]
+
+        return {
+            "devices": len(rows),
+            "slowest": top("avg_server_ms"),
+            "heaviest": top("bytes_out"),
+            "most_full_downloads": top("full_downloads", only_nonzero=True),
+            "most_failures": top("failures", only_nonzero=True),
+        }
+
+
+# ------------------ process registry ------------------
+def _settings():
+    from .sql_helper import _get_config
+
+    settings = _get_config().get("device_telemetry") or {}
+    return settings if isinstance(settings, dict) else {}
+
+def _flush_loop(reg, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reg.flush()
+        except Exception as e:
+            logging.warning("⚠️ Device telemetry flush failed: %s", e)
+
+def registry():
+    """The process-wide registry (created, loaded and flushed in the background on first use)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from .sql_helper import _data_dir
+
+            settings = _settings()
+            try:
+                max_devices = int(settings.get("max_devices", DEFAULT_MAX_DEVICES))
+                interval = max(1.0, float(settings.get("flush_seconds", DEFAULT_FLUSH_SECONDS)))
+            except (TypeError, ValueError):
+                print("WARNING: invalid device_telemetry settings, using defaults")
+                max_devices, interval = DEFAULT_MAX_DEVICES, DEFAULT_FLUSH_SECONDS
+            _registry = DeviceRegistry(_data_dir() / DB_FILE, max_devices)
+            threading.Thread(target=_flush_loop, args=(_registry, interval),
+                             name="device-telemetry", daemon=True).start()
+            atexit.register(_registry.flush)
+        return _registry
+
+
+# ------------------ middleware ------------------
+def _device_id(request):
+    value = request.headers.get(DEVICE_HEADER, "")
+    return value if _DEVICE_ID.match(value) else UNKNOWN_DEVICE
+
+def _key(request, status):
+    """(device_id, userid) to record under, or None; only the token the view verified names a user."""
+    userid = getattr(request, "userid", None)
+    if userid:
+        return _device_id(request), str(userid)
+    if status >= 400:
+        return UNKNOWN_DEVICE, ANONYMOUS    # one fixed row: the header and token are unverified
+    return None
+
+
+class DeviceTelemetryMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = _settings().get("enabled", True) is not False
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        tally = [0]
+        token = metrics.request_rows.set(tally)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.request_rows.reset(token)
+        self._record(request, response, started, tally[0])
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        tally = [0]
+        token = metrics.request_rows.set(tally)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.request_rows.reset(token)
+        self._record(request, response, started, tally[0])
+        return response
+
+    @staticmethod
+    def _record(request, response, started, rows):
+        server_ms = (time.perf_counter() - started) * 1000
+        key = _key(request, response.status_code)
+        if key is None:
+            return                            # status / login / pair-check: not a device sync
+        received = request.META.get("CONTENT_LENGTH") or ""
+        sent = response.get("Content-Length")
+        if sent is None and not getattr(response, "streaming", False):
+            sent = len(response.content)
+        registry().record(
+            *key, getattr(request, "metrics_view", "unmatched"), response.status_code,
+            bytes_in=int(received) if received.isdigit() else 0,
+            bytes_out=int(sent) if sent else 0,
+            server_ms=server_ms,
+            rows=rows,
+        )
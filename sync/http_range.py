@@ -0,0 +1,92 @@
+"""
+HTTP Range helper - resumable downloads of static snapshot files
+Supports a single "bytes=" range, If-Range (ETag form) and Accept-Ranges.
+"""
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+CHUNK_SIZE = 256 * 1024       # also FileResponse.block_size (Django default: 4 KB)
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header, size):
+    """
+    Returns (start, end) inclusive, None for "ignore, send it all"
+    or False when the range cannot be satisfied.
+    """
+    m = _RANGE_RE.match((header or "").replace(" ", ""))
+    if not m:
+        return None                  # absent, malformed or multi-range
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:                    # suffix: last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+class _FileSlice:
+    """Iterator over `length` bytes from `start` of an open file; the response closes it."""
+
+    def __init__(self, f, start, length):
+        self.f, self.remaining = f, length
+        f.seek(start)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self.f.read(min(CHUNK_SIZE, self.remaining)) if self.remaining > 0 else b""
+        if not chunk:
+            raise StopIteration
+        self.remaining -= len(chunk)
+        return chunk
+
+    def close(self):
+        self.f.close()
+
+
+def ranged_file_response(request, path, content_type, etag, filename=None):
+    """
+    200 with the whole file, or 206 with the requested slice when the
+    Range applies to this exact representation (If-Range must match the ETag).
+    The file is opened before returning: a catalog build that prunes the
+    snapshot meanwhile cannot pull it from under the response.
+    """
+    f = open(path, "rb")
+    size = os.fstat(f.fileno()).st_size
+    rng = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        rng = None                   # representation changed - resend it all
+
+    span = _parse_range(rng, size) if rng else None
+    if span is False:
+        f.close()
+        resp = HttpResponse(status=416)
+        resp["Content-Range"] = f"bytes */{size}"
+    elif span:
+        start, end = span
+        length = end - start + 1
+        resp = StreamingHttpResponse(_FileSlice(f, start, length), status=206, content_type=content_type)
+        resp["Content-Range"] = f"bytes {start}-{end}/{size}"
+        resp["Content-Length"] = str(length)
+    else:
+        resp = FileResponse(f, content_type=content_type,
+                            as_attachment=bool(filename), filename=filename or "")
+        resp.block_size = CHUNK_SIZE
+
+    if filename and span:
+        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp["Accept-Ranges"] = "bytes"
+    resp["ETag"] = etag
+    return resp
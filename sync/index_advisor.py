@@ -0,0 +1,253 @@
+"""
+Index advisor - checks the SQL Anywhere indexes behind the sync endpoints
+Reads SYS.SYSIDX / SYS.SYSIDXCOL for each table the hot queries filter or
+join on, reports missing or unhelpful indexes together with the optimizer's
+plan and its row / cost estimates (GRAPHICAL_PLAN()), and only creates
+indexes when explicitly asked to. Sequential scans and missing indexes are
+only flagged for the selective probes; the full catalog join reads every
+batch row, where a hash join over a scan is the right plan.
+"""
+import re
+import logging
+
+from . import catalog
+from .sql_helper import get_connection, get_read_connection, _get_config
+
+# (table, column, who depends on it, representative query for PLAN(), selective probe?)
+TARGETS = [
+    ("acc_users", "id", "login lookup",
+     "SELECT id, pass FROM acc_users WHERE id = 'x' AND pass = 'x'", True),
+    ("acc_productbatch", "productcode", "catalog product join",
+     catalog.PRODUCT_SQL, False),
+    ("acc_master", "super_code", "catalog master filter",
+     catalog.MASTER_SQL, True),
+    ("acc_purchaseorderdetails", "slno", "upload MAX(slno) probe",
+     "SELECT MAX(slno) FROM acc_purchaseorderdetails", True),
+]
+
+INDEX_PREFIX = "ix_tms"
+
+_INDEX_SQL = """
+    SELECT i.index_name, i.index_category, c.column_name
+    FROM SYS.SYSTAB t
+    JOIN SYS.SYSIDX i     ON i.table_id = t.table_id
+    JOIN SYS.SYSIDXCOL ic ON ic.table_id = i.table_id AND ic.index_id = i.index_id
+    JOIN SYS.SYSTABCOL c  ON c.table_id = ic.table_id AND c.column_id = ic.column_id
+    WHERE t.table_name = ?
+    ORDER BY i.index_id, ic.sequence
+"""
+
+# SYS.SYSIDX.index_category
+_CATEGORY = {1: "primary key", 2: "foreign key", 3: "index", 4: "text index"}
+
+# words that can follow a table name in FROM / JOIN without being its alias
+_NOT_ALIAS = {"on", "where", "join", "left", "right", "inner", "outer", "full", "cross", "natural",
+              "group", "order", "having", "union", "with", "key"}
+
+# GRAPHICAL_PLAN() XML elements holding the optimizer's estimates, by preference
+_ROWS_TAGS = ("EstRowCount", "EstRows", "RowsReturned")
+_COST_TAGS = ("EstTotalCost", "TotalCost", "EstRunTime", "RunTime")
+
+
+# ------------------ catalog inspection ------------------
+def _table_indexes(cur, table):
+    indexes = {}
+    cur.execute(_INDEX_SQL, (table,))
+    for name, category, column in cur.fetchall():
+        idx = indexes.setdefault(name, {
+            "name": name,
+            "kind": _CATEGORY.get(category, str(category)),
+            "columns": [],
+        })
+        idx["columns"].append(column)
+    return list(indexes.values())
+
+def _row_count(cur, table):
+    cur.execute('SELECT MAX("count") FROM SYS.SYSTAB WHERE table_name = ?', (table,))
+    row = cur.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+def _plan(cur, sql):
+    """Short optimizer plan, e.g. 'acc_master<seq>'; None if unavailable."""
+    try:
+        cur.execute("SELECT PLAN(?)", (sql,))
+        row = cur.fetchone()
+        return str(row[0]).strip() if row and row[0] is not None else None
+    except Exception as e:
+        logging.warning("PLAN() failed: %s", e)
+        return None
+
+def _first_number(xml, tags):
+    for tag in tags:
+        match = re.search(rf"<{tag}>\s*([-+0-9.eE]+)\s*</{tag}>", xml)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                pass
+    return None
+
+def _estimates(cur, sql):
+    """Estimated rows and cost of the plan's top node from GRAPHICAL_PLAN(); None if unavailable."""
+    try:
+        cur.execute("SELECT GRAPHICAL_PLAN(?)", (sql,))
+        row = cur.fetchone()
+    except Exception as e:
+        logging.warning("GRAPHICAL_PLAN() failed: %s", e)
+        return None
+    if not row or row[0] is None:
+        return None
+    xml = str(row[0])            # the top node comes first in document order
+    rows, cost = _first_number(xml, _ROWS_TAGS), _first_number(xml, _COST_TAGS)
+    if rows is None and cost is None:
+        return None
+    return {"rows": rows, "cost": cost}
+
+def _plan_names(table, sql):
+    """Names the plan can show for `table`: the table itself and its correlation names in `sql`."""
+    names = {table.lower()}
+    for alias in re.findall(rf"\b{re.escape(table)}\s+(?:as\s+)?(\w+)", sql, re.IGNORECASE):
+        if alias.lower() not in _NOT_ALIAS:
+            names.add(alias.lower())
+    return names
+
+def _seq_scan(plan, table, sql):
+    """True when the short plan scans `table` sequentially, e.g. 'p<seq>' for 'acc_product p'."""
+    plan = plan.lower()
+    return any(re.search(rf"(?<!\w){re.escape(name)}<seq>", plan) for name in _plan_names(table, sql))
+
+def _recommendation(table, column):
+    return f"CREATE INDEX {INDEX_PREFIX}_{table}_{column} ON {table} ({column})"
+
+def _check_target(cur, table, column, purpose, sql, selective=True):
+    result = {
+        "table": table,
+        "column": column,
+        "purpose": purpose,
+        "selective": selective,
+        "rows": None,
+        "indexes": [],
+        "plan": None,
+        "estimates": None,
+        "status": "unknown",
+        "recommendation": None,
+    }
+    indexes = _table_indexes(cur, table)
+    result["indexes"] = indexes
+    result["rows"] = _row_count(cur, table)
+    result["plan"] = _plan(cur, sql)
+    result["estimates"] = _estimates(cur, sql)
+
+    col = column.lower()
+    leading = [i for i in indexes if i["columns"] and i["columns"][0].lower() == col]
+    trailing = [i for i in indexes if col in (c.lower() for c in i["columns"][1:])]
+
+    if leading:
+        result["status"] = "ok"
+    elif not selective:
+        result["status"] = "scan expected"     # reads the whole table, an index would not be used
+    elif trailing:
+        # the column is indexed, but not as the leading key - no seek possible
+        result["status"] = "unhelpful"
+        result["recommendation"] = _recommendation(table, column)
+    else:
+        result["status"] = "missing"
+        result["recommendation"] = _recommendation(table, column)
+
+    if selective and result["plan"] and _seq_scan(result["plan"], table, sql):
+        result["seq_scan"] = True
+    return result
+
+
+# ------------------ public API ------------------
+def run_advisor(create=False):
+    """
+    Inspect every target and return the report dict.
+    create=True additionally runs the recommended CREATE INDEX statements
+    (on a write connection) - never done unless explicitly requested.
+    """
+    report = {"targets": [], "created": [], "errors": []}
+
+    conn = get_read_connection()
+    cur = conn.cursor()
+    try:
+        for table, column, purpose, sql, selective in TARGETS:
+            try:
+                report["targets"].append(_check_target(cur, table, column, purpose, sql, selective))
+            except Exception as e:
+                report["errors"].append(f"{table}.{column}: {e}")
+    finally:
+        try:
+            cur.close()
+            conn.close()
+        except Exception:
+            pass
+
+    if create:
+        todo = [t for t in report["targets"] if t["recommendation"]]
+        if todo:
+            conn = get_connection()
+            cur = conn.cursor()
+            try:
+                for t in todo:
+                    try:
+                        cur.execute(t["recommendation"])
+                        conn.commit()
+                        report["created"].append(t["recommendation"])
+                    except Exception as e:
+                        conn.rollback()
+                        report["errors"].append(f"{t['recommendation']}: {e}")
+            finally:
+                try:
+                    cur.close()
+                    conn.close()
+                except Exception:
+                    pass
+
+    return report
+
+def _format_estimates(estimates):
+    if not estimates:
+        return "no estimates"
+    parts = []
+    if estimates.get("rows") is not None:
+        parts.append(f"est. {estimates['rows']:,.0f} rows")
+    if estimates.get("cost") is not None:
+        parts.append(f"est. cost {estimates['cost']:g}")
+    return ", ".join(parts)
+
+def print_report(report):
+    """Human-readable report on stdout (shows up in the GUI log)."""
+    for t in report["targets"]:
+        rows = t["rows"] if t["rows"] is not None else "?"
+        where = f"{t['table']}.{t['column']} ({t['purpose']}, {rows} rows)"
+        if t["status"] == "ok":
+            print(f"✅ Index OK: {where}")
+        elif t["status"] == "scan expected":
+            print(f"ℹ️  Full scan expected: {where}")
+        else:
+            print(f"⚠️  Index {t['status'].upper()}: {where} → {t['recommendation']}")
+        print(f"   Plan: {t['plan'] or '?'} ({_format_estimates(t.get('estimates'))})")
+        if t.get("seq_scan"):
+            print(f"⚠️  Plan uses a sequential scan: {t['plan']}")
+    for stmt in report["created"]:
+        print(f"🛠️  Created: {stmt}")
+    for err in report["errors"]:
+        print(f"⚠️  Index advisor error: {err}")
+
+def startup_check():
+    """
+    Called by SyncService at startup (in a background thread).
+    config.json: "index_advisor": false disables it,
+                 "index_advisor_create": true opts in to creating indexes.
+    """
+    cfg = _get_config()
+    if not cfg.get("index_advisor", True):
+        return None
+    try:
+        report = run_advisor(create=bool(cfg.get("index_advisor_create", False)))
+    except Exception as e:
+        print(f"⚠️  Index advisor skipped: {e}")
+        return None
+    print_report(report)
+    return report
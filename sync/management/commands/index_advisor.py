@@ -0,0 +1,24 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from sync.index_advisor import run_advisor, print_report
+
+
+class Command(BaseCommand):
+    help = "Report missing/unhelpful SQL Anywhere indexes for the sync endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--create",
+            action="store_true",
+            help="Also CREATE the recommended indexes (explicit opt-in)",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+
+    def handle(self, *args, **options):
+        report = run_advisor(create=options["create"])
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+        else:
+            print_report(report)
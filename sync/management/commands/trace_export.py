@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from sync.tracing import to_chrome_trace
+
+
+class Command(BaseCommand):
+    help = "Convert logs/traces.jsonl (and its backups) into a trace file for chrome://tracing / Perfetto"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", default="traces.json", help="Output file (default: traces.json)")
+
+    def handle(self, *args, **options):
+        count = to_chrome_trace(options["out"])
+        self.stdout.write(f"{count} trace events written to {options['out']}")
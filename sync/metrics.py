@@ -0,0 +1,268 @@
+"""
+In-process metrics - counters, gauges and latency histograms
+Rendered in the Prometheus text format by GET /metrics.
+  • MetricsMiddleware: per-view request count (by status), latency
+    histogram and payload bytes in / out
+  • sql_helper: DB connect / execute / fetch / commit timings, rows
+    fetched, pool gauges
+  • views: rows inserted by upload_orders
+Hot path cost is one lock + a few integer adds per observation; labels
+are plain tuples, nothing is formatted until /metrics is scraped.
+"""
+import time
+import bisect
+import threading
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# seconds - covers a cached /status (ms) up to a full catalog pull (s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# view the current request resolved to; "background" outside requests
+current_view = contextvars.ContextVar("current_view", default="background")
+
+# rows fetched / inserted by the current request: [n], set by DeviceTelemetryMiddleware
+request_rows = contextvars.ContextVar("request_rows", default=None)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        for labelvalues, value in sorted(self.values().items()):
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class LevelGauge(Counter):
+    """Labelled gauge the code moves up and down (requests in flight, ...)."""
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Gauge:
+    """Value read from `fn` at scrape time - nothing on the hot path."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+        _registry.append(self)
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return
+        if value is not None:
+            yield f"{self.name} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}          # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def series(self):
+        """{labelvalues: (per-bucket counts incl. +Inf, count, sum)}"""
+        with self._lock:
+            return {k: (v[:-1], sum(v[:-1]), v[-1]) for k, v in self._series.items()}
+
+    def render(self):
+        bounds = self.buckets + (float("inf"),)
+        for labelvalues, (counts, count, total) in sorted(self.series().items()):
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = _labels(self.labelnames, labelvalues, [("le", _number(bound))])
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}"
+
+
+def count_rows(n):
+    """Add to the current request's row tally (no-op outside a tallied request)."""
+    tally = request_rows.get()
+    if tally is not None:
+        tally[0] += n
+
+def quantile(counts, q, buckets=LATENCY_BUCKETS):
+    """
+    q-quantile from per-bucket counts (as in Histogram.series, +Inf last),
+    interpolated inside the bucket like Prometheus histogram_quantile.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen, lower = 0, 0.0
+    for bound, n in zip(buckets, counts):
+        if n and seen + n >= rank:
+            return lower + (bound - lower) * (rank - seen) / n
+        seen, lower = seen + n, bound
+    return buckets[-1]                 # in the +Inf bucket: report the last finite bound
+
+def snapshot(gauges=()):
+    """
+    Plain-data copy of the request metrics for in-process readers (GUI
+    dashboard): requests and latency buckets per view, requests in flight,
+    and the named gauges. A few lock acquisitions, no formatting.
+    """
+    requests = {}
+    for (view, _method, _status), n in REQUESTS.values().items():
+        requests[view] = requests.get(view, 0) + n
+    wanted = set(gauges)
+    values = {}
+    for metric in _registry:
+        if isinstance(metric, Gauge) and metric.name in wanted:
+            try:
+                values[metric.name] = metric.fn()
+            except Exception:
+                values[metric.name] = None
+    return {
+        "ts": time.monotonic(),
+        "requests": requests,
+        "latency": {labels[0]: counts for labels, (counts, _n, _sum) in REQUEST_SECONDS.series().items()},
+        "in_flight": {labels[0]: n for labels, n in IN_FLIGHT.values().items()},
+        "gauges": values,
+    }
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------ service metrics ------------------
+REQUESTS = Counter("sync_requests_total", "HTTP requests by view, method and status", ("view", "method", "status"))
+REQUEST_SECONDS = Histogram("sync_request_duration_seconds", "Time until the view returned a response", ("view",))
+IN_FLIGHT = LevelGauge("sync_requests_in_flight", "Requests currently inside a view", ("view",))
+PAYLOAD_BYTES = Counter("sync_payload_bytes_total", "Request / response body bytes", ("view", "direction"))
+ROWS_FETCHED = Counter("sync_db_rows_fetched_total", "Rows fetched from SQL Anywhere", ("view",))
+ROWS_INSERTED = Counter("sync_db_rows_inserted_total", "Rows inserted into SQL Anywhere", ("view",))
+DB_CONNECT_SECONDS = Histogram("sync_db_connect_seconds", "Time to open a new DB connection", ("kind",))
+DB_QUERY_SECONDS = Histogram("sync_db_query_seconds", "Time spent in cursor.execute", ("view",))
+DB_FETCH_SECONDS = Histogram("sync_db_fetch_seconds", "Time spent fetching one statement's rows", ("view",))
+DB_COMMIT_SECONDS = Histogram("sync_db_commit_seconds", "Time spent in connection.commit", ("view",))
+
+
+# ------------------ middleware ------------------
+class MetricsMiddleware:
+    """
+    Counts and times every request under the name of the view it hit.
+    Sync and async capable: under ASGI it runs on the event loop (no thread hop).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        token = current_view.set("unmatched")
+        try:
+            response = self.get_response(request)
+        finally:
+            self._leave(request, token)
+        self._record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        token = current_view.set("unmatched")
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._leave(request, token)
+        self._record(request, response, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = getattr(view_func, "__name__", "unknown")
+        request.metrics_view = name
+        current_view.set(name)
+        IN_FLIGHT.inc(name)
+        return None
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return MetricsMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    @staticmethod
+    def _leave(request, token):
+        current_view.reset(token)
+        if hasattr(request, "metrics_view"):
+            IN_FLIGHT.dec(request.metrics_view)
+
+    @staticmethod
+    def _record(request, response, started):
+        elapsed = time.perf_counter() - started
+        view = getattr(request, "metrics_view", "unmatched")
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        REQUEST_SECONDS.observe(elapsed, view)
+
+        received = request.META.get("CONTENT_LENGTH")
+        if received and received.isdigit() and received != "0":
+            PAYLOAD_BYTES.inc(view, "in", amount=int(received))
+        sent = response.get("Content-Length")
+        if sent is None and not getattr(response, "streaming", False):
+            sent = len(response.content)
+        if sent:
+            PAYLOAD_BYTES.inc(view, "out", amount=int(sent))
@@ -0,0 +1,31 @@
+"""
+Django's Security / Common / XFrameOptions middleware for the async chain
+Their hooks only read settings and set headers or redirects, so under ASGI
+they run inline on the event loop instead of MiddlewareMixin's default of
+one sync_to_async hop per hook. Under WSGI they are Django's, unchanged.
+"""
+from django.middleware.clickjacking import XFrameOptionsMiddleware as _XFrameOptionsMiddleware
+from django.middleware.common import CommonMiddleware as _CommonMiddleware
+from django.middleware.security import SecurityMiddleware as _SecurityMiddleware
+
+
+class _InlineHooks:
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+
+class SecurityMiddleware(_InlineHooks, _SecurityMiddleware):
+    pass
+
+
+class CommonMiddleware(_InlineHooks, _CommonMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(_InlineHooks, _XFrameOptionsMiddleware):
+    pass
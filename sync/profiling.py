@@ -0,0 +1,218 @@
+"""
+On-demand request profiling
+An admin (JWT `sub` listed in config "profiling_admins") adds the header
+`X-Profile: 1` or `?profile=1` to any request; the view then runs under
+cProfile + tracemalloc and the capture is kept in profiles/:
+  • <id>.prof - pstats dump (snakeviz / `python -m pstats`)
+  • <id>.json - request, timings, peak traced memory, top functions and
+                top allocation sites
+Only the newest profiling_keep captures are kept (default 20). One capture
+runs at a time; a second request asking for one is served unprofiled with
+X-Profile: busy. Listing / download: GET /diagnostics/profiles[/<id>].
+Under ASGI (SYNC_ASYNC_VIEWS=1) the capture covers the sync view that
+async_views runs on its executor (run_view). Endpoints answered on the
+event loop (/status, /ready, /metrics, /verify-token) have nothing to
+profile and get X-Profile: unsupported.
+"""
+import io
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from .sql_helper import _get_config, _data_dir
+
+PROFILE_DIR = "profiles"
+DEFAULT_KEEP = 20
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+
+_capture_lock = threading.Lock()
+
+
+# ------------------ helpers ------------------
+def _profile_dir():
+    path = _data_dir() / PROFILE_DIR
+    path.mkdir(exist_ok=True)
+    return path
+
+def _keep():
+    try:
+        return max(1, int(_get_config().get("profiling_keep", DEFAULT_KEEP)))
+    except (TypeError, ValueError):
+        return DEFAULT_KEEP
+
+def admin_user(request):
+    """userid if the request carries a valid JWT of a profiling admin, else None."""
+    admins = set(_get_config().get("profiling_admins") or [])
+    if not admins:
+        return None
+    from .views import _extract_token, _decode
+
+    token = _extract_token(request)
+    if not token:
+        return None
+    try:
+        userid = _decode(token).get("sub")
+    except Exception:
+        return None
+    return userid if userid in admins else None
+
+def _requested(request):
+    return request.headers.get("X-Profile") == "1" or request.GET.get("profile") == "1"
+
+def _top_functions(profiler):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+def _top_allocations(snapshot):
+    return [
+        {"where": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+
+def _prune():
+    reports = sorted(_profile_dir().glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in reports[_keep():]:
+        for path in (old, old.with_suffix(".prof")):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+def _capture(request, view_func, args, kwargs, userid):
+    capture_id = f"{datetime.now():%Y%m%d-%H%M%S}-{view_func.__name__}-{uuid.uuid4().hex[:6]}"
+    directory = _profile_dir()
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(10)
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        response = profiler.runcall(view_func, request, *args, **kwargs)
+        # streamed bodies are produced after the view returns - not profiled
+    finally:
+        wall = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+
+    profiler.dump_stats(str(directory / f"{capture_id}.prof"))
+    report = {
+        "id": capture_id,
+        "created_at": datetime.now().isoformat(),
+        "user": userid,
+        "view": view_func.__name__,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "wall_ms": round(wall * 1000, 1),
+        "peak_traced_bytes": peak,
+        "traced_bytes_at_end": current,
+        "top_functions": _top_functions(profiler),
+        "top_allocations": _top_allocations(snapshot),
+    }
+    with open(directory / f"{capture_id}.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    _prune()
+
+    logging.info("🔬 Profiled %s %s for %s → %s (%.0f ms)", request.method, request.path, userid, capture_id, wall * 1000)
+    response["X-Profile-Id"] = capture_id
+    return response
+
+
+def _profile(request, view_func, args, kwargs, userid):
+    if not _capture_lock.acquire(blocking=False):
+        response = view_func(request, *args, **kwargs)
+        response["X-Profile"] = "busy"
+        return response
+    try:
+        return _capture(request, view_func, args, kwargs, userid)
+    finally:
+        _capture_lock.release()
+
+def run_view(view_func, request, *args, **kwargs):
+    """Executor side of async_views: profile the sync view if the middleware marked the request."""
+    userid = getattr(request, "profile_user", None)
+    if userid is None:
+        return view_func(request, *args, **kwargs)
+    request.profile_user = None                # one capture per request
+    return _profile(request, view_func, args, kwargs, userid)
+
+
+# ------------------ captures ------------------
+def list_captures():
+    out = []
+    for path in sorted(_profile_dir().glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        out.append({k: report.get(k) for k in
+                    ("id", "created_at", "user", "view", "method", "path", "status", "wall_ms", "peak_traced_bytes")})
+    return out
+
+def capture_path(capture_id, kind):
+    """Path of <id>.prof / <id>.json, or None if unknown (ids are never used as raw paths)."""
+    for path in _profile_dir().glob(f"*.{kind}"):
+        if path.stem == capture_id:
+            return path
+    return None
+
+
+# ------------------ middleware ------------------
+class ProfilingMiddleware:
+    """
+    Keep it LAST in MIDDLEWARE: it calls the view itself from process_view,
+    so every other middleware's process_view must already have run.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)       # a coroutine on the async chain
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if not _requested(request):
+            return None                        # plain request stays on the event loop
+        if not iscoroutinefunction(view_func):
+            return await sync_to_async(ProfilingMiddleware.process_view, thread_sensitive=True)(
+                self, request, view_func, view_args, view_kwargs)
+        userid = admin_user(request)           # token cache hit after the first request, no I/O
+        if userid is None:
+            return None
+        request.profile_user = userid          # async_views hands it to run_view on the executor
+        response = await view_func(request, *view_args, **view_kwargs)
+        if "X-Profile-Id" not in response and "X-Profile" not in response:
+            response["X-Profile"] = "unsupported"  # answered on the event loop
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not _requested(request):
+            return None
+        userid = admin_user(request)
+        if userid is None:
+            return None                        # not an admin: plain request
+        if iscoroutinefunction(view_func):
+            return None                        # async view on the sync chain: not ours to run
+        return _profile(request, view_func, view_args, view_kwargs, userid)
@@ -0,0 +1,266 @@
+"""
+Request logging off the request path
+configure() (called once from views, replaces logging.basicConfig) puts a
+QueueHandler on the root logger; a background QueueListener does the I/O:
+  • logs/requests.log - JSON lines, size-rotated (request_log.file_bytes,
+                        default 10 MB, request_log.backups 5)
+  • console           - the old "time - LEVEL - message" format, which the
+                        GUI shows (access lines are file-only)
+RequestLogMiddleware gives every request an id (X-Request-ID in / out) and
+writes one access line with status, duration and bytes; records logged
+while a request runs carry its id, view and elapsed ms.
+Per-endpoint verbosity: request_log.levels = {"default": "INFO",
+"metrics_view": "WARNING", ...}, keyed by view function name.
+Queues are bounded: if the listener falls behind, records are dropped and
+counted instead of blocking the request thread.
+"""
+import re
+import copy
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+DEFAULT_FILE_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+DEFAULT_LEVELS = {"default": "INFO", "metrics_view": "WARNING", "ready": "WARNING"}
+CONSOLE_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_FILE = "requests.log"
+ACCESS_LOGGER = "sync.access"
+QUEUE_SIZE = 10000
+JSON_FIELDS = ("request_id", "view", "elapsed_ms", "method", "path", "status", "duration_ms", "bytes", "client")
+
+_INCOMING_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# (request_id, perf_counter at start) of the request being served
+_request = contextvars.ContextVar("request_log", default=None)
+_handlers = []                  # live queue handlers (flush / stats)
+_levels = {}                    # view name → minimum level
+_default_level = logging.INFO
+_configured = False
+_configure_lock = threading.Lock()
+_stats = {"dropped": 0}
+_access = logging.getLogger(ACCESS_LOGGER)
+
+
+# ------------------ handlers ------------------
+class _QueueHandler(QueueHandler):
+    """Runs on the logging thread: snapshot the record, enqueue, never wait."""
+
+    listener = None
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+
+    def prepare(self, record):
+        # keep exc_text separate so the JSON file gets it as its own field
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def close(self):
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            try:
+                listener.stop()                   # drains what is queued
+            except queue.Full:
+                pass
+            for handler in listener.handlers:
+                handler.close()
+        if self in _handlers:
+            _handlers.remove(self)
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in JSON_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def offload(*handlers):
+    """QueueHandler whose records are written to `handlers` by a background thread."""
+    q = queue.Queue(maxsize=QUEUE_SIZE)
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    handler = _QueueHandler(q)
+    handler.listener = listener
+    _handlers.append(handler)
+    return handler
+
+def flush(timeout=5.0):
+    """Wait until every queued record has been written (tests, shutdown)."""
+    deadline = time.monotonic() + timeout
+    for handler in list(_handlers):
+        while handler.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+def stats():
+    return dict(_stats, queued=sum(h.queue.qsize() for h in _handlers))
+
+
+# ------------------ configuration ------------------
+def _level(name, fallback):
+    level = logging.getLevelName(str(name).upper())
+    if isinstance(level, int):
+        return level
+    print(f"WARNING: invalid log level '{name}', using {logging.getLevelName(fallback)}")
+    return fallback
+
+def _settings():
+    from .sql_helper import _get_config
+
+    settings = _get_config().get("request_log") or {}
+    return settings if isinstance(settings, dict) else {}
+
+def _stamp(record):
+    """Handler filter: per-endpoint level + request context, on the caller's thread."""
+    view = getattr(record, "view", None) or metrics.current_view.get()
+    if record.levelno < _levels.get(view, _default_level):
+        return False
+    record.view = view
+    ctx = _request.get()
+    if ctx is not None and getattr(record, "request_id", None) is None:
+        record.request_id = ctx[0]
+        record.elapsed_ms = round((time.perf_counter() - ctx[1]) * 1000, 1)
+    return True
+
+def _not_access(record):
+    return record.name != ACCESS_LOGGER
+
+def configure():
+    """Install the queue handler on the root logger (idempotent)."""
+    global _configured, _default_level
+    with _configure_lock:
+        if _configured:
+            return
+        _configured = True
+
+        settings = _settings()
+        levels = dict(DEFAULT_LEVELS, **(settings.get("levels") or {}))
+        _default_level = _level(levels.pop("default"), logging.INFO)
+        _levels.update({view: _level(name, _default_level) for view, name in levels.items()})
+        try:
+            max_bytes = int(settings.get("file_bytes", DEFAULT_FILE_BYTES))
+            backups = int(settings.get("backups", DEFAULT_BACKUPS))
+        except (TypeError, ValueError):
+            max_bytes, backups = DEFAULT_FILE_BYTES, DEFAULT_BACKUPS
+
+        root = logging.getLogger()
+        # whatever was on root before (or the old console format) now runs on the listener
+        downstream = list(root.handlers)
+        for handler in downstream:
+            root.removeHandler(handler)
+        if not downstream:
+            console = logging.StreamHandler()
+            console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            console.setLevel(_level(settings.get("console_level", "INFO"), logging.INFO))
+            downstream.append(console)
+        for handler in downstream:
+            handler.addFilter(_not_access)
+
+        try:
+            from .sql_helper import _data_dir
+
+            log_dir = _data_dir() / "logs"
+            log_dir.mkdir(exist_ok=True)
+            file_handler = RotatingFileHandler(log_dir / LOG_FILE, maxBytes=max_bytes, backupCount=backups,
+                                               encoding="utf-8", delay=True)
+            file_handler.setFormatter(JsonFormatter())
+            downstream.append(file_handler)
+        except OSError as e:
+            print(f"WARNING: request log file disabled: {e}")
+
+        handler = offload(*downstream)
+        handler.addFilter(_stamp)
+        root.addHandler(handler)
+        root.setLevel(min([_default_level, *_levels.values()]))
+
+
+# ------------------ middleware ------------------
+class RequestLogMiddleware:
+    """Request id + one structured access line per request (sync or async chain)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_id, started = self._start(request)
+        token = _request.set((request_id, started))
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self._finish(request, response, request_id, started)
+
+    async def __acall__(self, request):
+        request_id, started = self._start(request)
+        token = _request.set((request_id, started))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self._finish(request, response, request_id, started)
+
+    @staticmethod
+    def _start(request):
+        incoming = request.headers.get("X-Request-ID", "")
+        request_id = incoming if _INCOMING_ID.match(incoming) else uuid.uuid4().hex[:16]
+        return request_id, time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, request_id, started):
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        response["X-Request-ID"] = request_id
+
+        status = response.status_code
+        level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+        if _access.isEnabledFor(level):
+            sent = response.get("Content-Length")
+            if sent is None and not getattr(response, "streaming", False):
+                sent = len(response.content)
+            _access.log(level, "%s %s %s %.1f ms", request.method, request.path, status, duration_ms, extra={
+                "request_id": request_id,
+                "view": getattr(request, "metrics_view", "unmatched"),
+                "method": request.method,
+                "path": request.path,
+                "status": status,
+                "duration_ms": duration_ms,
+                "bytes": int(sent) if sent else 0,
+                "client": request.META.get("REMOTE_ADDR"),
+            })
+        return response
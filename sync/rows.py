@@ -0,0 +1,43 @@
+"""
+Row shaping shared by the views and the catalog builder
+Turns DB rows into the dicts /data-download sends. Lives apart from views
+so the catalog builder can use it without importing the views module.
+"""
+
+
+def _to_float(x, default=0.0):
+    try:
+        if x is None:
+            return float(default)
+        return float(x)
+    except Exception:
+        return float(default)
+
+def _master_dicts(rows):
+    return [
+        {"code": r[0], "name": r[1], "place": r[2]}
+        for r in rows
+    ]
+
+def _product_dicts(rows):
+    product_data = []
+
+    for r in rows:
+        barcode = r[2]
+
+        # ❌ SKIP if barcode is NULL or empty
+        if not barcode:
+            continue
+
+        product_data.append({
+            "code": r[0],
+            "name": r[1],
+            "barcode": barcode,
+            "quantity": _to_float(r[3]),
+            "salesprice": _to_float(r[4]),
+            "bmrp": _to_float(r[5]),
+            "cost": _to_float(r[6]),
+            "text1": r[7]
+        })
+
+    return product_data
@@ -0,0 +1,63 @@
+"""
+Single-flight - collapse identical concurrent calls into one
+The first caller for a key runs the function; callers arriving while it is
+in flight wait for it and share the result (or the exception it raised).
+"""
+import threading
+
+
+class SingleFlightTimeout(Exception):
+    """Waited longer than the per-key timeout for the in-flight call."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() once per key at a time.
+        Followers wait up to `timeout` seconds (None = forever) and then raise
+        SingleFlightTimeout; the leader itself is never interrupted.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise SingleFlightTimeout(f"timed out after {timeout}s waiting for {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """{key: number of waiting followers} - for diagnostics."""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
@@ -1,11 +1,19 @@
 """
 SQL Helper - Database connection management for SyncService
 Handles SAP SQL Anywhere database connections
+Part of the sync package (relative imports); to check connectivity run
+    python -c "from sync.sql_helper import test_connection; test_connection()"
+from the project root.
 """
 import os
+import sys
 import json
+import threading
+import time
 from pathlib import Path
 
+from . import metrics, request_log, tracing
+
 # Try to import sqlanydb, but don't fail if it's not available
 try:
     import sqlanydb
@@ -15,7 +23,10 @@ except ImportError:
     print("WARNING: sqlanydb module not found. Database connections will not work.")
     print("Install SAP SQL Anywhere client and run: pip install sqlanydb")
 
-def _get_config():
+_config = None                  # parsed config.json, read once per process
+_config_lock = threading.Lock()
+
+def _load_config():
     """Load configuration from config.json"""
     try:
         # Look for config.json in parent directories
@@ -45,11 +56,45 @@ def _get_config():
             "db_pwd": "sql"
         }
 
-def get_connection():
+def _get_config():
+    """config.json, cached - read on first use; callers must not modify it"""
+    global _config
+    config = _config
+    if config is None:
+        with _config_lock:
+            if _config is None:
+                _config = _load_config()
+            config = _config
+    return config
+
+def reload_config():
+    """Drop the cached config.json; the next _get_config() reads it again."""
+    global _config
+    with _config_lock:
+        _config = None
+
+def _data_dir():
     """
-    Get a database connection to SAP SQL Anywhere
-    Returns a sqlanydb connection object
+    Writable folder for runtime files (catalog cache, logs, ...).
+    Next to the EXE when frozen, project root otherwise.
     """
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent
+    return Path(__file__).parent.parent
+
+# Catalog reads never need to see or wait for uncommitted billing writes
+DEFAULT_READ_ISOLATION = "0"
+READ_COMMITTED = "1"                  # for reads that must not see uncommitted rows (login)
+DEFAULT_READ_PREFETCH_ROWS = 500
+DEFAULT_READ_ARRAYSIZE = 500
+DEFAULT_READ_POOL_SIZE = 4            # idle read connections kept open (0 = no pooling)
+DEFAULT_READ_POOL_IDLE_SECONDS = 300  # older idle connections are closed, not reused
+READ_ISOLATION_LEVELS = (
+    "0", "1", "2", "3",
+    "snapshot", "statement-snapshot", "readonly-statement-snapshot",
+)
+
+def _connect(**params):
     if not SQLANYDB_AVAILABLE:
         raise ImportError(
             "sqlanydb module not installed. "
@@ -67,7 +112,8 @@ def get_connection():
         conn = sqlanydb.connect(
             DSN=dsn,
             UID=uid,
-            PWD=pwd
+            PWD=pwd,
+            **params
         )
         return conn
     except Exception as e:
@@ -75,6 +121,399 @@ def get_connection():
         print(f"DSN: {dsn}, UID: {uid}")
         raise
 
+def _read_settings():
+    """Isolation / prefetch for read connections (env overrides config.json)"""
+    config = _get_config()
+    isolation = str(os.getenv("DB_READ_ISOLATION", config.get("read_isolation_level", DEFAULT_READ_ISOLATION))).strip().lower()
+    if isolation not in READ_ISOLATION_LEVELS:
+        print(f"WARNING: invalid read_isolation_level '{isolation}', using {DEFAULT_READ_ISOLATION}")
+        isolation = DEFAULT_READ_ISOLATION
+    try:
+        prefetch_rows = int(os.getenv("DB_READ_PREFETCH_ROWS", config.get("read_prefetch_rows", DEFAULT_READ_PREFETCH_ROWS)))
+        arraysize = int(os.getenv("DB_READ_ARRAYSIZE", config.get("read_arraysize", DEFAULT_READ_ARRAYSIZE)))
+    except (TypeError, ValueError):
+        prefetch_rows, arraysize = DEFAULT_READ_PREFETCH_ROWS, DEFAULT_READ_ARRAYSIZE
+    return isolation, max(1, prefetch_rows), max(1, arraysize)
+
+def _read_pool_settings():
+    """Pool size / idle limit for read connections (env overrides config.json)"""
+    config = _get_config()
+    try:
+        size = int(os.getenv("DB_READ_POOL_SIZE", config.get("read_pool_size", DEFAULT_READ_POOL_SIZE)))
+        idle = float(config.get("read_pool_idle_seconds", DEFAULT_READ_POOL_IDLE_SECONDS))
+    except (TypeError, ValueError):
+        size, idle = DEFAULT_READ_POOL_SIZE, DEFAULT_READ_POOL_IDLE_SECONDS
+    return max(0, size), max(0.0, idle)
+
+# idle raw connections, already switched to the read isolation / prefetch
+_read_pool = []                 # [(conn, returned_at)] - most recent last
+_read_pool_lock = threading.Lock()
+_read_in_use = 0                # ReadOnlyConnections handed out and not closed yet
+_write_in_use = 0               # get_connection() connections not closed yet
+
+def _set_isolation(conn, isolation):
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SET TEMPORARY OPTION isolation_level = '{isolation}'")
+    finally:
+        cur.close()
+
+def _open_read_connection(isolation, prefetch_rows):
+    started = time.perf_counter()
+    conn = _connect(PrefetchRows=str(prefetch_rows))
+    try:
+        _set_isolation(conn, isolation)
+        cur = conn.cursor()
+        cur.execute("SET TEMPORARY OPTION prefetch = 'Always'")
+        cur.close()
+    except Exception:
+        conn.close()
+        raise
+    metrics.DB_CONNECT_SECONDS.observe(time.perf_counter() - started, "read")
+    return conn
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+def _alive(conn):
+    """One cheap round trip - a pooled handle dies with a DB restart or network drop."""
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        finally:
+            cur.close()
+        return True
+    except Exception:
+        return False
+
+def _checkout_pooled():
+    """Most recently returned idle connection that still answers, or None."""
+    _, idle_limit = _read_pool_settings()
+    while True:
+        stale = []
+        conn = None
+        with _read_pool_lock:
+            while _read_pool:
+                candidate, returned_at = _read_pool.pop()
+                if time.monotonic() - returned_at <= idle_limit:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for old in stale:
+            _close_quietly(old)
+        if conn is None or _alive(conn):
+            return conn
+        print("WARNING: pooled read connection is dead, dropping it")
+        _close_quietly(conn)
+
+def _release(conn):
+    """Back into the pool if there is room, otherwise closed."""
+    size, _ = _read_pool_settings()
+    with _read_pool_lock:
+        if len(_read_pool) < size:
+            _read_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+def _count_in_use(delta):
+    global _read_in_use
+    with _read_pool_lock:
+        _read_in_use += delta
+
+def _count_write(delta):
+    global _write_in_use
+    with _read_pool_lock:
+        _write_in_use += delta
+
+def connections_in_use():
+    """{"read": ..., "write": ...} open connections handed out - counters only, no config / DB."""
+    with _read_pool_lock:
+        return {"read": _read_in_use, "write": _write_in_use}
+
+def read_pool_stats():
+    """{"size": configured, "idle": open idle connections, "in_use": checked out}"""
+    size, _ = _read_pool_settings()
+    with _read_pool_lock:
+        return {"size": size, "idle": len(_read_pool), "in_use": _read_in_use}
+
+metrics.Gauge("sync_db_pool_size", "Configured idle read connections", lambda: read_pool_stats()["size"])
+metrics.Gauge("sync_db_pool_idle", "Idle pooled read connections", lambda: read_pool_stats()["idle"])
+metrics.Gauge("sync_db_read_in_use", "Read connections currently checked out", lambda: connections_in_use()["read"])
+metrics.Gauge("sync_db_write_in_use", "Write connections currently open", lambda: connections_in_use()["write"])
+
+def warm_read_pool(count=None):
+    """
+    Open up to `count` (default read_pool_size) read connections and park
+    them in the pool. Returns how many idle connections the pool holds.
+    """
+    size, _ = _read_pool_settings()
+    wanted = size if count is None else min(size, max(0, int(count)))
+    isolation, prefetch_rows, _ = _read_settings()
+    with _read_pool_lock:
+        missing = wanted - len(_read_pool)
+    for _ in range(max(0, missing)):
+        _release(_open_read_connection(isolation, prefetch_rows))
+    return read_pool_stats()["idle"]
+
+# ------------------ query instrumentation ------------------
+DEFAULT_SLOW_QUERY_MS = 500
+DEFAULT_SLOW_LOG_BYTES = 5 * 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+def _slow_query_ms():
+    """
+    Threshold for the slow-query log in ms (0 = off), env overrides config.json.
+    Read per statement from the cached config, so reload_config() applies it.
+    """
+    try:
+        return float(os.getenv("DB_SLOW_QUERY_MS", _get_config().get("slow_query_ms", DEFAULT_SLOW_QUERY_MS)))
+    except (TypeError, ValueError):
+        return DEFAULT_SLOW_QUERY_MS
+
+def _get_slow_logger():
+    """logs/slow_queries.log - size-rotated, JSON lines, not propagated to the console"""
+    global _slow_logger
+    with _slow_logger_lock:
+        if _slow_logger is None:
+            import logging
+            from logging.handlers import RotatingFileHandler
+
+            log_dir = _data_dir() / "logs"
+            log_dir.mkdir(exist_ok=True)
+            try:
+                max_bytes = int(_get_config().get("slow_query_log_bytes", DEFAULT_SLOW_LOG_BYTES))
+            except (TypeError, ValueError):
+                max_bytes = DEFAULT_SLOW_LOG_BYTES
+            handler = RotatingFileHandler(log_dir / "slow_queries.log", maxBytes=max_bytes,
+                                          backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("sync.slow_query")
+            logger.addHandler(request_log.offload(handler))     # file I/O off the request thread
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+            _slow_logger = logger
+        return _slow_logger
+
+def _log_slow(view, sql, execute_s, fetch_s, rows, kind="query"):
+    """One JSON line per slow statement. Parameters are never written (passwords)."""
+    total_ms = (execute_s + fetch_s) * 1000
+    threshold = _slow_query_ms()
+    if not threshold or total_ms < threshold:
+        return
+    try:
+        _get_slow_logger().warning(json.dumps({
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "kind": kind,
+            "view": view,
+            "sql": " ".join(sql.split()),
+            "execute_ms": round(execute_s * 1000, 1),
+            "fetch_ms": round(fetch_s * 1000, 1),
+            "total_ms": round(total_ms, 1),
+            "rows": rows,
+        }, ensure_ascii=False))
+    except Exception as e:
+        print(f"WARNING: slow-query log failed: {e}")
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper that times execute and fetch separately and counts rows,
+    tagged with the view the current request resolved to (sync.metrics).
+    A statement is closed off at the next execute or at close(); if
+    execute + fetch took longer than slow_query_ms it goes to the slow log.
+    """
+
+    def __init__(self, cur):
+        object.__setattr__(self, "_cur", cur)
+        object.__setattr__(self, "_stmt", None)       # [sql, view, execute_s, fetch_s, rows]
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _finish(self):
+        stmt = self._stmt
+        if stmt is None:
+            return
+        object.__setattr__(self, "_stmt", None)
+        sql, view, execute_s, fetch_s, rows = stmt
+        if fetch_s:
+            metrics.DB_FETCH_SECONDS.observe(fetch_s, view)
+        _log_slow(view, sql, execute_s, fetch_s, rows)
+
+    def _execute(self, method, sql, args):
+        self._finish()
+        view = metrics.current_view.get()
+        started = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            ended = time.perf_counter()
+            elapsed = ended - started
+            metrics.DB_QUERY_SECONDS.observe(elapsed, view)
+            tracing.record("sql execute", started, ended, "db", sql=sql[:300])
+            object.__setattr__(self, "_stmt", [sql, view, elapsed, 0.0, 0])
+
+    def execute(self, sql, *params):
+        return self._execute(self._cur.execute, sql, params)
+
+    def executemany(self, sql, seq):
+        return self._execute(self._cur.executemany, sql, (seq,))
+
+    def _fetch(self, method, *args, single=False):
+        started = time.perf_counter()
+        result = method(*args)
+        ended = time.perf_counter()
+        elapsed = ended - started
+        count = int(result is not None) if single else len(result or ())
+        tracing.record("sql fetch", started, ended, "db", rows=count)
+        stmt = self._stmt
+        if stmt is not None:
+            stmt[3] += elapsed
+            stmt[4] += count
+        if count:
+            metrics.ROWS_FETCHED.inc(stmt[1] if stmt else metrics.current_view.get(), amount=count)
+            metrics.count_rows(count)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cur.fetchone, single=True)
+
+    def fetchmany(self, *size):
+        return self._fetch(self._cur.fetchmany, *size)
+
+    def fetchall(self):
+        return self._fetch(self._cur.fetchall)
+
+    def close(self):
+        self._finish()
+        self._cur.close()
+
+class InstrumentedConnection:
+    """Write connection from get_connection(): instrumented cursors, timed commit."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._counted = True
+        _count_write(1)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor())
+
+    def close(self):
+        if self._counted:
+            self._counted = False
+            _count_write(-1)
+        return self._conn.close()
+
+    def commit(self):
+        view = metrics.current_view.get()
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            ended = time.perf_counter()
+            elapsed = ended - started
+            tracing.record("sql commit", started, ended, "db")
+            metrics.DB_COMMIT_SECONDS.observe(elapsed, view)
+            _log_slow(view, "COMMIT", elapsed, 0.0, 0, kind="commit")
+
+class ReadOnlyConnection:
+    """
+    Connection for catalog / lookup queries.
+    Runs at its own isolation level with a large prefetch, hands out cursors
+    with a tuned arraysize and refuses to commit - writes go through
+    get_connection(). Cursors are instrumented (timings, rows, slow log);
+    close() hands the connection back to the read pool.
+    """
+
+    def __init__(self, conn, arraysize, restore_isolation=None):
+        self._conn = conn
+        self.arraysize = arraysize
+        self._restore_isolation = restore_isolation     # pool's level, if this checkout changed it
+        _count_in_use(1)
+
+    def cursor(self):
+        cur = self._conn.cursor()
+        cur.arraysize = self.arraysize
+        return InstrumentedCursor(cur)
+
+    def commit(self):
+        raise RuntimeError("commit() on a read-only connection - use get_connection() for writes")
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        _count_in_use(-1)
+        try:
+            conn.rollback()           # end the read transaction, release any locks
+            if self._restore_isolation is not None:
+                _set_isolation(conn, self._restore_isolation)
+        except Exception:
+            _close_quietly(conn)      # broken connection - never pool it
+            return
+        _release(conn)
+
+def get_read_connection(isolation=None):
+    """
+    Get a read-only connection for catalog reads (downloads, lookups, login).
+    Isolation level: read_isolation_level (default 0 = read uncommitted,
+    never blocks on billing writes), or `isolation` for this checkout only
+    (READ_COMMITTED for login) - the pool's level is restored on close().
+    Prefetch: read_prefetch_rows rows per network round trip; cursor
+    arraysize: read_arraysize.
+    Reuses an idle pooled connection when one is available (read_pool_size)
+    and still answers SELECT 1; dead ones are dropped.
+    """
+    started = time.perf_counter()
+    read_isolation, prefetch_rows, arraysize = _read_settings()
+    conn = _checkout_pooled()
+    pooled = conn is not None
+    if conn is None:
+        conn = _open_read_connection(read_isolation, prefetch_rows)
+    restore = None
+    if isolation is not None and str(isolation) != read_isolation:
+        try:
+            _set_isolation(conn, isolation)
+        except Exception:
+            _close_quietly(conn)
+            raise
+        restore = read_isolation
+    tracing.record("connection checkout", started, time.perf_counter(), "db", pooled=pooled)
+    return ReadOnlyConnection(conn, arraysize, restore)
+
+def get_connection():
+    """
+    Get a read/write database connection to SAP SQL Anywhere
+    (default isolation level). Reserved for uploads - reads use
+    get_read_connection().
+    Returns a sqlanydb connection object
+    """
+    started = time.perf_counter()
+    conn = _connect()
+    ended = time.perf_counter()
+    metrics.DB_CONNECT_SECONDS.observe(ended - started, "write")
+    tracing.record("connection open", started, ended, "db", kind="write")
+    return InstrumentedConnection(conn)
+
 def test_connection():
     """Test database connectivity"""
     if not SQLANYDB_AVAILABLE:
@@ -82,7 +521,7 @@ def test_connection():
         return False
     
     try:
-        conn = get_connection()
+        conn = get_read_connection()
         cur = conn.cursor()
         cur.execute("SELECT 1")
         result = cur.fetchone()
@@ -93,7 +532,3 @@ def test_connection():
     except Exception as e:
         print(f"Database connection test failed: {e}")
         return False
-
-if __name__ == "__main__":
-    # Test the connection when run directly
-    test_connection()
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Supervisor - tracks the TASK_MST_SYNC.exe instance for pair_check
+Replaces the per-request psutil.process_iter() scan with state kept here:
+  • this process, when it IS TASK_MST_SYNC.exe (claim_if_self at startup)
+  • a child we launched - a watcher thread blocks in Popen.wait()
+  • an instance found through the PID lock file (TASK_MST_SYNC.pid) -
+    checked once, then watched with psutil.Process.wait() in a thread
+pair_check only reads the state, so it answers in constant time.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+
+from .sql_helper import _data_dir
+
+EXE_NAME = "TASK_MST_SYNC.exe"
+LOCK_FILE = "TASK_MST_SYNC.pid"
+
+_lock = threading.Lock()
+_state = {"pid": None, "source": None, "since": None, "last_exit": None}
+_discovered = False
+
+
+# ------------------ helpers ------------------
+def _lock_path():
+    return _data_dir() / LOCK_FILE
+
+def _write_lock(pid, source):
+    path = _lock_path()
+    tmp = path.with_suffix(".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pid": pid, "source": source, "since": time.time()}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning("⚠️ Could not write %s: %s", path, e)
+
+def _remove_lock(pid):
+    """Delete the lock file if it still names `pid`."""
+    path = _lock_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if json.load(f).get("pid") != pid:
+                return
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
+
+def _set_running(pid, source):
+    _state.update(pid=pid, source=source, since=time.time())
+
+def _on_exit(pid, code):
+    with _lock:
+        if _state["pid"] != pid:
+            return
+        _state.update(pid=None, source=None, since=None,
+                      last_exit={"pid": pid, "code": code, "at": time.time()})
+    _remove_lock(pid)
+    logging.info("🛑 SyncService (PID %s) exited with code %s", pid, code)
+
+def _watch_child(proc):
+    _on_exit(proc.pid, proc.wait())
+
+def _watch_pid(pid):
+    import psutil
+    try:
+        code = psutil.Process(pid).wait()
+    except psutil.NoSuchProcess:
+        code = None
+    _on_exit(pid, code)
+
+def _start_watcher(target, arg):
+    threading.Thread(target=target, args=(arg,), name=f"supervise-{getattr(arg, 'pid', arg)}", daemon=True).start()
+
+def _alive_since(pid, since):
+    """True if `pid` is running and was started no later than `since`."""
+    import psutil
+    try:
+        return psutil.Process(pid).create_time() <= since + 1
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+
+def _discover():
+    """Adopt an instance recorded in the lock file - once per process."""
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+    if _state["pid"] is not None:
+        return
+    try:
+        with open(_lock_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        pid, since = int(data["pid"]), float(data["since"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return
+    if pid != os.getpid() and _alive_since(pid, since):
+        _set_running(pid, "lockfile")
+        _start_watcher(_watch_pid, pid)
+    else:
+        _remove_lock(pid)
+
+
+# ------------------ public ------------------
+def claim_if_self():
+    """
+    Called at startup: when this process is TASK_MST_SYNC.exe it is the
+    running instance (the old process scan always found itself as well).
+    """
+    if os.path.basename(sys.executable).lower() != EXE_NAME.lower():
+        return False
+    pid = os.getpid()
+    with _lock:
+        _set_running(pid, "self")
+    _write_lock(pid, "self")
+    atexit.register(_remove_lock, pid)
+    return True
+
+def status():
+    with _lock:
+        _discover()
+        return dict(_state, running=_state["pid"] is not None)
+
+def ensure_running(exe_path, cwd):
+    """
+    (launched, pid): the tracked instance if there is one, otherwise
+    exe_path is started and watched. Raises if Popen fails.
+    """
+    import subprocess
+
+    with _lock:
+        _discover()
+        if _state["pid"] is not None:
+            return False, _state["pid"]
+        proc = subprocess.Popen([exe_path], cwd=cwd)
+        _set_running(proc.pid, "launched")
+    _write_lock(proc.pid, "launched")
+    _start_watcher(_watch_child, proc)
+    return True, proc.pid
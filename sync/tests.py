@@ -1,3 +1,1220 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from unittest import mock
+
+import jwt
+from asgiref.sync import SyncToAsync, iscoroutinefunction
+
+from django.http import FileResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase
+
+import SyncService
+from benchmarks import microbench, startup_profile
+from pathlib import Path
+
+from sync import (async_views, catalog, devices, http_range, index_advisor, metrics, profiling, request_log, sql_helper,
+                  supervisor, tracing, views)
+from sync.singleflight import SingleFlight, SingleFlightTimeout
+from sync.throttle import LoginThrottle
+from sync.token_cache import TokenCache
+
+
+_registry_patch = mock.patch.object(devices, "_registry", devices.DeviceRegistry())
+
+
+def setUpModule():
+    _registry_patch.start()                 # in-memory device telemetry: nothing written next to the code
+
+
+def tearDownModule():
+    _registry_patch.stop()
+
+
+# ------------------ local stub of the activation endpoints ------------------
+class _ActivationStub:
+    """Serves the two activation APIs on 127.0.0.1 with an optional delay."""
+
+    def __init__(self, client_id, projects=("TASK MST",), delay=0.0):
+        stub = self
+        self.client_id = client_id
+        self.projects = list(projects)
+        self.delay = delay
+        self.clients = []                   # client-id-list entries
+        self.hits = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.delay)
+                if self.path.startswith("/activate"):
+                    body = {"success": True, "data": [{"shops": [
+                        {"client_id": stub.client_id, "projects": stub.projects},
+                    ]}]}
+                else:
+                    body = {"status": True, "data": stub.clients}
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StartupValidationTests(SimpleTestCase):
+    CLIENT_ID = "TESTCLIENT"
+
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir, ignore_errors=True)
+        self.cfg = {"client_id": self.CLIENT_ID, "dsn": "stub-dsn"}
+        self.stub = _ActivationStub(self.CLIENT_ID)
+        self.addCleanup(self.stub.close)
+        self._point_at(self.stub.url)
+
+    def _point_at(self, base):
+        originals = (SyncService.ACTIVATE_API, SyncService.CLIENT_LIST_API)
+        SyncService.ACTIVATE_API = f"{base}/activate"
+        SyncService.CLIENT_LIST_API = f"{base}/clients"
+        self.addCleanup(setattr, SyncService, "ACTIVATE_API", originals[0])
+        self.addCleanup(setattr, SyncService, "CLIENT_LIST_API", originals[1])
+
+    def _cache_path(self):
+        return os.path.join(self.state_dir, SyncService.LICENSE_CACHE_FILE)
+
+    def _go_offline(self):
+        self.stub.close()
+        self._point_at("http://127.0.0.1:9")          # discard port, refused
+
+    def test_checks_run_concurrently(self):
+        self.stub.delay = 0.5
+        started = time.monotonic()
+        result = SyncService.validate_startup(self.cfg, self.state_dir)
+        elapsed = time.monotonic() - started
+        self.assertEqual(result, (True, True))
+        self.assertEqual(self.stub.hits, 2)
+        self.assertLess(elapsed, 0.9)
+
+    def test_fresh_cache_skips_network(self):
+        SyncService.validate_startup(self.cfg, self.state_dir)
+        hits = self.stub.hits
+        self.assertEqual(SyncService.validate_startup(self.cfg, self.state_dir), (True, True))
+        self.assertEqual(self.stub.hits, hits)
+
+    def test_unlicensed_is_not_cached(self):
+        self.stub.projects = []
+        self.assertEqual(SyncService.validate_startup(self.cfg, self.state_dir), (False, True))
+        self.assertFalse(os.path.exists(self._cache_path()))
+
+    def test_tampered_cache_is_ignored(self):
+        SyncService._write_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn")
+        with open(self._cache_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["payload"]["checked_at"] += 3600
+        with open(self._cache_path(), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        self.assertIsNone(SyncService._read_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn"))
+
+    def test_offline_within_grace_uses_cache(self):
+        stale = time.time() - (SyncService.LICENSE_CACHE_TTL_HOURS + 1) * 3600
+        SyncService._write_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn", checked_at=stale)
+        self._go_offline()
+        self.assertEqual(SyncService.validate_startup(self.cfg, self.state_dir), (True, True))
+
+    def test_offline_after_grace_fails(self):
+        expired = time.time() - (SyncService.LICENSE_OFFLINE_GRACE_HOURS + 1) * 3600
+        SyncService._write_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn", checked_at=expired)
+        self._go_offline()
+        licensed, _ = SyncService.validate_startup(self.cfg, self.state_dir)
+        self.assertFalse(licensed)
+
+    def test_cache_is_signed_with_the_install_key(self):
+        SyncService._write_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn")
+        self.assertTrue(os.path.exists(os.path.join(self.state_dir, SyncService.LICENSE_KEY_FILE)))
+        os.remove(os.path.join(self.state_dir, SyncService.LICENSE_KEY_FILE))    # new install key
+        self.assertIsNone(SyncService._read_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn"))
+
+    def test_config_cannot_extend_offline_grace(self):
+        expired = time.time() - (SyncService.LICENSE_OFFLINE_GRACE_MAX_HOURS + 1) * 3600
+        SyncService._write_validation_cache(self._cache_path(), self.CLIENT_ID, "stub-dsn", checked_at=expired)
+        self._go_offline()
+        cfg = dict(self.cfg, license_cache_ttl_hours=1e9, license_offline_grace_hours=1e9)
+        licensed, _ = SyncService.validate_startup(cfg, self.state_dir)
+        self.assertFalse(licensed)
+
+    def test_malformed_cache_hours_fall_back_to_defaults(self):
+        cfg = dict(self.cfg, license_cache_ttl_hours="a day", license_offline_grace_hours=None)
+        self.assertEqual(SyncService.validate_startup(cfg, self.state_dir), (True, True))
+
+    def test_cached_run_still_compares_the_local_company(self):
+        self.stub.clients = [{"client_id": self.CLIENT_ID, "company_name": "Acme Stores", "place": "Kochi"}]
+        misel = mock.Mock()
+        misel.connect.return_value.cursor.return_value.fetchone.return_value = ("Acme Stores", "Kochi")
+        with mock.patch.dict(sys.modules, {"sqlanydb": misel}):
+            self.assertEqual(SyncService.validate_startup(self.cfg, self.state_dir), (True, True))
+            hits = self.stub.hits
+            misel.connect.return_value.cursor.return_value.fetchone.return_value = ("Other Traders", "Delhi")
+            self.assertEqual(SyncService.validate_startup(self.cfg, self.state_dir), (True, False))
+        self.assertEqual(self.stub.hits, hits)                 # DB re-read, network answers cached
+
+
+class MigrationFingerprintTests(SimpleTestCase):
+    """apply_migrations skips migrate until a migration file changes."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.state_dir = os.path.join(root, "state")
+        self.migrations = os.path.join(root, "fp_app", "migrations")
+        os.makedirs(self.state_dir)
+        os.makedirs(self.migrations)
+        for path in (os.path.join(root, "fp_app", "__init__.py"), os.path.join(self.migrations, "__init__.py")):
+            open(path, "w").close()
+        self._write("0001_initial.py", "operations = []\n")
+
+        sys.path.insert(0, root)
+        self.addCleanup(sys.path.remove, root)
+        self.addCleanup(sys.modules.pop, "fp_app", None)
+        app = mock.Mock(label="fp_app")
+        app.name = "fp_app"
+        patcher = mock.patch("django.apps.apps.get_app_configs", return_value=[app])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("django.core.management.call_command")
+        self.migrate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.migrations, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_unchanged_fingerprint_skips_migrate(self):
+        self.assertTrue(SyncService.apply_migrations(self.state_dir))
+        self.assertFalse(SyncService.apply_migrations(self.state_dir))
+        self.assertEqual(self.migrate.call_count, 1)
+
+    def test_changed_migration_file_reruns_migrate(self):
+        SyncService.apply_migrations(self.state_dir)
+        self._write("0001_initial.py", "operations = []  # edited\n")
+        self.assertTrue(SyncService.apply_migrations(self.state_dir))
+        self._write("0002_more.py", "operations = []\n")
+        self.assertTrue(SyncService.apply_migrations(self.state_dir))
+        self.assertEqual(self.migrate.call_count, 3)
+
+
+class ServerTests(SimpleTestCase):
+    def test_stop_server_lets_the_in_flight_request_finish(self):
+        import http.client
+
+        started, results = threading.Event(), []
+
+        def slow_app(environ, start_response):
+            started.set()
+            time.sleep(0.5)
+            start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "4")])
+            return [b"done"]
+
+        opts = dict(SyncService.SERVER_DEFAULTS, threads=2)
+        with mock.patch("django.core.wsgi.get_wsgi_application", return_value=slow_app):
+            server = threading.Thread(target=SyncService._run_waitress, args=("127.0.0.1", 0, opts), daemon=True)
+            server.start()
+            while SyncService._server is None:
+                time.sleep(0.01)
+        port = SyncService._server.effective_port
+
+        def request():
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("GET", "/")
+            resp = conn.getresponse()
+            results.append((resp.status, resp.read()))
+
+        client = threading.Thread(target=request)
+        client.start()
+        self.assertTrue(started.wait(5))
+        self.assertTrue(SyncService.stop_server(grace=5))
+        client.join(5)
+        server.join(5)
+
+        self.assertEqual(results, [(200, b"done")])
+        self.assertFalse(server.is_alive())
+        self.assertIsNone(SyncService._server)
+        with self.assertRaises(OSError):
+            http.client.HTTPConnection("127.0.0.1", port, timeout=2).request("GET", "/")
+
+    def test_asgi_body_cap(self):
+        async def app(scope, receive, send):
+            body = b""
+            while True:
+                message = await receive()
+                body += message.get("body", b"")
+                if not message.get("more_body"):
+                    break
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": str(len(body)).encode()})
+
+        async def call(headers, chunks):
+            sent, incoming = [], iter([{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1}
+                                       for i, c in enumerate(chunks)])
+
+            async def receive():
+                return next(incoming)
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "headers": headers}
+            await SyncService._limit_body(app, 10)(scope, receive, send)
+            return sent[0]["status"], sent[1]["body"]
+
+        self.assertEqual(asyncio.run(call([(b"content-length", b"11")], [b"x" * 11])), (413, mock.ANY))
+        self.assertEqual(asyncio.run(call([(b"content-length", b"5")], [b"x" * 5])), (200, b"5"))
+        self.assertEqual(asyncio.run(call([], [b"x" * 6, b"x" * 6])), (413, mock.ANY))
+        self.assertEqual(asyncio.run(call([], [b"x" * 4, b"x" * 4])), (200, b"8"))
+
+
+class LazyImportTests(SimpleTestCase):
+    """Startup must not import the rare-path modules (timings: benchmarks/test_startup_budget.py)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.result = startup_profile.measure_phases()
+
+    def test_rare_path_modules_stay_lazy(self):
+        self.assertEqual(self.result["loaded"], [])
+
+
+class TokenCacheTests(SimpleTestCase):
+    def test_hit_after_put_and_counters(self):
+        cache = TokenCache(4)
+        self.assertIsNone(cache.get("tok"))
+        cache.put("tok", {"sub": "u1", "exp": time.time() + 60})
+        self.assertEqual(cache.get("tok")["sub"], "u1")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_entry_evicted_at_exp(self):
+        cache = TokenCache(4)
+        cache.put("tok", {"sub": "u1", "exp": time.time() + 0.05})
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("tok"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_lru_bound_and_no_exp_not_cached(self):
+        cache = TokenCache(2)
+        exp = time.time() + 60
+        for tok in ("a", "b"):
+            cache.put(tok, {"sub": tok, "exp": exp})
+        cache.get("a")                               # "b" is now least recent
+        cache.put("c", {"sub": "c", "exp": exp})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("forever", {"sub": "x"})
+        self.assertIsNone(cache.get("forever"))
+
+
+class LoginThrottleTests(SimpleTestCase):
+    SETTINGS = {"ip": {"rate_per_minute": 60, "burst": 10},
+                "user": {"rate_per_minute": 60, "burst": 3},
+                "failure_cost": 2}
+
+    def test_user_bucket_exhausts_and_reports_wait(self):
+        throttle = LoginThrottle(self.SETTINGS)
+        for _ in range(3):
+            self.assertEqual(throttle.attempt("10.0.0.5", "Clerk"), 0)
+        wait = throttle.attempt("10.0.0.5", "clerk")
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 1.0)
+        self.assertEqual(throttle.attempt("10.0.0.5", "other"), 0)
+
+    def test_failures_cost_more(self):
+        throttle = LoginThrottle(self.SETTINGS)
+        throttle.attempt("10.0.0.5", "clerk")
+        throttle.failed("10.0.0.5", "clerk")
+        throttle.attempt("10.0.0.5", "clerk")
+        self.assertGreater(throttle.attempt("10.0.0.5", "clerk"), 0)
+
+    def test_throttled_login_never_opens_a_connection(self):
+        self.addCleanup(setattr, views, "_login_throttle", views._login_throttle)
+        views._login_throttle = LoginThrottle({"user": {"rate_per_minute": 1, "burst": 1}})
+        views._login_throttle.attempt("127.0.0.1", "clerk")
+        body = json.dumps({"userid": "clerk", "password": "x"})
+        with mock.patch.object(views, "get_read_connection") as connect:
+            resp = self.client.post("/login", body, content_type="application/json")
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreaterEqual(int(resp["Retry-After"]), 1)
+        connect.assert_not_called()
+
+
+class SupervisorTests(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        patcher = mock.patch.object(supervisor, "_data_dir", return_value=self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        saved = (dict(supervisor._state), supervisor._discovered)
+        self.addCleanup(self._restore, saved)
+        supervisor._state.update(pid=None, source=None, since=None, last_exit=None)
+        supervisor._discovered = False
+
+    @staticmethod
+    def _restore(saved):
+        supervisor._state.clear()
+        supervisor._state.update(saved[0])
+        supervisor._discovered = saved[1]
+
+    def _wait_until(self, predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return predicate()
+
+    def test_launch_once_then_track_exit(self):
+        script = self.data_dir / "child.py"
+        script.write_text("import time; time.sleep(0.3)")
+        real_popen = subprocess.Popen
+        launch = lambda args, cwd: real_popen([sys.executable, args[0]], cwd=cwd)
+        with mock.patch("subprocess.Popen", side_effect=launch):
+            launched, pid = supervisor.ensure_running(str(script), str(self.data_dir))
+            self.assertTrue(launched)
+            self.assertEqual(supervisor.ensure_running(str(script), str(self.data_dir)), (False, pid))
+        self.assertTrue((self.data_dir / supervisor.LOCK_FILE).exists())
+        self.assertTrue(self._wait_until(lambda: not supervisor.status()["running"]))
+        self.assertEqual(supervisor.status()["last_exit"]["pid"], pid)
+        self.assertFalse((self.data_dir / supervisor.LOCK_FILE).exists())
+
+    def test_adopts_live_instance_from_lock_file(self):
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+        supervisor._write_lock(child.pid, "launched")
+        state = supervisor.status()
+        self.assertEqual((state["running"], state["pid"], state["source"]), (True, child.pid, "lockfile"))
+
+    def test_stale_lock_file_is_removed(self):
+        (self.data_dir / supervisor.LOCK_FILE).write_text(json.dumps({"pid": 999999, "since": time.time()}))
+        self.assertFalse(supervisor.status()["running"])
+        self.assertFalse((self.data_dir / supervisor.LOCK_FILE).exists())
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        hist = metrics.Histogram("test_seconds", "test", ("view",), buckets=(0.1, 1.0))
+        self.addCleanup(metrics._registry.remove, hist)
+        for value in (0.05, 0.5, 5):
+            hist.observe(value, "v")
+        lines = list(hist.render())
+        self.assertIn('test_seconds_bucket{view="v",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{view="v",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{view="v",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{view="v"} 3', lines)
+
+    def test_requests_counted_per_view_and_status(self):
+        before = metrics.REQUESTS.values().get(("get_status", "GET", "200"), 0)
+        self.client.get("/status")
+        body = self.client.get("/metrics").content.decode()
+        self.assertEqual(metrics.REQUESTS.values()[("get_status", "GET", "200")], before + 1)
+        self.assertIn("# TYPE sync_request_duration_seconds histogram", body)
+
+    def test_quantile_interpolates_within_bucket(self):
+        self.assertIsNone(metrics.quantile([0, 0, 0], 0.95, buckets=(0.1, 1.0)))
+        self.assertAlmostEqual(metrics.quantile([0, 10, 0], 0.5, buckets=(0.1, 1.0)), 0.55)
+        self.assertEqual(metrics.quantile([0, 0, 4], 0.95, buckets=(0.1, 1.0)), 1.0)
+
+    def test_snapshot_tracks_in_flight_and_write_connections(self):
+        seen = {}
+
+        def view(request):
+            seen.update(metrics.snapshot(("sync_db_write_in_use",)))
+            return JsonResponse({})
+
+        middleware = metrics.MetricsMiddleware(
+            lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        conn = sql_helper.InstrumentedConnection(mock.Mock())
+        middleware(RequestFactory().get("/"))
+        self.assertEqual(seen["in_flight"]["view"], 1)
+        self.assertEqual(seen["gauges"]["sync_db_write_in_use"], 1)
+        conn.close()
+        conn.close()
+        after = metrics.snapshot(("sync_db_write_in_use",))
+        self.assertEqual((after["in_flight"]["view"], after["gauges"]["sync_db_write_in_use"]), (0, 0))
+
+    def test_middleware_runs_inline_on_the_async_chain(self):
+        async def view(request):
+            return JsonResponse({})
+
+        async def inner(request):
+            await metrics_mw.process_view(request, view, (), {})
+            return await profiling_mw.process_view(request, view, (), {}) or await view(request)
+
+        profiling_mw = profiling.ProfilingMiddleware(inner)
+        metrics_mw = metrics.MetricsMiddleware(profiling_mw)
+        chain = request_log.RequestLogMiddleware(devices.DeviceTelemetryMiddleware(
+            tracing.TracingMiddleware(metrics_mw)))
+        self.assertTrue(all(iscoroutinefunction(mw) for mw in (chain, metrics_mw, profiling_mw)))
+
+        before = metrics.REQUESTS.values().get(("view", "GET", "200"), 0)
+        with mock.patch.object(SyncToAsync, "__call__", side_effect=AssertionError("thread hop")):
+            response = asyncio.run(chain(RequestFactory().get("/")))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Request-ID", response)
+        self.assertEqual(metrics.REQUESTS.values()[("view", "GET", "200")], before + 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    @staticmethod
+    def _start(flight, key, fn, timeout=None, follower=False):
+        """flight.do in a thread, started once `key` is in flight; returns (thread, [result or exception])."""
+        outcome = []
+
+        def call():
+            try:
+                outcome.append(flight.do(key, fn, timeout=timeout))
+            except Exception as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        while key not in flight.in_flight() or (follower and not flight.in_flight().get(key)):
+            time.sleep(0.001)
+        return thread, outcome
+
+    def test_leader_error_reaches_followers_and_key_is_released(self):
+        flight, release = SingleFlight(), threading.Event()
+        calls = []
+
+        def failing():
+            calls.append(1)
+            release.wait(5)
+            raise ValueError("db down")
+
+        leader, led = self._start(flight, "k", failing)
+        follower, followed = self._start(flight, "k", failing, follower=True)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertIsInstance(led[0], ValueError)
+        self.assertIs(followed[0], led[0])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.in_flight(), {})
+        self.assertEqual(flight.do("k", lambda: "retried"), "retried")    # next caller leads again
+
+    def test_follower_times_out_without_interrupting_the_leader(self):
+        flight, release = SingleFlight(), threading.Event()
+        leader, led = self._start(flight, "k", lambda: release.wait(5))
+        follower, followed = self._start(flight, "k", lambda: "unused", timeout=0.05, follower=True)
+        follower.join(5)
+        self.assertIsInstance(followed[0], SingleFlightTimeout)
+
+        release.set()
+        leader.join(5)
+        self.assertEqual(led, [True])
+        self.assertEqual(flight.in_flight(), {})
+
+    def test_coalesced_runs_the_view_once_and_shares_its_headers(self):
+        release, calls = threading.Event(), []
+
+        @views.coalesced
+        def heavy(request):
+            calls.append(1)
+            release.wait(5)
+            resp = JsonResponse({"rows": 3})
+            resp["X-Catalog-Version"] = "v7"
+            return resp
+
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(heavy(RequestFactory().get("/heavy?x=1"))))
+                   for _ in range(2)]
+        threads[0].start()
+        while not views._flight.in_flight():
+            time.sleep(0.001)
+        threads[1].start()
+        while not any(views._flight.in_flight().values()):
+            time.sleep(0.001)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([(r.status_code, r["X-Catalog-Version"], r["Content-Type"], json.loads(r.content))
+                          for r in responses], [(200, "v7", "application/json", {"rows": 3})] * 2)
+        self.assertIsNot(responses[0], responses[1])
+
+    def test_data_download_answers_503_when_the_build_wait_times_out(self):
+        token = jwt.encode({"sub": "alice", "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)},
+                           views.JWT_SECRET, algorithm=views.JWT_ALGO)
+        with mock.patch.object(catalog, "fresh", side_effect=SingleFlightTimeout("slow build")):
+            response = self.client.get("/data-download", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], str(views.FLIGHT_RETRY_AFTER_SECONDS))
+
+
+class CatalogTests(SimpleTestCase):
+    MASTERS = [("M1", "Customer", "North")]
+
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.products = [("P1", "Soap", "8900001", Decimal("5"), Decimal("10.50"), None, Decimal("8"), "")]
+        for name, value in (("_data_dir", lambda: self.data_dir), ("_current", None),
+                            ("get_read_connection", self._connection)):
+            patcher = mock.patch.object(catalog, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _connection(self):
+        conn = mock.Mock()
+        conn.cursor.return_value.fetchall.side_effect = [list(self.MASTERS), list(self.products)]
+        return conn
+
+    def _files(self):
+        return sorted(p.name for p in (self.data_dir / catalog.CATALOG_DIR).glob("*-*.*"))
+
+    def test_rebuild_keeps_version_until_data_changes_and_prunes_old_snapshots(self):
+        first = catalog.build_catalog()
+        self.assertEqual(first["product_rows"], 1)
+        self.assertEqual(json.loads(catalog.payload_path(first).read_bytes())["product_data"][0]["bmrp"], 0.0)
+        self.assertIs(catalog.build_catalog(), first)                         # same rows → same snapshot
+
+        self.products.append(("P2", "Rice", "8900002", 1, 2, 3, 4, ""))
+        second = catalog.build_catalog()
+        self.assertNotEqual(second["version"], first["version"])
+        self.assertEqual(second["previous"]["version"], first["version"])     # kept for resumes
+        self.assertEqual(len(self._files()), 4)
+
+        self.products.append(("P3", "Salt", "8900003", 1, 2, 3, 4, ""))
+        third = catalog.build_catalog()
+        self.assertEqual(self._files(), sorted([third["file"], third["payload_file"],
+                                                second["file"], second["payload_file"]]))
+
+    def test_fresh_serves_stale_snapshot_and_rebuilds_in_background(self):
+        with mock.patch.object(catalog, "request_build") as request_build:
+            built = catalog.fresh()                                           # nothing yet: built inline
+            self.assertEqual(built["product_rows"], 1)
+            self.assertIs(catalog.fresh(), built)
+            request_build.assert_not_called()
+
+            built["checked_ts"] -= catalog._max_age_seconds() + 1
+            self.assertIs(catalog.fresh(), built)
+            request_build.assert_called_once_with()
+
+    def test_snapshot_headers_report_the_staleness(self):
+        info = catalog.build_catalog()
+        info["checked_ts"] -= 90
+        headers = catalog.snapshot_headers(info)
+        self.assertEqual((headers["X-Catalog-Version"], headers["X-Catalog-Built-At"]),
+                         (info["version"], info["built_at"]))
+        self.assertIn(int(headers["Age"]), (90, 91))
+
+
+class _PlanCursor:
+    """Answers the advisor's catalog queries with no indexes, a canned PLAN() and GRAPHICAL_PLAN()."""
+
+    def __init__(self, plan, graphical=None):
+        self.plan, self.graphical, self.last = plan, graphical, None
+
+    def execute(self, sql, params=()):
+        self.last = sql
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        if "GRAPHICAL_PLAN(" in self.last:
+            return (self.graphical,)
+        return (self.plan,) if "PLAN(" in self.last else (1000,)
+
+
+class IndexAdvisorTests(SimpleTestCase):
+    def _check(self, plan, table, column, selective=True, graphical=None):
+        return index_advisor._check_target(_PlanCursor(plan, graphical), table, column, "test", catalog.PRODUCT_SQL,
+                                           selective)
+
+    def test_seq_scan_is_found_under_the_correlation_name(self):
+        plan = "p<seq> JHO pb<seq>"
+        self.assertTrue(self._check(plan, "acc_productbatch", "productcode").get("seq_scan"))
+        self.assertTrue(self._check(plan, "acc_product", "code").get("seq_scan"))
+
+    def test_index_scan_is_not_a_seq_scan(self):
+        result = self._check("p<seq> JNL pb<ix_tms_acc_productbatch_productcode>", "acc_productbatch", "productcode")
+        self.assertNotIn("seq_scan", result)
+        self.assertEqual(result["status"], "missing")
+
+    def test_full_catalog_join_is_not_flagged(self):
+        result = self._check("p<seq> JHO pb<seq>", "acc_productbatch", "productcode", selective=False)
+        self.assertNotIn("seq_scan", result)
+        self.assertEqual((result["status"], result["recommendation"]), ("scan expected", None))
+
+    def test_estimates_come_from_the_graphical_plan(self):
+        graphical = ("<ExecutionPlan><Node><EstRowCount>1</EstRowCount><EstTotalCost>0.0021</EstTotalCost>"
+                     "<Node><EstRowCount>48000</EstRowCount></Node></Node></ExecutionPlan>")
+        result = self._check("acc_users<seq>", "acc_users", "id", graphical=graphical)
+        self.assertEqual(result["estimates"], {"rows": 1.0, "cost": 0.0021})
+        self.assertIsNone(self._check("acc_users<seq>", "acc_users", "id")["estimates"])
+
+
+class HttpRangeTests(SimpleTestCase):
+    ETAG = '"v1"'
+
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "payload.json"
+        self.addCleanup(shutil.rmtree, self.path.parent, ignore_errors=True)
+        self.path.write_bytes(bytes(range(100)))
+
+    def _get(self, **headers):
+        resp = http_range.ranged_file_response(RequestFactory().get("/", **headers), self.path,
+                                               "application/json", self.ETAG)
+        self.addCleanup(resp.close)
+        body = b"".join(resp.streaming_content) if resp.streaming else resp.content
+        return resp, body
+
+    def test_single_range(self):
+        resp, body = self._get(HTTP_RANGE="bytes=10-19")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], "bytes 10-19/100")
+        self.assertEqual((resp["Content-Length"], body), ("10", bytes(range(10, 20))))
+
+    def test_suffix_range(self):
+        resp, body = self._get(HTTP_RANGE="bytes=-5")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], "bytes 95-99/100")
+        self.assertEqual(body, bytes(range(95, 100)))
+
+    def test_range_response_survives_a_prune_before_the_first_read(self):
+        resp = http_range.ranged_file_response(RequestFactory().get("/", HTTP_RANGE="bytes=10-19"), self.path,
+                                               "application/json", self.ETAG)
+        self.addCleanup(resp.close)
+        self.path.unlink()                              # catalog._prune between lookup and streaming
+        self.assertEqual(b"".join(resp.streaming_content), bytes(range(10, 20)))
+
+    def test_unsatisfiable_range(self):
+        resp, _ = self._get(HTTP_RANGE="bytes=100-")
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp["Content-Range"], "bytes */100")
+
+    def test_mismatched_if_range_sends_everything(self):
+        resp, body = self._get(HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"v0"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(body, bytes(range(100)))
+        self.assertEqual((resp["ETag"], resp["Accept-Ranges"]), (self.ETAG, "bytes"))
+
+    def test_multi_range_falls_back_to_full_response(self):
+        resp, body = self._get(HTTP_RANGE="bytes=0-9,20-29", HTTP_IF_RANGE=self.ETAG)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(body), 100)
+
+    def test_data_download_matching_etag_is_304(self):
+        info = {"version": "v1", "payload_sha256": "v1", "payload_file": self.path.name,
+                "built_at": "2024-01-01T00:00:00", "checked_ts": time.time()}
+        token = jwt.encode({"sub": "alice", "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)},
+                           views.JWT_SECRET, algorithm=views.JWT_ALGO)
+        with mock.patch.object(catalog, "fresh", return_value=info), \
+                mock.patch.object(catalog, "_catalog_dir", return_value=self.path.parent):
+            cached = self.client.get("/data-download", HTTP_AUTHORIZATION=f"Bearer {token}",
+                                     HTTP_IF_NONE_MATCH=self.ETAG)
+            changed = self.client.get("/data-download", HTTP_AUTHORIZATION=f"Bearer {token}",
+                                      HTTP_IF_NONE_MATCH='"v0"')
+        self.addCleanup(changed.close)
+        self.assertEqual((cached.status_code, cached.content, cached["ETag"]), (304, b"", self.ETAG))
+        self.assertEqual((changed.status_code, changed["X-Catalog-Version"], changed["Age"]), (200, "v1", "0"))
+        self.assertEqual(b"".join(changed.streaming_content), bytes(range(100)))
+
+
+class AsyncStreamTests(SimpleTestCase):
+    def test_file_downloads_stream_in_large_blocks_on_their_own_executor(self):
+        path = Path(tempfile.mkdtemp()) / "catalog.json"
+        self.addCleanup(shutil.rmtree, path.parent, ignore_errors=True)
+        path.write_bytes(b"x" * (2 * http_range.CHUNK_SIZE + 10))
+
+        async def collect():
+            resp = async_views._stream_async(FileResponse(open(path, "rb")))
+            try:
+                return [len(chunk) async for chunk in resp.streaming_content]
+            finally:
+                resp.close()
+
+        with mock.patch.object(async_views, "_io_executor", None):         # shared pool untouched
+            sizes = asyncio.run(collect())
+        self.assertEqual(sizes, [http_range.CHUNK_SIZE, http_range.CHUNK_SIZE, 10])
+
+
+class AsyncDbSlotTests(SimpleTestCase):
+    """Only sqlanydb work counts against async_db_workers + async_db_queue."""
+
+    def setUp(self):
+        patcher = mock.patch.object(async_views, "_run_db", wraps=async_views._run_db)
+        self.run_db = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _token():
+        return jwt.encode({"sub": "alice", "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)},
+                          views.JWT_SECRET, algorithm=views.JWT_ALGO)
+
+    def test_bad_token_is_rejected_without_a_db_slot(self):
+        request = RequestFactory().get("/data-download", HTTP_AUTHORIZATION="Bearer not-a-jwt")
+        response = asyncio.run(async_views.data_download(request))
+        self.assertEqual(response.status_code, 401)
+        self.run_db.assert_not_called()
+
+    def test_throttled_login_is_rejected_without_a_db_slot(self):
+        request = RequestFactory().post("/login", json.dumps({"userid": "alice", "password": "x"}),
+                                        content_type="application/json")
+        with mock.patch.object(views._login_throttle, "attempt", return_value=30):
+            response = asyncio.run(async_views.login(request))
+        self.assertEqual((response.status_code, response["Retry-After"]), (429, "30"))
+        self.run_db.assert_not_called()
+
+    def test_coalesced_followers_wait_without_a_db_slot(self):
+        release, calls, peak = threading.Event(), [], []
+
+        def details(request):
+            calls.append(1)
+            peak.append(async_views._db_in_flight)
+            release.wait(5)
+            return JsonResponse({"rows": 3})
+
+        heavy = mock.Mock(uncoalesced=details)
+        auth = f"Bearer {self._token()}"
+
+        async def burst():
+            tasks = [asyncio.ensure_future(async_views._token_checked(
+                lambda r: async_views._run_db_coalesced(heavy, r))(
+                    RequestFactory().get("/product-details", HTTP_AUTHORIZATION=auth))) for _ in range(5)]
+            while not calls:
+                await asyncio.sleep(0.001)
+            self.assertEqual(async_views._db_in_flight, 1)
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        responses = asyncio.run(burst())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(peak, [1])
+        self.assertEqual([json.loads(r.content) for r in responses], [{"rows": 3}] * 5)
+        self.assertEqual(async_views._flights, {})
+
+
+class ReadPoolTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(sql_helper, "_read_pool", [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_config_is_read_once(self):
+        sql_helper.reload_config()
+        self.addCleanup(sql_helper.reload_config)
+        with mock.patch.object(sql_helper, "_load_config", return_value={"read_pool_size": 2}) as load:
+            for _ in range(3):
+                self.assertEqual(sql_helper._read_pool_settings()[0], 2)
+                sql_helper._read_settings()
+        self.assertEqual(load.call_count, 1)
+
+    def test_slow_query_threshold_follows_reload_config(self):
+        self.addCleanup(sql_helper.reload_config)
+        with mock.patch.dict(os.environ), mock.patch.object(sql_helper, "_load_config") as load:
+            os.environ.pop("DB_SLOW_QUERY_MS", None)
+            for threshold in (250, 80):
+                load.return_value = {"slow_query_ms": threshold}
+                sql_helper.reload_config()
+                self.assertEqual(sql_helper._slow_query_ms(), threshold)
+
+    def test_dead_pooled_connection_is_dropped_on_checkout(self):
+        alive, dead = mock.Mock(), mock.Mock()
+        dead.cursor.return_value.execute.side_effect = OSError("server restarted")
+        sql_helper._read_pool.extend([(alive, time.monotonic()), (dead, time.monotonic())])
+
+        self.assertIs(sql_helper._checkout_pooled(), alive)          # dead one was newest
+        dead.close.assert_called_once_with()
+        alive.close.assert_not_called()
+        self.assertIsNone(sql_helper._checkout_pooled())
+
+    def test_committed_checkout_restores_the_pool_isolation(self):
+        raw = mock.Mock()
+        sql_helper._read_pool.append((raw, time.monotonic()))
+        with mock.patch.object(sql_helper, "_read_settings", return_value=("0", 500, 500)):
+            conn = sql_helper.get_read_connection(isolation=sql_helper.READ_COMMITTED)
+            conn.close()
+        executed = [c.args[0] for c in raw.cursor.return_value.execute.call_args_list]
+        self.assertEqual(executed, ["SELECT 1", "SET TEMPORARY OPTION isolation_level = '1'",
+                                    "SET TEMPORARY OPTION isolation_level = '0'"])
+        self.assertEqual([c for c, _ in sql_helper._read_pool], [raw])
+
+
+class _SlowCursor:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def execute(self, sql, params=()):
+        time.sleep(self.delay)
+
+    def fetchall(self):
+        return [(1,), (2,)]
+
+    def close(self):
+        pass
+
+
+class InstrumentedCursorTests(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        for name, value in (("_data_dir", lambda: self.data_dir), ("_slow_query_ms", lambda: 20)):
+            patcher = mock.patch.object(sql_helper, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self._drop_logger)
+
+    @staticmethod
+    def _drop_logger():
+        logger = sql_helper._slow_logger
+        if logger is not None:
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+        sql_helper._slow_logger = None
+
+    def _run(self, delay, view="get_product_details"):
+        token = metrics.current_view.set(view)
+        try:
+            cur = sql_helper.InstrumentedCursor(_SlowCursor(delay))
+            cur.execute("SELECT code\n  FROM acc_product WHERE id = ?", ("secret",))
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            metrics.current_view.reset(token)
+        return rows
+
+    def _slow_lines(self):
+        request_log.flush()
+        path = self.data_dir / "logs" / "slow_queries.log"
+        if not path.exists():
+            return []
+        return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+    def test_slow_query_logged_with_view_and_timings(self):
+        self.assertEqual(self._run(0.03), [(1,), (2,)])
+        (entry,) = self._slow_lines()
+        self.assertEqual(entry["view"], "get_product_details")
+        self.assertEqual(entry["sql"], "SELECT code FROM acc_product WHERE id = ?")
+        self.assertEqual(entry["rows"], 2)
+        self.assertGreaterEqual(entry["execute_ms"], 20)
+        self.assertNotIn("secret", json.dumps(entry))
+
+    def test_fast_query_not_logged(self):
+        self._run(0)
+        self.assertEqual(self._slow_lines(), [])
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        config = {"profiling_admins": ["admin"], "profiling_keep": 2}
+        for name, value in (("_data_dir", lambda: self.data_dir), ("_get_config", lambda: config)):
+            patcher = mock.patch.object(profiling, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _auth(self, userid):
+        exp = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        token = jwt.encode({"sub": userid, "exp": exp}, views.JWT_SECRET, algorithm=views.JWT_ALGO)
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def test_admin_capture_is_listed_and_downloadable(self):
+        resp = self.client.get("/status?profile=1", **self._auth("admin"))
+        capture_id = resp["X-Profile-Id"]
+        listed = self.client.get("/diagnostics/profiles", **self._auth("admin")).json()["profiles"]
+        self.assertEqual([p["id"] for p in listed], [capture_id])
+        self.assertEqual(listed[0]["view"], "get_status")
+        report = json.loads(b"".join(self.client.get(
+            f"/diagnostics/profiles/{capture_id}?format=json", **self._auth("admin")).streaming_content))
+        self.assertGreater(report["peak_traced_bytes"], 0)
+        self.assertIn("get_status", report["top_functions"])
+        prof = self.client.get(f"/diagnostics/profiles/{capture_id}", **self._auth("admin"))
+        self.assertEqual(prof.status_code, 200)
+
+    def test_non_admin_is_not_profiled_and_cannot_list(self):
+        resp = self.client.get("/status", HTTP_X_PROFILE="1", **self._auth("clerk"))
+        self.assertNotIn("X-Profile-Id", resp)
+        self.assertEqual(self.client.get("/diagnostics/profiles", **self._auth("clerk")).status_code, 403)
+
+    def test_asgi_views_are_profiled_in_the_executor(self):
+        async def serve(view, path):
+            request = RequestFactory().get(path, HTTP_X_PROFILE="1", **self._auth("admin"))
+            middleware = profiling.ProfilingMiddleware(view)       # async get_response → async chain
+            return await middleware.process_view(request, view, (), {})
+
+        offloaded = asyncio.run(serve(async_views.device_summary, "/diagnostics/devices"))
+        on_loop = asyncio.run(serve(async_views.get_status, "/status"))
+
+        report = json.loads(profiling.capture_path(offloaded["X-Profile-Id"], "json").read_text(encoding="utf-8"))
+        self.assertEqual(report["view"], "device_summary")
+        self.assertEqual((on_loop.status_code, on_loop["X-Profile"]), (200, "unsupported"))
+        self.assertNotIn("X-Profile-Id", on_loop)
+
+    def test_ring_keeps_newest_captures(self):
+        ids = [self.client.get("/status?profile=1", **self._auth("admin"))["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual(len(list(self.data_dir.glob("profiles/*.prof"))), 2)
+        self.assertIsNone(profiling.capture_path(ids[0], "json"))
+
+
+class TracingTests(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        patcher = mock.patch.object(sql_helper, "_data_dir", lambda: self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _middleware(self, view, rate):
+        with mock.patch.object(tracing, "_sample_rate", return_value=rate):
+            return tracing.TracingMiddleware(view)
+
+    def _events(self, count):
+        path = self.data_dir / "logs" / tracing.TRACE_FILE
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if path.exists():
+                events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+                if len(events) >= count:
+                    return events
+            time.sleep(0.02)
+        self.fail("trace not exported")
+
+    def test_sampled_request_exports_chrome_trace_events(self):
+        def view(request):
+            with tracing.span("json parse"):
+                pass
+            tracing.record("sql execute", time.perf_counter(), time.perf_counter(), "db", sql="SELECT 1")
+            return JsonResponse({"ok": True})
+
+        resp = self._middleware(view, 1.0)(RequestFactory().get("/status"))
+        events = self._events(3)
+        self.assertEqual([e["name"] for e in events], ["json parse", "sql execute", "GET /status"])
+        self.assertTrue(all(e["ph"] == "X" and e["args"]["trace_id"] == resp["X-Trace-Id"] for e in events))
+
+    def test_streamed_response_gets_write_span(self):
+        path = self.data_dir / "body.bin"
+        path.write_bytes(b"x" * 10000)
+        resp = self._middleware(lambda request: FileResponse(open(path, "rb")), 1.0)(RequestFactory().get("/data-download"))
+        self.assertEqual(len(b"".join(resp.streaming_content)), 10000)
+        resp.close()
+        events = self._events(2)
+        self.assertEqual(events[0]["name"], "response write")
+        self.assertEqual(events[0]["args"]["bytes"], 10000)
+
+    def test_export_converts_to_a_trace_viewer_file(self):
+        self._middleware(lambda request: JsonResponse({}), 1.0)(RequestFactory().get("/status"))
+        self._events(1)
+        out = self.data_dir / "chrome.json"
+        self.assertEqual(tracing.to_chrome_trace(out), 1)
+        self.assertEqual([e["name"] for e in json.loads(out.read_text(encoding="utf-8"))["traceEvents"]],
+                         ["GET /status"])
+
+    def test_unsampled_request_records_nothing(self):
+        resp = self._middleware(lambda request: JsonResponse({}), 0.0)(RequestFactory().get("/status"))
+        self.assertNotIn("X-Trace-Id", resp)
+        self.assertFalse(tracing.active())
+
+
+class MicrobenchTests(SimpleTestCase):
+    def test_compare_flags_throughput_and_allocation_regressions(self):
+        baseline = {"results": {"to_float@1000": {"rows_per_s": 1000, "peak_bytes": 1000}}}
+        ok = {"to_float@1000": {"rows_per_s": 800, "peak_bytes": 1050},
+              "new_case@1000": {"rows_per_s": 1, "peak_bytes": 10 ** 9}}
+        self.assertEqual(microbench.compare(ok, baseline, 0.30, 0.10), [])
+
+        slow = {"to_float@1000": {"rows_per_s": 600, "peak_bytes": 1200}}
+        failures = microbench.compare(slow, baseline, 0.30, 0.10)
+        self.assertEqual(len(failures), 2)
+        self.assertTrue(all(line.startswith("to_float@1000:") for line in failures))
+
+    def test_helpers_keep_their_output_shape(self):
+        rows = microbench._detail_rows(20, microbench.random.Random(1))
+        out = views._product_detail_dicts(rows)
+        self.assertEqual(len(out), 20)
+        self.assertIsInstance(out[0]["cost"], float)
+        self.assertEqual(len(views._group_orders(microbench._flat_orders(25, microbench.random.Random(1)))), 3)
+
+
+class _Collect(logging.Handler):
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.records = []
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.records.append(record)
+
+
+class RequestLogTests(SimpleTestCase):
+    def _access_records(self, **headers):
+        collect = _Collect()
+        logger = logging.getLogger(request_log.ACCESS_LOGGER)
+        logger.addHandler(collect)
+        self.addCleanup(logger.removeHandler, collect)
+        response = self.client.get("/status", **headers)
+        return response, collect.records
+
+    def test_access_line_carries_request_id_view_and_duration(self):
+        response, (record,) = self._access_records()
+        self.assertEqual(record.request_id, response["X-Request-ID"])
+        self.assertEqual((record.view, record.status, record.method), ("get_status", 200, "GET"))
+        self.assertGreaterEqual(record.duration_ms, 0)
+
+        response, (record,) = self._access_records(HTTP_X_REQUEST_ID="device-7.abc")
+        self.assertEqual(response["X-Request-ID"], "device-7.abc")
+        response, _ = self._access_records(HTTP_X_REQUEST_ID="bad id\n")
+        self.assertNotEqual(response["X-Request-ID"], "bad id\n")
+
+    def test_per_endpoint_level_and_json_output(self):
+        def record(level):
+            return logging.LogRecord("sync", level, __file__, 1, "rows=%s", (3,), None)
+
+        token = metrics.current_view.set("metrics_view")
+        try:
+            self.assertFalse(request_log._stamp(record(logging.INFO)))
+            self.assertTrue(request_log._stamp(record(logging.WARNING)))
+        finally:
+            metrics.current_view.reset(token)
+
+        token = request_log._request.set(("abc123", time.perf_counter()))
+        try:
+            stamped = record(logging.INFO)
+            self.assertTrue(request_log._stamp(stamped))
+        finally:
+            request_log._request.reset(token)
+        entry = json.loads(request_log.JsonFormatter().format(stamped))
+        self.assertEqual((entry["msg"], entry["request_id"], entry["view"]), ("rows=3", "abc123", "background"))
+
+    def test_slow_handler_does_not_block_the_caller(self):
+        collect = _Collect(delay=0.05)
+        handler = request_log.offload(collect)
+        self.addCleanup(handler.close)
+        logger = logging.getLogger("sync.tests.offload")
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        started = time.perf_counter()
+        for i in range(10):
+            logger.warning("line %s", i)
+        self.assertLess(time.perf_counter() - started, 0.05)
+        request_log.flush()
+        self.assertEqual([r.getMessage() for r in collect.records], [f"line {i}" for i in range(10)])
+
+
+class DeviceTelemetryTests(SimpleTestCase):
+    def _token(self, sub, days=1):
+        exp = datetime.datetime.utcnow() + datetime.timedelta(days=days)
+        return jwt.encode({"sub": sub, "exp": exp}, views.JWT_SECRET, algorithm=views.JWT_ALGO)
+
+    def test_registry_aggregates_evicts_and_persists(self):
+        path = Path(tempfile.mkdtemp()) / "devices.sqlite3"
+        self.addCleanup(shutil.rmtree, path.parent, ignore_errors=True)
+        reg = devices.DeviceRegistry(path, max_devices=2)
+        reg.record("hh-1", "alice", "data_download", 200, bytes_out=5000, server_ms=40, rows=120, now=1)
+        reg.record("hh-1", "alice", "upload_orders", 500, bytes_in=300, server_ms=900, now=2)
+        reg.record("hh-2", "bob", "verify_token", 200, server_ms=2, now=3)
+        reg.record("hh-3", "carol", "get_product_details", 200, bytes_out=90000, server_ms=300, now=4)
+
+        summary = reg.summary(limit=1)
+        self.assertEqual(summary["devices"], 2)                    # hh-1 least recently seen → dropped
+        self.assertEqual(summary["slowest"][0]["device_id"], "hh-3")
+        self.assertEqual(summary["heaviest"][0]["bytes_out"], 90000)
+        self.assertEqual(reg.flush(), 3)                            # evicted hh-1 is still saved
+        self.assertEqual(reg.flush(), 0)
+
+        reloaded = devices.DeviceRegistry(path, max_devices=10)
+        row = reloaded.summary()["most_failures"][0]
+        self.assertEqual((row["device_id"], row["requests"], row["failures"], row["full_downloads"], row["rows"]),
+                         ("hh-1", 2, 1, 1, 120))
+        self.assertEqual((row["last_sync"], row["last_failure"]), (1, 2))
+
+    def test_middleware_records_authenticated_requests(self):
+        reg = devices.DeviceRegistry()
+        patcher = mock.patch.object(devices, "_registry", reg)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client.get("/status")                                               # anonymous: ignored
+        self.client.get("/verify-token", HTTP_AUTHORIZATION=f"Bearer {self._token('alice')}",
+                        HTTP_X_DEVICE_ID="hh-7")
+        for i in range(3):                                                       # unverified: one anonymous row
+            self.client.get("/verify-token", HTTP_AUTHORIZATION=f"Bearer {self._token('alice', days=-1)}",
+                            HTTP_X_DEVICE_ID=f"forged-{i}")
+        forged = jwt.encode({"sub": "carol"}, "not-the-secret", algorithm=views.JWT_ALGO)
+        self.client.get("/verify-token", HTTP_AUTHORIZATION=f"Bearer {forged}", HTTP_X_DEVICE_ID="hh-7")
+        response = self.client.get("/diagnostics/devices", HTTP_AUTHORIZATION=f"Bearer {self._token('bob')}")
+
+        self.assertEqual(response.status_code, 200)
+        rows = {(r["device_id"], r["userid"]): r for r in response.json()["heaviest"]}
+        self.assertEqual(set(rows), {("hh-7", "alice"), ("-", "anonymous")})
+        self.assertEqual(reg.stats()["devices"], 3)                              # the summary call itself
+        alice = rows[("hh-7", "alice")]
+        self.assertEqual((alice["requests"], alice["failures"], alice["last_status"]), (1, 0, 200))
+        self.assertEqual(alice["last_endpoint"], "verify_token")
+        self.assertGreater(alice["bytes_out"], 0)
+        anonymous = rows[("-", "anonymous")]
+        self.assertEqual((anonymous["requests"], anonymous["failures"], anonymous["last_status"]), (4, 4, 401))
+
+
+class FakeDriverTests(SimpleTestCase):
+    """End-to-end through the real views on the benchmark SQLite driver."""
+
+    def setUp(self):
+        from benchmarks import fake_sqlanydb
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        env = mock.patch.dict(os.environ, {"FAKE_SQLANY_CONNECT_MS": "0", "FAKE_SQLANY_QUERY_MS": "0",
+                                           "FAKE_SQLANY_ROW_US": "0", "DB_READ_POOL_SIZE": "0"})
+        env.start()
+        self.addCleanup(env.stop)
+        fake_sqlanydb.seed(os.path.join(self.tmp, "sqlany.db"), products=50, users=3)
+        for name, value in (("sqlanydb", fake_sqlanydb), ("SQLANYDB_AVAILABLE", True)):
+            patcher = mock.patch.object(sql_helper, name, value, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _post(self, path, body, **headers):
+        return self.client.post(path, json.dumps(body), content_type="application/json", **headers)
+
+    def test_login_details_and_upload(self):
+        self.assertEqual(self._post("/login", {"userid": "user1", "password": "bad"}).status_code, 401)
+        response = self._post("/login", {"userid": "user1", "password": "pass"})
+        self.assertEqual(response.status_code, 200)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {response.json()['token']}"}
+
+        details = self.client.get("/product-details", **auth)
+        self.assertEqual(details.status_code, 200)
+        self.assertTrue(details.content)
+
+        upload = self._post("/upload-orders", {"orders": [{"item": "P000001", "qty": 2, "mrp": "9.50"}]}, **auth)
+        self.assertEqual(upload.status_code, 200)
+        self.assertEqual(upload.json()["rows_inserted"], 1)
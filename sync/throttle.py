@@ -0,0 +1,131 @@
+"""
+Login throttling - in-memory token buckets per client IP and per userid
+Checked before login opens a DB connection, so a device stuck in a retry
+loop (or a password guesser) is answered with 429 instead of reaching
+SQL Anywhere.
+  • every attempt costs 1 token from both buckets
+  • a failed login costs failure_cost in total (the extra is charged after
+    the credentials were rejected)
+  • buckets refill at rate_per_minute up to burst
+Config (config.json, all optional):
+    "login_throttle": {
+        "enabled": true,
+        "ip":   {"rate_per_minute": 30, "burst": 10},
+        "user": {"rate_per_minute": 10, "burst": 5},
+        "failure_cost": 3
+    }
+"""
+import time
+import threading
+from collections import OrderedDict
+
+from .sql_helper import _get_config
+
+DEFAULTS = {
+    "enabled": True,
+    "ip": {"rate_per_minute": 30, "burst": 10},
+    "user": {"rate_per_minute": 10, "burst": 5},
+    "failure_cost": 3,
+}
+MAX_KEYS = 10000            # per limiter; least recently seen keys are dropped
+
+
+class TokenBucketLimiter:
+    """Token bucket per key. Not thread-safe on its own - LoginThrottle locks."""
+
+    def __init__(self, rate_per_minute, burst, max_keys=MAX_KEYS):
+        self.rate = max(float(rate_per_minute), 0.001) / 60.0      # tokens / second
+        self.burst = max(float(burst), 1.0)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()       # key -> [tokens, updated]
+
+    def _tokens(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def wait_time(self, key, cost, now):
+        """Seconds until `cost` tokens are available (0 = now)."""
+        tokens = self._tokens(key, now)[0]
+        return 0.0 if tokens >= cost else (cost - tokens) / self.rate
+
+    def take(self, key, cost, now):
+        bucket = self._tokens(key, now)
+        bucket[0] = max(0.0, bucket[0] - cost)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    def __init__(self, settings=None):
+        cfg = _merge(DEFAULTS, settings or {})
+        self.enabled = bool(cfg["enabled"])
+        self.failure_cost = max(1.0, float(cfg["failure_cost"]))
+        self.by_ip = TokenBucketLimiter(cfg["ip"]["rate_per_minute"], cfg["ip"]["burst"])
+        self.by_user = TokenBucketLimiter(cfg["user"]["rate_per_minute"], cfg["user"]["burst"])
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    @classmethod
+    def from_config(cls):
+        settings = _get_config().get("login_throttle") or {}
+        try:
+            return cls(settings)
+        except (TypeError, ValueError, KeyError):
+            print("WARNING: invalid login_throttle settings, using defaults")
+            return cls()
+
+    def attempt(self, ip, userid):
+        """
+        Charge one attempt to both buckets.
+        Returns 0 when allowed, else the seconds to wait (nothing is charged).
+        """
+        if not self.enabled:
+            return 0.0
+        user = userid.lower()
+        now = time.monotonic()
+        with self._lock:
+            wait = max(self.by_ip.wait_time(ip, 1, now), self.by_user.wait_time(user, 1, now))
+            if wait:
+                self.throttled += 1
+                return wait
+            self.by_ip.take(ip, 1, now)
+            self.by_user.take(user, 1, now)
+            return 0.0
+
+    def failed(self, ip, userid):
+        """Extra charge for rejected credentials."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.by_ip.take(ip, self.failure_cost - 1, now)
+            self.by_user.take(userid.lower(), self.failure_cost - 1, now)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "throttled": self.throttled,
+                "tracked_ips": len(self.by_ip),
+                "tracked_users": len(self.by_user),
+            }
+
+
+# ------------------ helpers ------------------
+def _merge(defaults, overrides):
+    out = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(out.get(key), dict) and isinstance(value, dict):
+            out[key] = {**out[key], **value}
+        else:
+            out[key] = value
+    return out
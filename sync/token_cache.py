@@ -0,0 +1,84 @@
+"""
+Verified-JWT cache for jwt_required
+Devices resend the same 7-day token on every call; after the first HMAC
+check the decoded claims are kept here, keyed by the token's SHA-256.
+  • bounded LRU (jwt_cache_size entries, 0 = off)
+  • an entry is dropped once the token's `exp` has passed, so expired
+    tokens always go back through jwt.decode and get "Token expired"
+  • tokens without a numeric `exp` are never cached
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .sql_helper import _get_config
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+def cache_size():
+    try:
+        return max(0, int(_get_config().get("jwt_cache_size", DEFAULT_CACHE_SIZE)))
+    except (TypeError, ValueError):
+        return DEFAULT_CACHE_SIZE
+
+
+class TokenCache:
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()      # digest -> (claims, exp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        """Claims for an already verified, unexpired token - else None."""
+        if not self.maxsize:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        exp = claims.get("exp")
+        if not self.maxsize or not isinstance(exp, (int, float)) or exp <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(claims), exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,253 @@
+"""
+Request tracing - one timeline per sampled request
+TracingMiddleware samples requests at trace_sample_rate (0 = off, 1 = all)
+and keeps the trace in a context variable; span() / record() add timed
+sections to it:
+  • views      - json parse, jwt decode, serialization, ...
+  • sql_helper - connection checkout, every execute / fetch
+  • response   - body write, for streamed responses (file downloads)
+Finished traces go through a queue to a background writer, so the request
+thread never touches the file. Output: logs/traces.jsonl, one complete
+Chrome trace event (JSON object) per line, size-rotated at
+trace_file_bytes (default 20 MB, 2 backups). For chrome://tracing or
+ui.perfetto.dev, `python manage.py trace_export` (to_chrome_trace) wraps
+the lines into a {"traceEvents": [...]} file.
+"""
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+DEFAULT_SAMPLE_RATE = 0.0
+DEFAULT_FILE_BYTES = 20 * 1024 * 1024
+TRACE_FILE = "traces.jsonl"
+BACKUPS = 2
+QUEUE_SIZE = 1000
+
+_current = contextvars.ContextVar("trace", default=None)
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_stats = {"sampled": 0, "exported": 0, "dropped": 0}
+_stats_lock = threading.Lock()
+
+# perf_counter → wall clock µs, fixed once so spans of one trace line up
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+
+
+def _us(perf):
+    return int((perf + _EPOCH_OFFSET) * 1_000_000)
+
+
+class Trace:
+    __slots__ = ("trace_id", "events", "pid")
+
+    def __init__(self):
+        self.trace_id = os.urandom(8).hex()
+        self.events = []
+        self.pid = os.getpid()
+
+    def add(self, name, started, ended, cat="app", args=None):
+        self.events.append({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": _us(started),
+            "dur": max(0, int((ended - started) * 1_000_000)),
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+            "args": dict(args or {}, trace_id=self.trace_id),
+        })
+
+
+# ------------------ recording ------------------
+def active():
+    return _current.get() is not None
+
+def record(name, started, ended, cat="app", **args):
+    """Add an already timed section (perf_counter values) - no-op when not sampled."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started, ended, cat, args)
+
+@contextmanager
+def span(name, cat="app", **args):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter(), cat, args)
+
+
+# ------------------ export ------------------
+def _trace_path():
+    from .sql_helper import _data_dir
+
+    directory = _data_dir() / "logs"
+    directory.mkdir(exist_ok=True)
+    return directory / TRACE_FILE
+
+def _max_bytes():
+    from .sql_helper import _get_config
+
+    try:
+        return int(_get_config().get("trace_file_bytes", DEFAULT_FILE_BYTES))
+    except (TypeError, ValueError):
+        return DEFAULT_FILE_BYTES
+
+def _rotate(path):
+    for i in range(BACKUPS, 0, -1):
+        src = path if i == 1 else path.with_name(f"{path.name}.{i - 1}")
+        if src.exists():
+            os.replace(src, path.with_name(f"{path.name}.{i}"))
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def _write(events):
+    path = _trace_path()
+    if path.exists() and path.stat().st_size >= _max_bytes():
+        _rotate(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+
+def to_chrome_trace(out_path, path=None):
+    """Write the exported lines (oldest backup first) as one trace-viewer file; returns the event count."""
+    path = path or _trace_path()
+    sources = [path.with_name(f"{path.name}.{i}") for i in range(BACKUPS, 0, -1)] + [path]
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        out.write('{"traceEvents":[\n')
+        for source in sources:
+            if not source.exists():
+                continue
+            with open(source, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    out.write(("," if count else "") + line + "\n")
+                    count += 1
+        out.write("]}\n")
+    return count
+
+def _writer_loop():
+    while True:
+        events = _queue.get()
+        try:
+            _write(events)
+            _count("exported")
+        except Exception as e:
+            logging.warning("⚠️ Trace export failed: %s", e)
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="trace-writer", daemon=True)
+            _writer.start()
+
+def _finish(trace):
+    try:
+        _queue.put_nowait(trace.events)
+    except queue.Full:
+        _count("dropped")
+        return
+    _start_writer()
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, queued=_queue.qsize())
+
+
+# ------------------ middleware ------------------
+def _sample_rate():
+    from .sql_helper import _get_config
+
+    try:
+        return min(1.0, max(0.0, float(_get_config().get("trace_sample_rate", DEFAULT_SAMPLE_RATE))))
+    except (TypeError, ValueError):
+        return DEFAULT_SAMPLE_RATE
+
+
+class TracingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = _sample_rate()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        trace = Trace()
+        _count("sampled")
+        token = _current.set(trace)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._complete(request, response, trace, started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        trace = Trace()
+        _count("sampled")
+        token = _current.set(trace)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._complete(request, response, trace, started)
+
+    def _complete(self, request, response, trace, started):
+        returned = time.perf_counter()
+        args = {"view": getattr(request, "metrics_view", "unmatched"), "status": response.status_code}
+        label = f"{request.method} {request.path}"
+        response["X-Trace-Id"] = trace.trace_id
+
+        if getattr(response, "streaming", False) and not response.is_async:
+            response.streaming_content = self._traced_stream(
+                response.streaming_content, trace, label, started, returned, args)
+        else:
+            trace.add(label, started, returned, "request", args)
+            _finish(trace)
+        return response
+
+    @staticmethod
+    def _traced_stream(chunks, trace, label, started, returned, args):
+        sent = 0
+        try:
+            for chunk in chunks:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            ended = time.perf_counter()
+            trace.add("response write", returned, ended, "response", {"bytes": sent})
+            trace.add(label, started, ended, "request", args)
+            _finish(trace)
@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+
+# ASGI serving mode swaps in the async variants (same names, same routes)
+if settings.SYNC_ASYNC_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
 
 urlpatterns = [
     path("pair-check",    views.pair_check,    name="pair_check"),
     path("login",         views.login,         name="login"),
     path("verify-token",  views.verify_token,  name="verify_token"),
     path("data-download", views.data_download, name="data_download"),
+    path("catalog-db",    views.catalog_db,    name="catalog_db"),
     path("upload-orders", views.upload_orders, name="upload_orders"),
     path("status",        views.get_status,    name="get_status"),
+    path("ready",         views.ready,         name="ready"),
+    path("metrics",       views.metrics_view,  name="metrics"),
     path("product-details", views.get_product_details, name="get_product_details"),
-]
\ No newline at end of file
+    path("diagnostics/indexes", views.index_report, name="index_report"),
+    path("diagnostics/devices", views.device_summary, name="device_summary"),
+    path("diagnostics/profiles", views.profile_list, name="profile_list"),
+    path("diagnostics/profiles/<str:capture_id>", views.profile_download, name="profile_download"),
+]
@@ -1,21 +1,27 @@
 import os
 import jwt
-import psutil
-import subprocess
 import sys
 import json
+import math
+import time
 import logging
 from decimal import Decimal
 from datetime import datetime, date, timedelta
 from functools import wraps
 from decimal import Decimal, ROUND_HALF_UP
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from .sql_helper import get_connection, _get_config
+from . import catalog, devices, index_advisor, metrics, profiling, request_log, supervisor, tracing, warmup
+from .http_range import ranged_file_response
+from .rows import _to_float
+from .singleflight import SingleFlight, SingleFlightTimeout
+from .throttle import LoginThrottle
+from .token_cache import TokenCache, cache_size
+from .sql_helper import READ_COMMITTED, get_connection, get_read_connection, _get_config
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+request_log.configure()            # queue + background writer, JSON file, per-endpoint levels
 
 PAIR_PASSWORD = os.getenv("PAIR_PASSWORD", "IMC-MOBILE")
 
@@ -23,6 +29,8 @@ PAIR_PASSWORD = os.getenv("PAIR_PASSWORD", "IMC-MOBILE")
 JWT_SECRET = os.getenv("JWT_SECRET") or "dev-secret-change-me"
 JWT_ALGO   = os.getenv("JWT_ALGO", "HS256")
 
+FLIGHT_RETRY_AFTER_SECONDS = 5      # 503 answer when a single-flight wait times out
+
 
 # ------------------ helpers ------------------
 def _extract_token(request):
@@ -31,36 +39,90 @@ def _extract_token(request):
         return None
     return hdr.split(" ", 1)[1]
 
+_token_cache = TokenCache(cache_size())
+
 def _decode(token):
-    return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+    """Verified claims - HMAC check only the first time a token is seen."""
+    payload = _token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        _token_cache.put(token, payload)
+    return payload
+
+def _authenticate(request):
+    """Set request.userid from the bearer token; returns a 401 response, or None when it is valid."""
+    if getattr(request, "userid", None) is not None:
+        return None                                 # already checked (async views do it on the loop)
+    token = _extract_token(request)
+    if not token:
+        return JsonResponse({"detail": "Token missing"}, status=401)
+    try:
+        with tracing.span("jwt decode"):
+            payload = _decode(token)
+        request.userid = payload["sub"]
+    except jwt.ExpiredSignatureError:
+        return JsonResponse({"detail": "Token expired"}, status=401)
+    except jwt.PyJWTError:
+        return JsonResponse({"detail": "Invalid token"}, status=401)
+    return None
 
 def jwt_required(view_func):
     @wraps(view_func)
     def _wrapped(request, *args, **kwargs):
-        token = _extract_token(request)
-        if not token:
-            return JsonResponse({"detail": "Token missing"}, status=401)
-        try:
-            payload = _decode(token)
-            request.userid = payload["sub"]
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({"detail": "Token expired"}, status=401)
-        except jwt.PyJWTError:
-            return JsonResponse({"detail": "Invalid token"}, status=401)
+        denied = _authenticate(request)
+        if denied is not None:
+            return denied
         return view_func(request, *args, **kwargs)
     return _wrapped
 
-def _to_float(x):
-    if x is None:
-        return None
-    if isinstance(x, (int, float)):
-        return float(x)
-    if isinstance(x, Decimal):
-        return float(x)
-    try:
-        return float(str(x))
-    except Exception:
-        return None
+_flight = SingleFlight()
+_login_throttle = LoginThrottle.from_config()
+
+def _client_ip(request):
+    return request.META.get("REMOTE_ADDR") or "unknown"
+
+def _throttled(retry_after):
+    resp = JsonResponse({"detail": "Too many login attempts, retry later"}, status=429)
+    resp["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return resp
+
+def _busy():
+    """503 for a caller that gave up waiting on an in-flight build / query (SingleFlightTimeout)."""
+    resp = JsonResponse({"detail": "Server busy, retry shortly"}, status=503)
+    resp["Retry-After"] = str(FLIGHT_RETRY_AFTER_SECONDS)
+    return resp
+
+def coalesced(view_func):
+    """
+    Single-flight for heavy read views: identical concurrent requests
+    (same method + path + query) wait for one execution and share its response
+    (status, body and every header). Each caller gets its own copy, so
+    middleware can still add per-request headers.
+    Use below jwt_required so every caller is still authenticated.
+    """
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        key = (view_func.__name__, request.method, request.get_full_path())
+
+        try:
+            shared = _flight.do(key, lambda: _share(view_func(request, *args, **kwargs)),
+                                timeout=catalog.flight_timeout())
+        except SingleFlightTimeout:
+            return _busy()
+        return _unshare(shared)
+    _wrapped.uncoalesced = view_func              # async_views coalesces on the event loop instead
+    return _wrapped
+
+def _share(resp):
+    return resp.status_code, resp.content, list(resp.items())
+
+def _unshare(shared):
+    """A fresh response per caller from a _share()d one."""
+    status, content, headers = shared
+    resp = HttpResponse(content, status=status)
+    for name, value in headers:
+        resp[name] = value
+    return resp
 
 def _coerce_date(v):
     """
@@ -81,6 +143,36 @@ def _coerce_date(v):
     # fallback: today
     return date.today()
 
+def _product_detail_dicts(rows):
+    out = []
+
+    for r in rows:
+        expiry = r[16]
+        if expiry:
+            expiry = expiry.isoformat() if hasattr(expiry, "isoformat") else str(expiry)
+
+        out.append({
+            "code": r[0],
+            "name": r[1],
+            "catagory": r[2],
+            "product": r[3],
+            "brand": r[4],
+            "unit": r[5],
+            "taxcode": r[6],
+            "productcode": r[7],
+            "barcode": r[8],
+            "quantity": _to_float(r[9]),
+            "cost": _to_float(r[10]),
+            "bmrp": _to_float(r[11]),
+            "salesprice": _to_float(r[12]),
+            "secondprice": _to_float(r[13]),
+            "thirdprice": _to_float(r[14]),
+            "supplier": r[15],
+            "expirydate": expiry
+        })
+
+    return out
+
 
 # ------------------ endpoints ------------------
 @csrf_exempt
@@ -105,22 +197,20 @@ def pair_check(request):
         logging.error("❌ TASK_MST_SYNC.exe not found at %s", exe_path)
         return JsonResponse({"detail": "TASK_MST_SYNC.exe not found"}, status=404)
 
-    for proc in psutil.process_iter(["pid", "name"]):
-        try:
-            if proc.info["name"] and "TASK_MST_SYNC.exe" in proc.info["name"]:
-                logging.info("🔄 SyncService already running (PID %s)", proc.info["pid"])
-                return JsonResponse({"status": "success", "message": "SyncService already running", "pair_successful": True})
-        except Exception:
-            continue
-
+    # tracked instance (self / launched child / PID lock file) - no process scan
     try:
-        subprocess.Popen([exe_path], cwd=base_dir)
-        logging.info("✅ SyncService started")
-        return JsonResponse({"status": "success", "message": "SyncService launched successfully", "pair_successful": True})
+        launched, pid = supervisor.ensure_running(exe_path, base_dir)
     except Exception as e:
         logging.error("❌ Failed to start SyncService: %s", e)
         return JsonResponse({"detail": f"Failed to start sync service: {e}"}, status=500)
 
+    if not launched:
+        logging.info("🔄 SyncService already running (PID %s)", pid)
+        return JsonResponse({"status": "success", "message": "SyncService already running", "pair_successful": True})
+
+    logging.info("✅ SyncService started (PID %s)", pid)
+    return JsonResponse({"status": "success", "message": "SyncService launched successfully", "pair_successful": True})
+
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -131,20 +221,38 @@ def login(request):
       • default JWT secret so encode never crashes
       • clearer error messages
     """
+    credentials, denied = _login_gate(request)
+    if denied is not None:
+        return denied
+    return _check_credentials(request, *credentials)
+
+def _login_gate(request):
+    """Parse + throttle, no DB: ((ip, userid, password), None) or (None, error response)."""
     try:
-        data = json.loads(request.body or b"{}")
+        with tracing.span("json parse"):
+            data = json.loads(request.body or b"{}")
         userid = (data.get("userid") or "").strip()
         password = (data.get("password") or "").strip()
     except Exception:
-        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+        return None, JsonResponse({"detail": "Invalid JSON"}, status=400)
 
     if not userid or not password:
-        return JsonResponse({"detail": "userid & password required"}, status=400)
-
+        return None, JsonResponse({"detail": "userid & password required"}, status=400)
+
+    # 🚦 throttle BEFORE any DB connection
+    ip = _client_ip(request)
+    retry_after = _login_throttle.attempt(ip, userid)
+    if retry_after:
+        logging.warning("🚦 Login throttled for user %s from %s (retry in %.0fs)", userid, ip, retry_after)
+        return None, _throttled(retry_after)
+    return (ip, userid, password), None
+
+def _check_credentials(request, ip, userid, password):
+    """The DB half of login: verify the password and issue a token."""
     logging.info("🔐 Login attempt for user: %s", userid)
 
     try:
-        conn = get_connection()
+        conn = get_read_connection(isolation=READ_COMMITTED)   # never authenticate against uncommitted rows
         cur = conn.cursor()
         # SQL Anywhere compatible positional parameters (?)
         cur.execute("SELECT id, pass FROM acc_users WHERE id = ? AND pass = ?", (userid, password))
@@ -159,11 +267,13 @@ def login(request):
             pass
 
     if not row:
+        _login_throttle.failed(ip, userid)
         logging.warning("❌ Invalid credentials")
         return JsonResponse({"detail": "Invalid credentials"}, status=401)
 
     payload = {"sub": userid, "exp": datetime.utcnow() + timedelta(days=7)}
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
+    with tracing.span("jwt encode"):
+        token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
     # PyJWT v2 returns a str already; in v1 it may be bytes
     if isinstance(token, bytes):
         token = token.decode("utf-8")
@@ -180,66 +290,37 @@ def verify_token(request):
 @jwt_required
 @require_http_methods(["GET"])
 def data_download(request):
+    """
+    Master + product payload, served from the current catalog snapshot.
+    X-Catalog-Version / X-Catalog-Built-At / Age tell the device how old the
+    snapshot is (see catalog.DEFAULT_MAX_AGE_SECONDS for the bound).
+    Range / If-Range let a device resume an interrupted download; a resume
+    is served from the same version it started on and never hits the DB.
+    """
     logging.info("📥 Data download request")
-    conn = get_connection()
-    cur = conn.cursor()
 
     try:
-        # MASTER DATA
-        cur.execute("""
-            SELECT code, name, place
-            FROM acc_master
-            WHERE super_code = 'SUNCR'
-        """)
-        master_rows = cur.fetchall()
-        master_data = [
-            {"code": r[0], "name": r[1], "place": r[2]}
-            for r in master_rows
-        ]
-
-        # PRODUCT + BATCH
-        cur.execute("""
-            SELECT 
-                p.code,
-                p.name,
-                pb.barcode,
-                pb.quantity,
-                pb.salesprice,
-                pb.bmrp,
-                pb.cost,
-                pb.text1
-            FROM acc_product p
-            LEFT JOIN acc_productbatch pb
-                ON p.code = pb.productcode
-        """)
-        product_rows = cur.fetchall()
-
-        product_data = []
-
-        for r in product_rows:
-            barcode = r[2]
-
-            # ❌ SKIP if barcode is NULL or empty
-            if not barcode:
-                continue
-
-            product_data.append({
-                "code": r[0],
-                "name": r[1],
-                "barcode": barcode,
-                "quantity": _to_float(r[3]),
-                "salesprice": _to_float(r[4]),
-                "bmrp": _to_float(r[5]),
-                "cost": _to_float(r[6]),
-                "text1": r[7]
-            })
-
-        return JsonResponse({
-            "status": "success",
-            "master_data": master_data,
-            "product_data": product_data
-        })
-
+        with tracing.span("catalog lookup"):
+            info = None
+            if request.headers.get("Range"):
+                info = catalog.find_payload(request.headers.get("If-Range")) or catalog.current()
+            if info is None:
+                info = catalog.fresh()
+
+        etag = catalog.payload_etag(info)
+        if request.headers.get("If-None-Match") == etag:
+            resp = HttpResponse(status=304)
+            resp["ETag"] = etag
+        else:
+            resp = ranged_file_response(request, catalog.payload_path(info), "application/json", etag)
+            metrics.count_rows(info.get("master_rows", 0) + info.get("product_rows", 0))
+        for name, value in catalog.snapshot_headers(info).items():
+            resp[name] = value
+        return resp
+
+    except SingleFlightTimeout:
+        logging.warning("⏳ Catalog build still running - data_download answered 503")
+        return _busy()
     except Exception as e:
         logging.exception("data_download failed")
         return JsonResponse(
@@ -247,16 +328,66 @@ def data_download(request):
             status=500
         )
 
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
+
+@jwt_required
+@require_http_methods(["GET"])
+def catalog_db(request):
+    """
+    Prebuilt SQLite catalog (master + product tables, indexed).
+    Headers: X-Catalog-Version (changes only when the data does),
+    X-Catalog-SHA256 (hash of the file, for integrity checks on the device),
+    X-Catalog-Built-At and Age (seconds since the data was last checked).
+    """
+    info = catalog.current()
+    if info is None:
+        catalog.request_build()
+        resp = JsonResponse({"detail": "Catalog is being built, retry shortly"}, status=503)
+        resp["Retry-After"] = "10"
+        return resp
+
+    etag = f'"{info["sha256"]}"'
+    if request.headers.get("If-None-Match") == etag or request.GET.get("version") == info["version"]:
+        resp = HttpResponse(status=304)
+    else:
+        logging.info("📚 Catalog download (version %s, %s bytes)", info["version"], info["size"])
+        resp = ranged_file_response(
+            request,
+            catalog.catalog_path(info),
+            "application/vnd.sqlite3",
+            etag,
+            filename=info["file"],
+        )
+    resp["ETag"] = etag
+    for name, value in catalog.snapshot_headers(info).items():
+        resp[name] = value
+    resp["X-Catalog-SHA256"] = info["sha256"]
+    return resp
+
 
 
 
 
+@jwt_required
+@require_http_methods(["GET"])
+def index_report(request):
+    """On-demand index advisor report (read-only - never creates indexes)."""
+    try:
+        return JsonResponse({"status": "success", **index_advisor.run_advisor(create=False)})
+    except Exception as e:
+        logging.exception("index_report failed")
+        return JsonResponse({"detail": f"Index advisor failed: {e}"}, status=500)
+
+
+@jwt_required
+@require_http_methods(["GET"])
+def device_summary(request):
+    """Slowest / heaviest devices from the telemetry registry (?limit=10)."""
+    try:
+        limit = min(100, max(1, int(request.GET.get("limit", 10))))
+    except ValueError:
+        limit = 10
+    return JsonResponse({"status": "success", **devices.registry().summary(limit)})
+
 
 # ------------------------------------------------------------------
 #  helper that returns the next PK for acc_purchaseorderdetails
@@ -344,14 +475,6 @@ def _to_decimal(x, default="0"):
     except Exception:
         return Decimal(default)
 
-def _to_float(x, default=0.0):
-    try:
-        if x is None:
-            return float(default)
-        return float(x)
-    except Exception:
-        return float(default)
-
 
 # ------------------------------------------------------------------
 #  upload_orders – ONE masterslno per logical entry (items share it)
@@ -361,7 +484,8 @@ def _to_float(x, default=0.0):
 @require_http_methods(["POST"])
 def upload_orders(request):
     try:
-        payload = json.loads(request.body or b"{}")
+        with tracing.span("json parse"):
+            payload = json.loads(request.body or b"{}")
     except Exception:
         return JsonResponse({"detail": "Invalid JSON"}, status=400)
 
@@ -415,6 +539,8 @@ def upload_orders(request):
             inserted.append(slno)
 
         conn.commit()
+        metrics.ROWS_INSERTED.inc("upload_orders", amount=len(inserted))
+        metrics.count_rows(len(inserted))
 
         return JsonResponse({
             "status": "success",
@@ -457,6 +583,10 @@ def get_status(request):
         "connection_urls": [f"http://{ip}:8000" for ip in all_ips],
         "pair_password_hint": f"Password starts with: {PAIR_PASSWORD[:3]}...",
         "server_time": datetime.now().isoformat(),
+        "auth_cache": _token_cache.stats(),
+        "login_throttle": _login_throttle.stats(),
+        "logging": request_log.stats(),
+        "device_telemetry": devices.registry().stats(),
         "instructions": {
             "mobile_setup": "Try connecting to any of the URLs listed in 'connection_urls'",
             "troubleshooting": [
@@ -469,7 +599,51 @@ def get_status(request):
     })
 
 
+def _profiling_forbidden():
+    return JsonResponse({"detail": "Profiling admin token required"}, status=403)
+
+
+@require_http_methods(["GET"])
+def profile_list(request):
+    """Captured request profiles, newest first (profiling admins only)."""
+    if profiling.admin_user(request) is None:
+        return _profiling_forbidden()
+    return JsonResponse({"status": "success", "profiles": profiling.list_captures()})
+
+
+@require_http_methods(["GET"])
+def profile_download(request, capture_id):
+    """<id>.prof (pstats dump) or, with ?format=json, the report."""
+    if profiling.admin_user(request) is None:
+        return _profiling_forbidden()
+    kind = "json" if request.GET.get("format") == "json" else "prof"
+    path = profiling.capture_path(capture_id, kind)
+    if path is None:
+        return JsonResponse({"detail": "Unknown profile"}, status=404)
+    if kind == "json":
+        return FileResponse(open(path, "rb"), content_type="application/json")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name,
+                        content_type="application/octet-stream")
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Prometheus text exposition of sync.metrics."""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@require_http_methods(["GET"])
+def ready(request):
+    """
+    Readiness probe - 200 once the startup warm-up has finished, 503 before.
+    /status only says the process answers; this says it is warm.
+    """
+    state = warmup.status()
+    return JsonResponse(state, status=200 if state["ready"] else 503)
+
+
 @jwt_required
+@coalesced
 @require_http_methods(["GET"])
 def get_product_details(request):
     """
@@ -477,7 +651,7 @@ def get_product_details(request):
     (joined on code = productcode)
     """
     logging.info("📦 Product details request")
-    conn = get_connection()
+    conn = get_read_connection()
     cur = conn.cursor()
 
     try:
@@ -492,38 +666,16 @@ def get_product_details(request):
         """)
 
         rows = cur.fetchall()
-        out = []
-
-        for r in rows:
-            expiry = r[16]
-            if expiry:
-                expiry = expiry.isoformat() if hasattr(expiry, "isoformat") else str(expiry)
-
-            out.append({
-                "code": r[0],
-                "name": r[1],
-                "catagory": r[2],
-                "product": r[3],
-                "brand": r[4],
-                "unit": r[5],
-                "taxcode": r[6],
-                "productcode": r[7],
-                "barcode": r[8],
-                "quantity": _to_float(r[9]),
-                "cost": _to_float(r[10]),
-                "bmrp": _to_float(r[11]),
-                "salesprice": _to_float(r[12]),
-                "secondprice": _to_float(r[13]),
-                "thirdprice": _to_float(r[14]),
-                "supplier": r[15],
-                "expirydate": expiry
-            })
+        serialize_started = time.perf_counter()
+        out = _product_detail_dicts(rows)
 
-        return JsonResponse({
+        resp = JsonResponse({
             "status": "success",
             "count": len(out),
             "data": out
         })
+        tracing.record("serialize", serialize_started, time.perf_counter(), rows=len(out), bytes=len(resp.content))
+        return resp
 
     except Exception as e:
         logging.exception("get_product_details failed")
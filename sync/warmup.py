@@ -0,0 +1,103 @@
+"""
+Startup warm-up - runs before SyncService announces "Backend running"
+  • pool      - pre-opens the read-connection pool (read_pool_size)
+  • urlconf   - resolves every route, so the first request does not import
+                the views / build the resolver
+  • catalog   - runs the catalog statements once (plan + pages hot)
+  • snapshot  - waits for the first catalog snapshot (warmup_catalog)
+A failing step is reported and skipped - the service still comes up.
+/ready answers from the state kept here; /status stays a liveness check.
+"""
+import time
+import logging
+import threading
+from datetime import datetime
+
+from .sql_helper import _get_config, warm_read_pool
+
+_lock = threading.Lock()
+_state = {"ready": False, "started_at": None, "finished_at": None, "steps": {}}
+
+
+# ------------------ steps ------------------
+def _warm_pool():
+    return {"connections": warm_read_pool()}
+
+def _warm_urlconf():
+    from django.urls import get_resolver, resolve, URLPattern
+
+    def routes(patterns, prefix=""):
+        for p in patterns:
+            route = prefix + str(p.pattern)
+            if isinstance(p, URLPattern):
+                yield route
+            else:
+                yield from routes(p.url_patterns, route)
+
+    resolver = get_resolver()
+    count = 0
+    for route in routes(resolver.url_patterns):
+        if "<" in route or "^" in route:
+            continue                    # parametrised / regex routes
+        resolve("/" + route)
+        count += 1
+    return {"routes": count}
+
+def _warm_catalog():
+    from . import catalog
+    return {"statements": catalog.prepare_statements()}
+
+def _warm_snapshot():
+    from . import catalog
+    info = catalog.build_catalog()     # joins the background builder's run
+    return {"version": info["version"]}
+
+STEPS = (
+    ("pool", _warm_pool),
+    ("urlconf", _warm_urlconf),
+    ("catalog", _warm_catalog),
+    ("snapshot", _warm_snapshot),
+)
+
+
+# ------------------ helpers ------------------
+def _enabled_steps(cfg):
+    skip = set()
+    if not cfg.get("warmup_catalog", False):
+        skip.add("snapshot")
+    if not cfg.get("warmup", True):
+        skip = {name for name, _ in STEPS}
+    return [(name, fn) for name, fn in STEPS if name not in skip]
+
+def _record(name, entry):
+    with _lock:
+        _state["steps"][name] = entry
+
+def run(cfg=None):
+    """Run the enabled steps in order, then mark the service ready."""
+    cfg = cfg if cfg is not None else _get_config()
+    with _lock:
+        _state.update(ready=False, started_at=datetime.now().isoformat(), finished_at=None, steps={})
+
+    for name, fn in _enabled_steps(cfg):
+        started = time.perf_counter()
+        entry = {"ok": True}
+        try:
+            entry.update(fn() or {})
+        except Exception as e:
+            entry = {"ok": False, "error": str(e)}
+            logging.warning("⚠️ Warm-up step '%s' failed: %s", name, e)
+        entry["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _record(name, entry)
+
+    with _lock:
+        _state["ready"] = True
+        _state["finished_at"] = datetime.now().isoformat()
+    return status()
+
+def status():
+    with _lock:
+        return {**_state, "steps": {k: dict(v) for k, v in _state["steps"].items()}}
+
+def is_ready():
+    return _state["ready"]